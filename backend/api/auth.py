@@ -0,0 +1,20 @@
+from typing import Any, Optional
+
+from django.http import HttpRequest
+from ninja.security import SessionAuth
+
+
+class AsyncSessionAuth(SessionAuth):
+    """
+    异步视图使用的 Django 会话认证
+    同步的 django_auth 会在事件循环中访问 request.user 触发数据库查询，这里改用 request.auser()
+    """
+
+    async def authenticate(self, request: HttpRequest, key: Optional[str]) -> Optional[Any]:
+        user = await request.auser()
+        if user.is_authenticated:
+            return user
+        return None
+
+
+async_django_auth = AsyncSessionAuth()
@@ -0,0 +1,36 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+
+class MultipartPutMiddleware:
+    """
+    Django 只为 POST 请求解析 multipart 表单
+    PUT/PATCH 上传文件（例如更新Hook）时在这里补充解析，供 Ninja 的 Form/File 参数使用
+    同时支持同步和异步调用，在 ASGI 下不会迫使每个请求占用一个线程
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        self.parse_multipart(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        # ASGI 已把请求体读入内存或临时文件，这里的解析不会阻塞在网络读取上
+        self.parse_multipart(request)
+        return await self.get_response(request)
+
+    def parse_multipart(self, request):
+        if request.method in ('PUT', 'PATCH') and request.content_type == 'multipart/form-data':
+            method = request.method
+            request.method = 'POST'
+            request._load_post_and_files()
+            request.method = method
@@ -0,0 +1,87 @@
+import base64
+import json
+from typing import Any, List, Optional
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+from ninja import Field, Schema
+from ninja.conf import settings
+from ninja.errors import HttpError
+from ninja.pagination import PaginationBase
+
+
+class KeysetPagination(PaginationBase):
+    """
+    基于游标（keyset）的分页：按 ordering 字段的值定位下一页，而不是使用 OFFSET
+    翻页开销与数据量无关，ordering 的最后一个字段必须唯一（通常是 id）
+
+        @router.get("/", response=List[ItemSchema])
+        @paginate(KeysetPagination, ordering=('-updated_at', '-id'))
+        def list_items(request):
+            return Item.objects.all()
+    """
+
+    class Input(Schema):
+        cursor: Optional[str] = None
+        limit: int = Field(settings.PAGINATION_PER_PAGE, ge=1, le=1000)
+
+    class Output(Schema):
+        items: List[Any]
+        next_cursor: Optional[str] = None
+
+    def __init__(self, ordering=('-id',), **kwargs: Any) -> None:
+        self.ordering = ordering
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        super().__init__(**kwargs)
+
+    def paginate_queryset(self, queryset: QuerySet, pagination: Input, **params: Any) -> Any:
+        queryset = queryset.order_by(*self.ordering)
+        if pagination.cursor:
+            queryset = queryset.filter(self._after(queryset.model, self._decode(pagination.cursor)))
+
+        return self._page(list(queryset[:pagination.limit + 1]), pagination.limit)
+
+    def _page(self, items, limit):
+        """items 最多取 limit + 1 条，多出的一条说明还有下一页"""
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = self._encode(items[-1])
+
+        return {"items": items, "next_cursor": next_cursor}
+
+    def _values(self, model, values):
+        """把游标中的值转换为字段的 Python 类型"""
+        if len(values) != len(self.fields):
+            raise HttpError(400, "Invalid cursor")
+        try:
+            return [model._meta.get_field(name).to_python(raw) for (name, _), raw in zip(self.fields, values)]
+        except (ValidationError, TypeError, ValueError):
+            # 例如 datetime 字段收到数字、整数字段收到列表
+            raise HttpError(400, "Invalid cursor")
+
+    def _after(self, model, values):
+        """构造“排在游标之后”的条件：(a, b) < (va, vb) 展开为 a < va OR (a = va AND b < vb)"""
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.fields, self._values(model, values)):
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _encode(self, item) -> str:
+        values = []
+        for name, _ in self.fields:
+            value = getattr(item, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def _decode(self, cursor: str):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except ValueError:
+            raise HttpError(400, "Invalid cursor")
+        if not isinstance(values, list):
+            raise HttpError(400, "Invalid cursor")
+        return values
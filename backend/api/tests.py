@@ -1,3 +1,1890 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from urllib.parse import urlencode
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import requests
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connection
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import CaptureQueriesContext
+
+from hooks import services
+from hooks.history import version_cache
+from hooks.models import Hook, HookUpload, HookVersion
+from audit.archive import archived_days, partition_path, read_partition
+from audit.middleware import AuditLogMiddleware
+from audit.models import AuditLog
+from audit.sink import AuditSink
+from deployments.models import Deployment, DeploymentJob
+from deployments.queue import claim_job, complete_job
+from deployments.worker import DeploymentWorker
+from gitlab_integration.async_http import AsyncGitLabSession, close_async_sessions, get_async_session
+from gitlab_integration.cache import ResponseCache
+from gitlab_integration.catalog import invalidate_group_trees, resolve_group_projects, sync_catalog
+from gitlab_integration.client import GitLabClient
+from gitlab_integration.graphql import GRAPHQL_ALIAS_BATCH_SIZE, fetch_groups
+from gitlab_integration.http import GitLabSession, close_sessions, get_scheduler, get_session
+from gitlab_integration.health import prune_samples, run_health_checks
+from gitlab_integration.models import (
+    GitLabConfig, GitLabGroup, GitLabHealthSample, GitLabProject, SystemHookEvent
+)
+from gitlab_integration.registry import clear_clients, get_client
+from gitlab_integration.scheduler import CircuitOpenError, RateLimitedError, RequestScheduler
+from gitlab_integration.utils import iter_gitlab_projects
+
+
+
+def setUpModule():
+    # 测试在事务中运行，审计日志后台线程的连接看不到也写不进未提交的数据，测试中改为同步写入
+    override = override_settings(AUDIT_LOG_BUFFERED=False)
+    override.enable()
+    unittest.addModuleCleanup(override.disable)
+
+class HookListQueryCountTests(TestCase):
+    """GET /api/hooks/ 的查询次数不应随Hook数量增长"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='admin', password='admin')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def create_hooks(self, count):
+        for i in range(count):
+            hook = Hook.objects.create(
+                name=f'hook-{i}',
+                hook_type='pre-receive',
+                file_type='script',
+                script_language='bash',
+                file=f'hooks/hook-{i}.sh',
+                created_by=self.user,
+            )
+            for version in (1, 2):
+                hook_version = HookVersion.objects.create(
+                    hook=hook, version=version, file=f'hook_versions/hook-{i}-{version}.sh', created_by=self.user
+                )
+            Deployment.objects.create(
+                hook=hook, hook_version=hook_version, deployment_level='server', deployed_by=self.user
+            )
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/hooks/')
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()['items']
+
+    def test_query_count_is_constant(self):
+        self.create_hooks(2)
+        small_count, _ = self.count_list_queries()
+
+        self.create_hooks(20)
+        large_count, data = self.count_list_queries()
+
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(len(data), 22)
+
+    def test_payload(self):
+        self.create_hooks(1)
+        Hook.objects.create(
+            name='no-versions', hook_type='update', file_type='binary', file='hooks/bin', created_by=self.user
+        )
+        _, data = self.count_list_queries()
+        by_name = {item['name']: item for item in data}
+
+        self.assertEqual(by_name['hook-0']['current_version'], 2)
+        self.assertEqual(by_name['hook-0']['deployments_count'], 1)
+        self.assertEqual(by_name['hook-0']['created_by'], {'id': self.user.id, 'username': 'admin'})
+        self.assertEqual(by_name['no-versions']['current_version'], 1)
+        self.assertEqual(by_name['no-versions']['deployments_count'], 0)
+
+
+class KeysetPaginationTests(TestCase):
+    """列表接口的游标分页与过滤"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='admin', password='admin')
+        cls.hooks = [
+            Hook.objects.create(
+                name=f'{prefix}-{i}',
+                hook_type='pre-receive' if i % 2 else 'update',
+                file_type='script',
+                file=f'hooks/{prefix}-{i}.sh',
+                created_by=cls.user,
+            )
+            for prefix in ('lint', 'scan')
+            for i in range(5)
+        ]
+        # 所有部署使用相同的时间，翻页只能依靠 id 区分
+        for hook in cls.hooks:
+            Deployment.objects.create(
+                hook=hook,
+                deployment_level='project' if hook.id % 2 else 'group',
+                target_name=f'team/{hook.name}',
+                status='success',
+                deployed_by=cls.user,
+            )
+        Deployment.objects.update(deployed_at=timezone.now())
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def collect(self, url, **params):
+        items, pages = [], 0
+        while True:
+            data = self.client.get(url, params).json()
+            items.extend(data['items'])
+            pages += 1
+            if not data['next_cursor']:
+                return items, pages
+            params['cursor'] = data['next_cursor']
+
+    def test_hook_pages_cover_every_hook_once(self):
+        items, pages = self.collect('/api/hooks/', limit=3)
+        self.assertEqual(pages, 4)
+        self.assertEqual(
+            [item['id'] for item in items],
+            [hook.id for hook in sorted(self.hooks, key=lambda h: (h.updated_at, h.id), reverse=True)],
+        )
+
+    def test_hook_filters(self):
+        items, _ = self.collect('/api/hooks/', name='scan', hook_type='update', limit=2)
+        self.assertEqual(sorted(item['name'] for item in items), ['scan-0', 'scan-2', 'scan-4'])
+
+    def test_deployment_pages_with_identical_timestamps(self):
+        items, pages = self.collect('/api/deployments/', limit=4)
+        self.assertEqual(pages, 3)
+        self.assertEqual(len({item['id'] for item in items}), 10)
+
+        items, _ = self.collect('/api/deployments/', deployment_level='group', target_name='team/lint')
+        self.assertTrue(items)
+        self.assertTrue(all(item['target_name'].startswith('team/lint') for item in items))
+        self.assertTrue(all(item['deployment_level'] == 'group' for item in items))
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/hooks/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+        # 能解码但值的类型不对
+        for values in ([123, 1], [{'a': 1}, 1]):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            response = self.client.get('/api/hooks/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400)
+
+    def test_audit_log_pages_and_filters(self):
+        other = User.objects.create_user(username='other')
+        now = timezone.now()
+        AuditLog.objects.bulk_create([
+            AuditLog(user=self.user if i % 2 else other, action='hook_create' if i % 3 else 'hook_delete',
+                     resource_type='hook', resource_id=str(i), created_at=now - timedelta(minutes=i // 2))
+            for i in range(12)
+        ])
+
+        with CaptureQueriesContext(connection) as ctx:
+            items, pages = self.collect('/api/audit-logs/', limit=5)
+        self.assertEqual(pages, 3)
+        # 每页：会话、用户、日志（含 user 的 JOIN）
+        self.assertEqual(len(ctx.captured_queries), 9)
+        self.assertEqual(
+            [item['id'] for item in items],
+            list(AuditLog.objects.order_by('-created_at', '-id').values_list('id', flat=True)),
+        )
+        self.assertEqual(items[-1]['user'], {'id': other.id, 'username': 'other'})
+
+        items, _ = self.collect('/api/audit-logs/', user_id=self.user.id, action='hook_create', limit=2)
+        self.assertEqual(sorted(int(item['resource_id']) for item in items), [1, 5, 7, 11])
+        items, _ = self.collect('/api/audit-logs/', start_date=(now - timedelta(minutes=1)).isoformat())
+        self.assertEqual(len(items), 4)
+
+
+class MediaTestCase(TestCase):
+    """使用临时 MEDIA_ROOT 的测试基类"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='admin', password='admin')
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.force_login(self.user)
+
+    def create_hook(self, content):
+        response = self.client.post('/api/hooks/', {
+            'name': 'check-commit',
+            'hook_type': 'pre-receive',
+            'file_type': 'binary',
+            'file': SimpleUploadedFile('check', content),
+        })
+        return Hook.objects.get(id=response.json()['id'])
+
+
+class HookContentStorageTests(MediaTestCase):
+    """Hook 文件按内容哈希去重保存"""
+
+    def hook_form(self, content, **extra):
+        data = {
+            'name': 'check-commit',
+            'hook_type': 'pre-receive',
+            'file_type': 'script',
+            'script_language': 'bash',
+            'file': SimpleUploadedFile('check.sh', content),
+        }
+        data.update(extra)
+        return data
+
+    def stored_blobs(self):
+        return [path for path in Path(self.media_root).rglob('*') if path.is_file()]
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.client.post('/api/hooks/', self.hook_form(b'#!/bin/sh\nexit 0\n'))
+        second = self.client.post('/api/hooks/', self.hook_form(b'#!/bin/sh\nexit 0\n', name='other'))
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['file_url'], second.json()['file_url'])
+        self.assertEqual(len(self.stored_blobs()), 1)
+
+        version = HookVersion.objects.get(hook_id=first.json()['id'])
+        self.assertEqual(version.size, 17)
+        self.assertEqual(version.filename, 'check.sh')
+        self.assertEqual(len(version.sha256), 64)
+
+    def test_unchanged_reupload_does_not_add_version(self):
+        hook_id = self.client.post('/api/hooks/', self.hook_form(b'echo v1\n')).json()['id']
+
+        response = self.client.put(
+            f'/api/hooks/{hook_id}/',
+            encode_multipart(BOUNDARY, self.hook_form(b'echo v1\n')),
+            content_type=MULTIPART_CONTENT,
+        )
+        self.assertEqual(response.json()['current_version'], 1)
+
+        response = self.client.put(
+            f'/api/hooks/{hook_id}/',
+            encode_multipart(BOUNDARY, self.hook_form(b'echo v2\n')),
+            content_type=MULTIPART_CONTENT,
+        )
+        self.assertEqual(response.json()['current_version'], 2)
+        self.assertEqual(len(self.stored_blobs()), 2)
+
+
+class HookDownloadTests(MediaTestCase):
+    """Hook 版本下载：流式返回、Range 与 ETag"""
+
+    def setUp(self):
+        super().setUp()
+        self.content = bytes(range(256)) * 1024
+        hook = self.create_hook(self.content)
+        self.version = hook.versions.get()
+        self.url = f'/api/hooks/{hook.id}/versions/{self.version.id}/download/'
+
+    def test_full_download_is_streamed(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['ETag'], f'"{self.version.sha256}"')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('filename="check"', response['Content-Disposition'])
+
+    def test_if_none_match_returns_304(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"{self.version.sha256}"')
+        self.assertEqual(response.status_code, 304)
+
+        # If-None-Match 弱比较
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"other", W/"{self.version.sha256}"')
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_range_uses_strong_comparison(self):
+        etag = f'"{self.version.sha256}"'
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=f'W/{etag}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_range_request(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-10:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_any_range_on_empty_file_is_unsatisfiable(self):
+        hook = self.create_hook(b'')
+        version = hook.versions.get()
+        url = f'/api/hooks/{hook.id}/versions/{version.id}/download/'
+        for header in ('bytes=-10', 'bytes=0-', 'bytes=0-0'):
+            response = self.client.get(url, HTTP_RANGE=header)
+            self.assertEqual(response.status_code, 416, header)
+            self.assertEqual(response['Content-Range'], 'bytes */0')
+
+    @override_settings(HOOK_DOWNLOAD_SENDFILE='x-accel-redirect')
+    def test_accel_redirect_mode(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.version.file.name}')
+
+
+class HookUploadTests(MediaTestCase):
+    """分块、可续传的 Hook 上传"""
+
+    def start_upload(self, total_size=None):
+        data = {'filename': 'scanner'}
+        if total_size is not None:
+            data['total_size'] = total_size
+        response = self.client.post('/api/hooks/uploads/', data)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['id']
+
+    def send_chunk(self, upload_id, offset, data):
+        return self.client.post(
+            f'/api/hooks/uploads/{upload_id}/chunks/',
+            {'offset': offset, 'chunk': SimpleUploadedFile('chunk', data)},
+        )
+
+    def test_resumable_upload_creates_hook(self):
+        content = b'\x7fELF' + bytes(range(256)) * 100
+        upload_id = self.start_upload(len(content))
+
+        self.assertEqual(self.send_chunk(upload_id, 0, content[:1000]).json()['received'], 1000)
+
+        # 偏移量错误时返回服务端已接收的位置
+        response = self.send_chunk(upload_id, 500, content[500:1500])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['expected_offset'], 1000)
+
+        # 模拟另一个进程接收剩余分块：增量哈希状态需要从临时文件重建
+        services._upload_hashers.clear()
+        offset = self.client.get(f'/api/hooks/uploads/{upload_id}/').json()['received']
+        self.assertEqual(self.send_chunk(upload_id, offset, content[offset:]).status_code, 200)
+
+        response = self.client.post(f'/api/hooks/uploads/{upload_id}/finalize/', {
+            'name': 'scanner', 'hook_type': 'pre-receive', 'file_type': 'binary',
+        })
+        self.assertEqual(response.status_code, 200)
+
+        version = HookVersion.objects.get(hook_id=response.json()['id'])
+        self.assertEqual(version.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(version.size, len(content))
+        self.assertEqual(version.filename, 'scanner')
+        with version.file.open('rb') as f:
+            self.assertEqual(f.read(), content)
+
+    def test_finalize_adds_version_to_existing_hook(self):
+        hook = self.create_hook(b'v1')
+        upload_id = self.start_upload()
+        self.send_chunk(upload_id, 0, b'v2')
+
+        response = self.client.post(f'/api/hooks/uploads/{upload_id}/finalize/', {'hook_id': hook.id})
+        self.assertEqual(response.json()['current_version'], 2)
+
+    def test_expired_uploads_are_removed(self):
+        stale_id = self.start_upload(10)
+        self.send_chunk(stale_id, 0, b'12345')
+        live_id = self.start_upload(10)
+        self.send_chunk(live_id, 0, b'12345')
+        HookUpload.objects.filter(id=stale_id).update(updated_at=timezone.now() - timedelta(days=2))
+        # 会话已删除但残留的临时文件
+        orphan = Path(settings.MEDIA_ROOT) / 'uploads' / f'{uuid.uuid4()}.part'
+        orphan.write_bytes(b'x')
+        old = time.time() - 2 * 24 * 3600
+        os.utime(orphan, (old, old))
+
+        out = io.StringIO()
+        call_command('expire_hook_uploads', stdout=out)
+        self.assertIn('removed 1 expired upload session(s) and 1 orphaned part file(s)', out.getvalue())
+        self.assertEqual(list(HookUpload.objects.values_list('id', flat=True)), [uuid.UUID(live_id)])
+        self.assertEqual(sorted(p.name for p in orphan.parent.iterdir()), [f'{live_id}.part'])
+        self.assertNotIn(uuid.UUID(stale_id), services._upload_hashers)
+
+    def test_max_age_zero_expires_every_upload(self):
+        upload_id = self.start_upload(10)
+        self.send_chunk(upload_id, 0, b'12345')
+
+        call_command('expire_hook_uploads', '--max-age', '0', stdout=io.StringIO())
+        self.assertFalse(HookUpload.objects.exists())
+        self.assertEqual(list((Path(settings.MEDIA_ROOT) / 'uploads').iterdir()), [])
+
+    def test_finalize_rollback_keeps_part_file(self):
+        content = b'\x7fELF' + bytes(range(256)) * 10
+        upload_id = self.start_upload(len(content))
+        self.send_chunk(upload_id, 0, content)
+        part = Path(settings.MEDIA_ROOT) / 'uploads' / f'{upload_id}.part'
+        data = {'name': 'scanner', 'hook_type': 'pre-receive', 'file_type': 'binary'}
+
+        # 创建 Hook 失败导致事务回滚：会话仍可继续完成，临时文件没有被移走
+        with mock.patch('hooks.api._create_hook', side_effect=RuntimeError('boom')), \
+                self.assertRaises(RuntimeError):
+            self.client.post(f'/api/hooks/uploads/{upload_id}/finalize/', data)
+        self.assertEqual(HookUpload.objects.get().status, 'uploading')
+        self.assertEqual(part.read_bytes(), content)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/hooks/uploads/{upload_id}/finalize/', data)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(part.exists())
+        version = HookVersion.objects.get(hook_id=response.json()['id'])
+        with version.file.open('rb') as f:
+            self.assertEqual(f.read(), content)
+
+    @override_settings(HOOK_UPLOAD_EXPIRE_SECONDS=60)
+    def test_idle_hasher_state_is_evicted(self):
+        first = self.start_upload()
+        self.send_chunk(first, 0, b'123')
+        with mock.patch('hooks.services.time.monotonic', return_value=time.monotonic() + 120):
+            self.send_chunk(self.start_upload(), 0, b'456')
+        self.assertNotIn(uuid.UUID(first), services._upload_hashers)
+        self.assertEqual(len(services._upload_hashers), 1)
+
+    def test_incomplete_upload_cannot_be_finalized(self):
+        upload_id = self.start_upload(10)
+        self.send_chunk(upload_id, 0, b'12345')
+
+        response = self.client.post(f'/api/hooks/uploads/{upload_id}/finalize/', {
+            'name': 'scanner', 'hook_type': 'pre-receive', 'file_type': 'binary',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Hook.objects.exists())
+
+
+class HookVersionHistoryTests(MediaTestCase):
+    """版本历史的差量存储与重建"""
+
+    def setUp(self):
+        super().setUp()
+        version_cache.clear()
+
+    def update_hook(self, hook, content):
+        return self.client.put(
+            f'/api/hooks/{hook.id}/',
+            encode_multipart(BOUNDARY, {
+                'name': hook.name, 'hook_type': hook.hook_type, 'file_type': hook.file_type,
+                'file': SimpleUploadedFile('check', content),
+            }),
+            content_type=MULTIPART_CONTENT,
+        )
+
+    def download(self, version):
+        response = self.client.get(f'/api/hooks/{version.hook_id}/versions/{version.id}/download/')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    @override_settings(HOOK_SNAPSHOT_INTERVAL=3)
+    def test_older_versions_are_stored_as_deltas(self):
+        lines = [f'echo "step {i}"\n'.encode() for i in range(200)]
+        contents = []
+        hook = self.create_hook(b''.join(lines))
+        contents.append(b''.join(lines))
+        for i in range(1, 5):
+            lines[i * 10] = f'echo "changed in v{i + 1}"\n'.encode()
+            contents.append(b''.join(lines))
+            self.update_hook(hook, contents[-1])
+
+        versions = {v.version: v for v in HookVersion.objects.filter(hook=hook)}
+        self.assertEqual(
+            [versions[n].storage for n in range(1, 6)],
+            ['delta', 'delta', 'full', 'delta', 'full'],
+        )
+        self.assertEqual(versions[1].base_version, versions[2])
+        self.assertLess(versions[1].file.size, versions[1].size)
+
+        version_cache.clear()
+        for number, content in enumerate(contents, start=1):
+            self.assertEqual(self.download(versions[number]), content)
+
+    def test_replaced_blob_is_deleted_after_commit(self):
+        hook = self.create_hook(b'line\n' * 500)
+        old_name = hook.versions.get(version=1).file.name
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.update_hook(hook, b'line\n' * 500 + b'extra\n')
+        self.assertEqual(hook.versions.get(version=1).storage, 'delta')
+        self.assertTrue(default_storage.exists(old_name))
+
+        for callback in callbacks:
+            callback()
+        self.assertFalse(default_storage.exists(old_name))
+
+    def test_binary_versions_are_stored_as_block_deltas(self):
+        rng = random.Random(0)
+        v1 = b'\x7fELF\0' + bytes(rng.randrange(256) for _ in range(64 * 1024))
+        # 修改几个字节并在中间插入数据，使后半部分整体偏移
+        v2 = v1[:1000] + b'\xff' * 8 + v1[1008:30000] + b'inserted\0' + v1[30000:]
+        hook = self.create_hook(v1)
+        self.update_hook(hook, v2)
+
+        version = hook.versions.get(version=1)
+        self.assertEqual(version.storage, 'delta')
+        self.assertLess(version.file.size, 1024)
+        version_cache.clear()
+        self.assertEqual(self.download(version), v1)
+
+        # 与基准无关的二进制内容保留完整文件
+        hook = self.create_hook(bytes(rng.randrange(256) for _ in range(8192)) + b'\0')
+        self.update_hook(hook, bytes(rng.randrange(256) for _ in range(8192)) + b'\0')
+        self.assertEqual(hook.versions.get(version=1).storage, 'full')
+
+    def test_hook_with_delta_history_can_be_deleted(self):
+        hook = self.create_hook(b'line\n' * 500)
+        self.update_hook(hook, b'line\n' * 500 + b'extra\n')
+        self.assertEqual(hook.versions.get(version=1).storage, 'delta')
+
+        self.assertEqual(self.client.delete(f'/api/hooks/{hook.id}/').status_code, 200)
+        self.assertFalse(HookVersion.objects.exists())
+
+
+class DeploymentTestCase(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.config = GitLabConfig.objects.create(url='https://gitlab.example.com', token='secret')
+        self.hook = self.create_hook(b'#!/bin/sh\n')
+        # 共享会话及其调度器状态不能泄漏到其他测试
+        self.addCleanup(close_sessions)
+
+    def deploy(self, deployment_level='project', target_id='42', target_name='team/app'):
+        response = self.client.post(
+            f'/api/deployments/{self.hook.id}/deploy',
+            {'deployment_level': deployment_level, 'target_id': target_id, 'target_name': target_name},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+
+class DeploymentQueueTests(DeploymentTestCase):
+    """部署任务队列与后台 worker"""
+
+    def test_deploy_returns_pending_and_worker_completes_it(self):
+        data = self.deploy()
+        self.assertEqual(data['status'], 'pending')
+
+        self.assertTrue(DeploymentWorker('test-worker').run_one())
+        self.assertEqual(Deployment.objects.get(id=data['id']).status, 'success')
+        self.assertEqual(DeploymentJob.objects.get().status, 'done')
+        self.assertFalse(DeploymentWorker('test-worker').run_one())
+
+    def test_failed_enqueue_leaves_no_deployment(self):
+        other = GitLabConfig.objects.create(url='https://gitlab.other.example.com', token='other')
+        with mock.patch('deployments.api.enqueue_deployment', side_effect=RuntimeError('boom')), \
+                self.assertRaises(RuntimeError):
+            self.client.post(
+                f'/api/deployments/{self.hook.id}/deploy',
+                {
+                    'deployment_level': 'project', 'target_id': '42', 'target_name': 'team/app',
+                    'gitlab_config_ids': [self.config.id, other.id],
+                },
+                content_type='application/json',
+            )
+        # 父部署和跨实例子部署随事务一起回滚
+        self.assertFalse(Deployment.objects.exists())
+
+    @mock.patch('deployments.worker.execute_deployment', side_effect=RuntimeError('GitLab unavailable'))
+    def test_failures_are_retried_with_backoff_then_fail(self, execute):
+        deployment_id = self.deploy()['id']
+        job = DeploymentJob.objects.get()
+        job.max_attempts = 2
+        job.save()
+
+        worker = DeploymentWorker('test-worker')
+        with self.assertLogs('deployments.worker', 'ERROR'):
+            self.assertTrue(worker.run_one())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertEqual(Deployment.objects.get(id=deployment_id).status, 'pending')
+
+        # 退避时间未到时不会被领取
+        self.assertFalse(worker.run_one())
+
+        DeploymentJob.objects.update(run_after=timezone.now())
+        with self.assertLogs('deployments.worker', 'ERROR'):
+            self.assertTrue(worker.run_one())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        deployment = Deployment.objects.get(id=deployment_id)
+        self.assertEqual(deployment.status, 'failed')
+        self.assertEqual(deployment.error_message, 'GitLab unavailable')
+
+    def test_expired_lease_is_recovered(self):
+        deployment_id = self.deploy()['id']
+        job = claim_job('crashed-worker', lease_seconds=60)
+        self.assertEqual(job.locked_by, 'crashed-worker')
+        self.assertIsNone(claim_job('other-worker'))
+
+        DeploymentJob.objects.update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        job = claim_job('other-worker')
+        self.assertEqual(job.locked_by, 'other-worker')
+        self.assertEqual(job.attempts, 2)
+
+        # 原 worker 恢复后不能再提交结果
+        self.assertFalse(complete_job(DeploymentJob(pk=job.pk, locked_by='crashed-worker', deployment_id=deployment_id)))
+        self.assertTrue(complete_job(job))
+        self.assertEqual(Deployment.objects.get(id=deployment_id).status, 'success')
+
+
+class FakeResponse:
+    """模拟 requests 的响应对象"""
+
+    def __init__(self, data, status_code=200, headers=None, links=None, content=None):
+        self.data = data
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.links = links or {}
+        self.content = content if content is not None else json.dumps(data).encode()
+
+    def json(self):
+        return self.data
+
+    def close(self):
+        pass
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error", response=self)
+
+
+class GroupDeploymentTests(DeploymentTestCase):
+    """组级别部署并发到组内所有项目，每个项目一条子部署记录"""
+
+    def setUp(self):
+        super().setUp()
+        self.projects = [{'id': i, 'path_with_namespace': f'team/sub/app-{i}'} for i in range(1, 251)]
+        self.deployed = []
+        self.failing = {7, 130}
+
+    def group_pages(self, session, url, params=None, **kwargs):
+        # 每页 100 个项目，通过 Link 头返回下一页
+        page = 1 if params else int(url.rsplit('page=', 1)[1])
+        links = {}
+        if page * 100 < len(self.projects):
+            links['next'] = {'url': f'https://gitlab.example.com/api/v4/groups/9/projects?page={page + 1}'}
+        return FakeResponse(self.projects[(page - 1) * 100:page * 100], links=links)
+
+    def deploy_project(self, client, project_id, hook_file_path, hook_type):
+        self.deployed.append(project_id)
+        if project_id in self.failing:
+            raise RuntimeError(f'project {project_id} rejected the hook')
+        return True
+
+    def test_group_fan_out_records_every_project(self):
+        parent_id = self.deploy('group', '9', 'team')['id']
+
+        with mock.patch.object(GitLabSession, 'get', autospec=True, side_effect=self.group_pages), \
+                mock.patch.object(GitLabClient, 'deploy_project_hook', autospec=True, side_effect=self.deploy_project), \
+                self.assertLogs('deployments.worker', 'ERROR'):
+            DeploymentWorker('test-worker').run_one()
+
+        self.assertEqual(sorted(self.deployed), list(range(1, 251)))
+        parent = Deployment.objects.get(id=parent_id)
+        self.assertEqual(parent.status, 'pending')
+        self.assertEqual(parent.error_message, '2 of 250 projects failed')
+        self.assertEqual(parent.children.filter(status='success').count(), 248)
+        failed = self.client.get(f'/api/deployments/{parent_id}/results', {'status': 'failed'}).json()['items']
+        self.assertEqual(sorted(item['target_name'] for item in failed), ['team/sub/app-130', 'team/sub/app-7'])
+
+        # 子部署不出现在顶层部署列表中
+        self.assertEqual([item['id'] for item in self.client.get('/api/deployments/').json()['items']], [parent_id])
+
+        # 重试时只重新部署失败的项目
+        self.deployed.clear()
+        self.failing.clear()
+        DeploymentJob.objects.update(run_after=timezone.now())
+        with mock.patch.object(GitLabSession, 'get', autospec=True, side_effect=self.group_pages), \
+                mock.patch.object(GitLabClient, 'deploy_project_hook', autospec=True, side_effect=self.deploy_project):
+            DeploymentWorker('test-worker').run_one()
+
+        self.assertEqual(sorted(self.deployed), [7, 130])
+        parent.refresh_from_db()
+        self.assertEqual(parent.status, 'success')
+        self.assertEqual(parent.children.count(), 250)
+
+
+class GitLabSessionTests(TestCase):
+    """GitLab API 共享会话"""
+
+    def tearDown(self):
+        close_sessions()
+
+    def test_session_is_shared_per_instance_and_token(self):
+        session = get_session('https://gitlab.example.com/', 'token-a')
+        self.assertIs(get_session('https://gitlab.example.com', 'token-a'), session)
+        self.assertIsNot(get_session('https://gitlab.example.com', 'token-b'), session)
+        self.assertEqual(session.headers['PRIVATE-TOKEN'], 'token-a')
+        self.assertEqual(session.api_url('projects'), 'https://gitlab.example.com/api/v4/projects')
+
+        close_sessions('https://gitlab.example.com')
+        self.assertIsNot(get_session('https://gitlab.example.com', 'token-a'), session)
+
+    def test_default_timeout(self):
+        session = get_session('https://gitlab.example.com', 'token')
+        with mock.patch('requests.Session.request', return_value=FakeResponse({})) as request:
+            session.get('version')
+        self.assertEqual(request.call_args.kwargs['timeout'], settings.GITLAB_HTTP_TIMEOUT)
+        self.assertEqual(request.call_args.args[1], 'https://gitlab.example.com/api/v4/version')
+
+
+class ConditionalRequestTests(TestCase):
+    """GitLab GET 请求带上缓存的 ETag 发送条件请求，304 时使用缓存的内容"""
+
+    def setUp(self):
+        self.addCleanup(close_sessions)
+        self.sent = []
+
+    def send(self, session, request, **kwargs):
+        # 模拟 GitLab：内容未变化时返回 304，只带新的限流头
+        self.sent.append(dict(request.headers))
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        response.raw = io.BytesIO()
+        if request.headers.get('If-None-Match') == 'W/"v1"':
+            response.status_code = 304
+            response.headers = requests.structures.CaseInsensitiveDict({'RateLimit-Remaining': '99'})
+            response._content = b''
+        else:
+            response.status_code = 200
+            response.headers = requests.structures.CaseInsensitiveDict({
+                'ETag': 'W/"v1"', 'Content-Type': 'application/json',
+                'Link': '<https://gitlab.example.com/api/v4/projects?page=2>; rel="next"',
+            })
+            response._content = b'[{"id": 1}]'
+        return response
+
+    def test_sync_session_revalidates(self):
+        session = get_session('https://gitlab.example.com', 'token')
+        with mock.patch.object(GitLabSession, 'send', autospec=True, side_effect=self.send):
+            first = session.get('projects', params={'page': 1})
+            second = session.get('projects', params={'page': 1})
+            session.get('projects', params={'page': 2})
+
+        self.assertNotIn('If-None-Match', self.sent[0])
+        self.assertEqual(self.sent[1]['If-None-Match'], 'W/"v1"')
+        # 查询参数不同是不同的缓存条目
+        self.assertNotIn('If-None-Match', self.sent[2])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second.links['next']['url'], 'https://gitlab.example.com/api/v4/projects?page=2')
+        self.assertEqual(second.headers['RateLimit-Remaining'], '99')
+
+        # 令牌不同不共享缓存
+        with mock.patch.object(GitLabSession, 'send', autospec=True, side_effect=self.send):
+            get_session('https://gitlab.example.com', 'other').get('projects', params={'page': 1})
+        self.assertNotIn('If-None-Match', self.sent[3])
+
+    def test_async_session_revalidates(self):
+        def handler(session, path, params=None):
+            if path == 'projects' and self.sent:
+                return FakeResponse(None, status_code=304)
+            self.sent.append(path)
+            return FakeResponse([{'id': 1}], headers={'ETag': '"v1"'})
+
+        async def fetch():
+            try:
+                session = get_async_session('https://gitlab.example.com', 'token')
+                await session.get('projects')
+                return await session.get('projects')
+            finally:
+                await close_async_sessions()
+
+        with mock_async_gitlab(handler) as send:
+            response = async_to_sync(fetch)()
+        self.assertEqual(send.call_args.args[1].headers['If-None-Match'], '"v1"')
+        self.assertEqual(response.json(), [{'id': 1}])
+
+    def test_cache_is_size_bounded(self):
+        cache = ResponseCache(max_bytes=80)
+        for i in range(10):
+            cache.store(i, FakeResponse(None, headers={'ETag': f'"{i}"'}, content=b'x' * 10))
+        self.assertEqual(cache.stats()['bytes'], 80)
+        self.assertIsNone(cache.get(1))
+        self.assertIsNotNone(cache.get(9))
+        # 超过总大小 1/8 的响应不缓存
+        cache.store('big', FakeResponse(None, headers={'ETag': '"big"'}, content=b'x' * 11))
+        self.assertIsNone(cache.get('big'))
+
+
+def mock_async_gitlab(handler):
+    """
+    把异步客户端发出的请求交给 handler(session, url, params) 处理，url 为 /api/v4/ 之后的相对路径
+    handler 返回 FakeResponse，或抛出 httpx 异常
+    """
+    async def send(client, request, **kwargs):
+        path = request.url.path.split('/api/v4/', 1)[1]
+        response = handler(None, path, params=dict(request.url.params))
+        headers = dict(response.headers)
+        if response.links:
+            headers['Link'] = ', '.join(f'<{link["url"]}>; rel="{rel}"' for rel, link in response.links.items())
+        return httpx.Response(response.status_code, json=response.data, headers=headers, request=request)
+
+    return mock.patch.object(httpx.AsyncClient, 'send', autospec=True, side_effect=send)
+
+
+class GitLabListingTests(TestCase):
+    """GitLab 项目与组的完整分页"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='admin', password='admin')
+        cls.config = GitLabConfig.objects.create(url='https://gitlab.example.com', token='secret')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.requests = []
+
+    def tearDown(self):
+        close_sessions()
+
+    def keyset_pages(self, session, url, params=None, **kwargs):
+        # 模拟 GitLab keyset 分页：id_after 指向上一页最后一个项目
+        self.requests.append((url, dict(params)))
+        per_page = int(params['per_page'])
+        after = int(params.get('id_after', 0))
+        projects = [
+            {'id': i, 'name': f'app-{i}', 'path_with_namespace': f'team/app-{i}', 'web_url': f'https://x/{i}'}
+            for i in range(after + 1, min(after + per_page, 250) + 1)
+        ]
+        links = {}
+        if projects and projects[-1]['id'] < 250:
+            query = urlencode({**params, 'id_after': projects[-1]['id']})
+            links['next'] = {'url': f'https://gitlab.example.com/api/v4/projects?{query}'}
+        return FakeResponse(projects, links=links)
+
+    def test_iterator_follows_every_page(self):
+        with mock.patch.object(GitLabSession, 'get', autospec=True, side_effect=self.keyset_pages):
+            projects = iter_gitlab_projects(self.config.url, self.config.token)
+            self.assertEqual(next(projects)['id'], '1')
+            self.assertEqual(len(self.requests), 1)  # 按需获取下一页
+            self.assertEqual(len(list(projects)), 249)
+
+        self.assertEqual(len(self.requests), 3)
+        self.assertEqual(self.requests[0][1]['pagination'], 'keyset')
+
+    def test_projects_endpoint_cursor(self):
+        url = f'/api/gitlab/configs/{self.config.id}/projects'
+        with mock_async_gitlab(self.keyset_pages):
+            pages = [self.client.get(url).json()]
+            while pages[-1]['next_cursor']:
+                pages.append(self.client.get(url, {'cursor': pages[-1]['next_cursor']}).json())
+            invalid = self.client.get(url, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual([len(page['items']) for page in pages], [100, 100, 50])
+        self.assertEqual(pages[2]['items'][-1]['id'], '250')
+        self.assertEqual(invalid.status_code, 400)
+        # 请求始终发往配置的实例，游标只携带查询参数
+        self.assertEqual({url for url, _ in self.requests}, {'projects'})
+
+    @override_settings(GITLAB_MAX_RETRIES=0)
+    def test_gitlab_error(self):
+        url = f'/api/gitlab/configs/{self.config.id}/groups'
+
+        def down(session, url, params=None):
+            raise httpx.ConnectError('down')
+
+        with mock_async_gitlab(down), self.assertLogs('gitlab_integration.api', 'WARNING'):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 502)
+
+    def test_connection_endpoint(self):
+        def version(session, url, params=None):
+            return FakeResponse({'version': '17.0.0'})
+
+        with mock_async_gitlab(version):
+            response = self.client.post(f'/api/gitlab/configs/{self.config.id}/test')
+        self.assertEqual(response.json(), {'success': True, 'message': 'Successfully connected to GitLab 17.0.0'})
+
+    def spy_aclose(self):
+        return mock.patch.object(httpx.AsyncClient, 'aclose', autospec=True, side_effect=httpx.AsyncClient.aclose)
+
+    def test_async_clients_are_closed_after_wsgi_requests(self):
+        def version(session, url, params=None):
+            return FakeResponse({'version': '17.0.0'})
+
+        url = f'/api/gitlab/configs/{self.config.id}/test'
+        with mock_async_gitlab(version), self.spy_aclose() as aclose:
+            for _ in range(3):
+                self.client.post(url)
+        # WSGI 下每个请求使用自己的事件循环，请求结束时关闭其中创建的客户端
+        self.assertEqual(aclose.call_count, 3)
+        self.assertTrue(all(call.args[0].is_closed for call in aclose.call_args_list))
+
+        async def asgi_requests():
+            await self.async_client.aforce_login(self.user)
+            for _ in range(2):
+                await self.async_client.post(url)
+            await close_async_sessions()
+
+        with mock_async_gitlab(version), self.spy_aclose() as aclose:
+            async_to_sync(asgi_requests)()
+        # ASGI 下事件循环长期存在，两个请求共用同一个客户端，直到显式关闭
+        self.assertEqual(aclose.call_count, 1)
+
+    def test_async_endpoints_require_login(self):
+        self.client.logout()
+        response = self.client.get(f'/api/gitlab/configs/{self.config.id}/projects')
+        self.assertEqual(response.status_code, 401)
+
+
+class GitLabCatalogTests(TestCase):
+    """本地项目/组目录的全量与增量同步"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='admin', password='admin')
+        cls.config = GitLabConfig.objects.create(url='https://gitlab.example.com', token='secret')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.requests = []
+        self.projects = {
+            i: {
+                'id': i, 'name': f'app-{i}', 'path_with_namespace': f'team/app-{i:03d}', 'web_url': f'https://x/{i}',
+                'visibility': 'private', 'archived': False, 'last_activity_at': '2026-01-01T00:00:00Z',
+            }
+            for i in range(1, 121)
+        }
+        self.groups = [
+            {'id': 1, 'parent_id': None, 'name': 'team', 'path': 'team', 'full_path': 'team', 'web_url': 'https://x/team'},
+        ]
+
+    def tearDown(self):
+        close_sessions()
+
+    def gitlab(self, session, url, params=None, **kwargs):
+        self.requests.append((url, dict(params)))
+        if url == 'groups':
+            return FakeResponse(self.groups)
+        per_page = int(params['per_page'])
+        after = int(params.get('id_after', 0))
+        ids = sorted(i for i in self.projects if i > after)
+        if 'last_activity_after' in params:
+            ids = [i for i in ids if self.projects[i]['last_activity_at'] > params['last_activity_after']]
+        page = ids[:per_page]
+        links = {}
+        if len(ids) > per_page:
+            query = urlencode({**params, 'id_after': page[-1]})
+            links['next'] = {'url': f'https://gitlab.example.com/api/v4/projects?{query}'}
+        return FakeResponse([self.projects[i] for i in page], links=links)
+
+    def sync(self, *args):
+        with mock.patch.object(GitLabSession, 'get', autospec=True, side_effect=self.gitlab):
+            sync_catalog(self.config, *args)
+
+    def test_full_then_incremental_sync(self):
+        self.sync()
+        self.assertEqual(self.config.projects.count(), 120)
+        self.assertEqual(self.config.groups.count(), 1)
+        self.assertNotIn('last_activity_after', self.requests[-1][1])
+
+        # 增量同步只拉取有新活动的项目，被删除的项目要等到全量同步才清理
+        self.requests = []
+        self.projects[5].update(name='renamed', last_activity_at='2099-01-01T00:00:00Z')
+        del self.projects[6]
+        self.sync()
+
+        project_requests = [params for url, params in self.requests if url == 'projects']
+        self.assertEqual(len(project_requests), 1)
+        self.assertIn('last_activity_after', project_requests[0])
+        self.assertEqual(self.config.projects.get(gitlab_id=5).name, 'renamed')
+        self.assertTrue(self.config.projects.filter(gitlab_id=6).exists())
+
+        self.sync(True)
+        self.assertFalse(self.config.projects.filter(gitlab_id=6).exists())
+        self.assertEqual(self.config.projects.count(), 119)
+
+    def test_group_tree_resolution(self):
+        self.addCleanup(invalidate_group_trees)
+        self.groups += [
+            {'id': 2, 'parent_id': 1, 'name': 'sub', 'path': 'sub', 'full_path': 'team/sub', 'web_url': 'https://x/2'},
+            {'id': 3, 'parent_id': 2, 'name': 'deep', 'path': 'deep', 'full_path': 'team/sub/deep', 'web_url': 'https://x/3'},
+            {'id': 4, 'parent_id': None, 'name': 'teamx', 'path': 'teamx', 'full_path': 'teamx', 'web_url': 'https://x/4'},
+        ]
+        self.projects[1]['path_with_namespace'] = 'team/sub/deep/app'
+        self.projects[2]['path_with_namespace'] = 'team/sub/app'
+        self.projects[3]['path_with_namespace'] = 'teamx/app'
+        client = GitLabClient(self.config)
+
+        # 目录未同步时通过 include_subgroups 一次列出，重复展开使用缓存
+        live = [{'id': 1, 'name': 'app', 'path_with_namespace': 'team/sub/deep/app'}]
+        with mock.patch.object(GitLabSession, 'get', autospec=True, return_value=FakeResponse(live)) as get:
+            self.assertEqual(resolve_group_projects(client, 2), live)
+            self.assertEqual(resolve_group_projects(client, 2), live)
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(get.call_args[1]['params']['include_subgroups'], 'true')
+
+        # 同步后缓存失效，从本地目录展开所有后代组的项目，不访问 GitLab
+        self.sync()
+        with mock.patch.object(GitLabSession, 'get', autospec=True) as get:
+            projects = resolve_group_projects(client, 2)
+            self.assertEqual([p['path_with_namespace'] for p in projects], ['team/sub/deep/app', 'team/sub/app'])
+            by_path = resolve_group_projects(client, 'team')
+            self.assertEqual(len(by_path), 119)
+            self.assertNotIn('teamx/app', [p['path_with_namespace'] for p in by_path])
+        get.assert_not_called()
+
+    def test_endpoints_use_local_catalog(self):
+        self.sync()
+        self.requests = []
+        url = f'/api/gitlab/configs/{self.config.id}/projects'
+
+        with mock.patch.object(GitLabSession, 'get', autospec=True, side_effect=self.gitlab):
+            first = self.client.get(url, {'limit': 100}).json()
+            second = self.client.get(url, {'limit': 100, 'cursor': first['next_cursor']}).json()
+            groups = self.client.get(f'/api/gitlab/configs/{self.config.id}/groups').json()
+
+        self.assertEqual(self.requests, [])
+        self.assertEqual(first['items'][0]['path_with_namespace'], 'team/app-001')
+        self.assertEqual(len(first['items']) + len(second['items']), 120)
+        self.assertIsNone(second['next_cursor'])
+        self.assertEqual([group['full_path'] for group in groups['items']], ['team'])
+
+    def test_filters(self):
+        self.sync()
+        self.config.projects.filter(gitlab_id__in=[1, 2]).update(visibility='public')
+        self.config.projects.filter(gitlab_id=3).update(path_with_namespace='team/Backend/api')
+        self.config.projects.filter(gitlab_id=4).update(path_with_namespace='teams/other')
+        url = f'/api/gitlab/configs/{self.config.id}/projects'
+
+        def paths(**params):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            return [item['path_with_namespace'] for item in response.json()['items']]
+
+        self.assertEqual(paths(search='BACKEND'), ['team/Backend/api'])
+        self.assertEqual(paths(search='app-00', visibility='public'), ['team/app-001', 'team/app-002'])
+        self.assertEqual(paths(namespace='team/Backend'), ['team/Backend/api'])
+        self.assertNotIn('teams/other', paths(namespace='team'))
+        self.assertEqual(paths(namespace='teams/'), ['teams/other'])
+        self.assertEqual(self.client.get(url, {'visibility': 'secret'}).status_code, 422)
+
+    def test_namespace_filter_requires_catalog(self):
+        response = self.client.get(f'/api/gitlab/configs/{self.config.id}/projects', {'namespace': 'team'})
+        self.assertEqual(response.status_code, 400)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class RequestSchedulerTests(TestCase):
+    """GitLab 请求调度：令牌桶、Retry-After、重试与熔断"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = RequestScheduler(
+            'gitlab.example.com', rate=2, burst=2, failure_threshold=3, reset_seconds=30, max_wait=60,
+            clock=self.clock, sleep=self.clock.sleep
+        )
+        self.session = GitLabSession('https://gitlab.example.com', 'secret', scheduler=self.scheduler, max_retries=3)
+        self.addCleanup(self.session.close)
+
+    def respond(self, *responses):
+        return mock.patch.object(requests.Session, 'request', side_effect=list(responses))
+
+    def test_token_bucket_paces_requests(self):
+        self.assertEqual([self.scheduler.reserve() for _ in range(3)], [0, 0, 0.5])
+
+    def test_rate_limit_headers_slow_down_and_retry_after_pauses(self):
+        reset = time.time() + 100
+        self.scheduler.update_from_headers({'RateLimit-Remaining': '10', 'RateLimit-Reset': str(reset)})
+        self.assertAlmostEqual(self.scheduler.state()['rate'], 0.1, places=2)
+
+        with self.respond(FakeResponse({}, 429, headers={'Retry-After': '20'}), FakeResponse({'ok': True})):
+            response = self.session.get('version')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(self.clock.now, 1020)
+
+    def test_retries_idempotent_requests_only(self):
+        with self.respond(requests.ConnectionError('reset'), FakeResponse({}, 502), FakeResponse({'ok': True})) as request, \
+                self.assertLogs('gitlab_integration.scheduler', 'WARNING'):
+            self.assertEqual(self.session.get('version').status_code, 200)
+        self.assertEqual(request.call_count, 3)
+
+        with self.respond(FakeResponse({}, 502), FakeResponse({'ok': True})) as request:
+            self.assertEqual(self.session.post('projects/1/hooks').status_code, 502)
+        self.assertEqual(request.call_count, 1)
+
+    def test_circuit_breaker(self):
+        with self.respond(*[FakeResponse({}, 503)] * 3) as request, self.assertLogs('gitlab_integration', 'WARNING'):
+            self.assertEqual(self.session.post('projects/1/hooks').status_code, 503)
+            self.session.post('projects/1/hooks')
+            self.session.post('projects/1/hooks')
+            with self.assertRaises(CircuitOpenError) as ctx:
+                self.session.get('version')
+        self.assertEqual(request.call_count, 3)
+        self.assertEqual(ctx.exception.retry_after, 30)
+        self.assertEqual(self.scheduler.state()['circuit'], 'open')
+
+        # 冷却结束后放行一个探测请求，成功则恢复
+        self.clock.now += 30
+        with self.respond(FakeResponse({'ok': True})), self.assertLogs('gitlab_integration.scheduler', 'INFO'):
+            self.assertEqual(self.session.get('version').status_code, 200)
+        self.assertEqual(self.scheduler.state()['circuit'], 'closed')
+
+    def test_long_rate_limit_pause_raises(self):
+        self.scheduler.update_from_headers({'Retry-After': '300'})
+        with self.assertRaises(RateLimitedError):
+            self.session.get('version')
+
+    def open_circuit(self):
+        with self.assertLogs('gitlab_integration.scheduler', 'WARNING'):
+            for _ in range(3):
+                self.scheduler.record_failure()
+        self.clock.now += 30
+
+    def test_rate_limited_probe_does_not_block_half_open_circuit(self):
+        self.open_circuit()
+        self.scheduler.update_from_headers({'Retry-After': '90'})
+        with self.assertRaises(RateLimitedError):
+            self.session.get('version')
+
+        # 限流结束后仍可以探测，而不是一直停在 half-open
+        self.clock.now += 90
+        with self.respond(FakeResponse({'ok': True})), self.assertLogs('gitlab_integration.scheduler', 'INFO'):
+            self.assertEqual(self.session.get('version').status_code, 200)
+        self.assertEqual(self.scheduler.state()['circuit'], 'closed')
+
+    def test_probe_released_when_request_is_abandoned(self):
+        self.open_circuit()
+        with self.respond(ValueError('bad url')), self.assertRaises(ValueError):
+            self.session.get('version')
+        wait, probe = self.scheduler.start_request()
+        self.assertTrue(probe)
+
+    def test_cancelled_async_probe_is_released(self):
+        self.open_circuit()
+        session = AsyncGitLabSession('https://gitlab.example.com', 'secret', scheduler=self.scheduler)
+
+        async def get():
+            try:
+                await session.get('version')
+            finally:
+                await session.aclose()
+
+        with mock.patch.object(httpx.AsyncClient, 'request', side_effect=asyncio.CancelledError), \
+                self.assertRaises(asyncio.CancelledError):
+            async_to_sync(get)()
+        self.assertTrue(self.scheduler.start_request()[1])
+
+
+class DeploymentSchedulerTests(DeploymentTestCase):
+    """GitLab 熔断时部署任务排队等待，不消耗重试次数"""
+
+    def test_job_is_deferred_while_circuit_is_open(self):
+        deployment_id = self.deploy()['id']
+        scheduler = get_scheduler(self.config.url, self.config.token)
+        with self.assertLogs('gitlab_integration.scheduler', 'WARNING'):
+            for _ in range(scheduler.failure_threshold):
+                scheduler.record_failure()
+
+        response = self.client.get(f'/api/gitlab/configs/{self.config.id}/scheduler')
+        self.assertEqual(response.json()['circuit'], 'open')
+
+        with self.assertLogs('deployments.worker', 'WARNING'):
+            self.assertTrue(DeploymentWorker('test-worker').run_one())
+        job = DeploymentJob.objects.get()
+        self.assertEqual((job.status, job.attempts), ('queued', 0))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertEqual(Deployment.objects.get(id=deployment_id).status, 'pending')
+
+
+class MultiInstanceDeploymentTests(DeploymentTestCase):
+    """按配置缓存客户端，部署记录目标实例，跨实例部署并发执行"""
+
+    def setUp(self):
+        super().setUp()
+        self.other = GitLabConfig.objects.create(url='https://gitlab.other.example.com', token='other')
+        self.deployed = []
+        self.failing = set()
+        self.addCleanup(clear_clients)
+
+    def deploy_project_hook(self, client, project_id, hook_file_path, hook_type):
+        self.deployed.append((client.config.id, project_id))
+        return client.config.id not in self.failing
+
+    def test_registry_caches_clients_until_config_changes(self):
+        client = get_client(self.other.id)
+        self.assertIs(get_client(self.other.id), client)
+        self.assertEqual(get_client().config.id, self.config.id)
+
+        self.other.token = 'rotated'
+        self.other.save()
+        client = get_client(self.other.id)
+        self.assertEqual(client.token, 'rotated')
+
+        self.other.is_active = False
+        self.other.save()
+        with self.assertRaises(ValueError):
+            get_client(self.other.id)
+
+    def test_deployment_records_instance(self):
+        with mock.patch.object(GitLabClient, 'deploy_project_hook', autospec=True, side_effect=self.deploy_project_hook):
+            data = self.client.post(
+                f'/api/deployments/{self.hook.id}/deploy',
+                {'deployment_level': 'project', 'target_id': '7', 'gitlab_config_id': self.other.id},
+                content_type='application/json',
+            ).json()
+            DeploymentWorker('test-worker').run_one()
+
+        self.assertEqual(data['gitlab_config_id'], self.other.id)
+        self.assertEqual(self.deployed, [(self.other.id, '7')])
+
+        response = self.client.post(
+            f'/api/deployments/{self.hook.id}/deploy',
+            {'deployment_level': 'server', 'gitlab_config_id': 999},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_cross_instance_deployment(self):
+        self.failing = {self.other.id}
+        data = self.client.post(
+            f'/api/deployments/{self.hook.id}/deploy',
+            {
+                'deployment_level': 'project', 'target_id': '42', 'target_name': 'team/app',
+                'gitlab_config_ids': [self.config.id, self.other.id],
+            },
+            content_type='application/json',
+        ).json()
+        self.assertTrue(data['cross_instance'])
+        self.assertIsNone(data['gitlab_config_id'])
+
+        worker = DeploymentWorker('test-worker')
+        with mock.patch.object(GitLabClient, 'deploy_project_hook', autospec=True, side_effect=self.deploy_project_hook), \
+                self.assertLogs('deployments.worker', 'ERROR'):
+            worker.run_one()
+        # 各实例中项目 id 不同，按路径部署
+        self.assertCountEqual(self.deployed, [(self.config.id, 'team/app'), (self.other.id, 'team/app')])
+        results = self.client.get(f'/api/deployments/{data["id"]}/results').json()['items']
+        self.assertEqual(
+            {item['gitlab_config_id']: item['status'] for item in results},
+            {self.config.id: 'success', self.other.id: 'failed'}
+        )
+
+        # 重试时只部署失败的实例
+        self.failing = set()
+        self.deployed = []
+        DeploymentJob.objects.update(run_after=timezone.now())
+        with mock.patch.object(GitLabClient, 'deploy_project_hook', autospec=True, side_effect=self.deploy_project_hook):
+            worker.run_one()
+        self.assertEqual(self.deployed, [(self.other.id, 'team/app')])
+        self.assertEqual(Deployment.objects.get(id=data['id']).status, 'success')
+
+
+class SystemHookTests(DeploymentTestCase):
+    """GitLab 系统钩子：接收时只入库，worker 更新本地目录并把组级别 Hook 自动部署到新项目"""
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        GitLabConfig.objects.filter(pk=self.config.pk).update(
+            system_hook_token='s3cret', projects_synced_at=now, groups_synced_at=now
+        )
+        for gitlab_id, full_path in ((9, 'team'), (10, 'team/sub')):
+            GitLabGroup.objects.create(
+                config=self.config, gitlab_id=gitlab_id, name=full_path, path=full_path.rsplit('/', 1)[-1],
+                full_path=full_path, web_url=f'https://gitlab.example.com/groups/{full_path}', synced_at=now
+            )
+        self.addCleanup(invalidate_group_trees)
+
+    def post_event(self, payload, token='s3cret'):
+        return self.client.post(
+            '/api/gitlab/system-hooks/', payload, content_type='application/json', HTTP_X_GITLAB_TOKEN=token
+        )
+
+    def test_token_is_verified(self):
+        self.client.logout()
+        self.assertEqual(self.post_event({'event_name': 'project_create'}, token='wrong').status_code, 401)
+        self.assertEqual(self.post_event({'event_name': 'project_create'}, token='').status_code, 401)
+
+        # 不处理的事件直接确认，不入库
+        response = self.post_event({'event_name': 'repository_update'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json(), {'id': None, 'queued': False})
+        self.assertFalse(SystemHookEvent.objects.exists())
+
+    def test_project_create_updates_catalog_and_deploys_group_hooks(self):
+        Deployment.objects.create(
+            hook=self.hook, hook_version=self.hook.versions.first(), deployment_level='group', target_id='9',
+            target_name='team', status='success', gitlab_config=self.config, deployed_by=self.user
+        )
+        self.client.logout()
+        payload = {
+            'event_name': 'project_create', 'project_id': 77, 'name': 'api', 'path': 'api',
+            'path_with_namespace': 'team/sub/api', 'project_visibility': 'internal',
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_event(payload)
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(response.json()['queued'])
+        # 接收时只查询配置并写入事件
+        self.assertEqual(len(queries), 2)
+        self.assertFalse(self.config.projects.exists())
+
+        deployed = []
+        worker = DeploymentWorker('test-worker')
+        with mock.patch.object(
+            GitLabClient, 'deploy_project_hook', autospec=True,
+            side_effect=lambda client, project_id, *args: deployed.append(project_id) or True
+        ):
+            self.assertTrue(worker.run_one())
+            project = self.config.projects.get(gitlab_id=77)
+            self.assertEqual((project.path_with_namespace, project.visibility), ('team/sub/api', 'internal'))
+            self.assertEqual(SystemHookEvent.objects.get().status, 'done')
+
+            # 重复投递不会重复部署
+            self.post_event(payload)
+            worker.run_one()
+            auto = Deployment.objects.get(deployment_level='project')
+            self.assertEqual((auto.target_id, auto.target_name, auto.deployed_by), ('77', 'team/sub/api', self.user))
+
+            worker.run_one()
+        self.assertEqual(deployed, ['77'])
+        auto.refresh_from_db()
+        self.assertEqual(auto.status, 'success')
+
+    def test_namespaces_are_resolved_outside_the_transaction(self):
+        GitLabConfig.objects.filter(pk=self.config.pk).update(groups_synced_at=None)
+        depth = len(connection.atomic_blocks)
+        lookups = []
+
+        def get(session, url, **kwargs):
+            lookups.append(len(connection.atomic_blocks))
+            return FakeResponse({'id': 9}) if url == 'groups/team' else FakeResponse({}, status_code=404)
+
+        self.post_event({
+            'event_name': 'project_create', 'project_id': 77, 'name': 'api', 'path': 'api',
+            'path_with_namespace': 'team/sub/api',
+        })
+        with mock.patch.object(GitLabSession, 'get', autospec=True, side_effect=get):
+            DeploymentWorker('test-worker').run_one()
+        self.assertEqual(lookups, [depth, depth])
+        self.assertEqual(SystemHookEvent.objects.get().status, 'done')
+
+    @override_settings(GITLAB_EVENT_MAX_ATTEMPTS=2)
+    def test_failed_events_are_retried_with_backoff(self):
+        self.post_event({'event_name': 'group_create', 'group_id': 11, 'name': 'new', 'path': 'new', 'full_path': 'new'})
+        worker = DeploymentWorker('test-worker')
+
+        # GitLab 暂时不可用：推迟处理，不消耗重试次数
+        with mock.patch('gitlab_integration.events.apply_to_catalog', side_effect=CircuitOpenError('open', 30)), \
+                self.assertLogs('gitlab_integration.events', 'WARNING'):
+            worker.run_one()
+        event = SystemHookEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), ('pending', 0))
+        self.assertGreater(event.run_after, timezone.now() + timedelta(seconds=20))
+
+        with mock.patch('gitlab_integration.events.apply_to_catalog', side_effect=RuntimeError('boom')), \
+                self.assertLogs('gitlab_integration.events', 'ERROR'):
+            for attempt in (1, 2):
+                SystemHookEvent.objects.update(run_after=timezone.now())
+                worker.run_one()
+                event.refresh_from_db()
+                self.assertEqual((event.attempts, event.error_message), (attempt, 'boom'))
+                # 退避期间不会被领取
+                self.assertFalse(worker.run_one())
+        self.assertEqual(event.status, 'failed')
+        self.assertIsNotNone(event.processed_at)
+
+    def test_group_events(self):
+        now = timezone.now()
+        GitLabProject.objects.create(
+            config=self.config, gitlab_id=1, name='app', path_with_namespace='team/sub/app',
+            web_url='https://gitlab.example.com/team/sub/app', synced_at=now
+        )
+        worker = DeploymentWorker('test-worker')
+
+        self.post_event({
+            'event_name': 'group_rename', 'group_id': 9, 'name': 'core', 'path': 'core',
+            'full_path': 'core', 'old_full_path': 'team',
+        })
+        self.post_event({
+            'event_name': 'group_create', 'group_id': 11, 'name': 'new', 'path': 'new', 'full_path': 'core/new',
+        })
+        while worker.run_one():
+            pass
+
+        self.assertEqual(
+            sorted(self.config.groups.values_list('full_path', 'parent_id')),
+            [('core', None), ('core/new', 9), ('core/sub', None)]
+        )
+        project = self.config.projects.get()
+        self.assertEqual(
+            (project.path_with_namespace, project.web_url), ('core/sub/app', 'https://gitlab.example.com/core/sub/app')
+        )
+
+        self.post_event({'event_name': 'group_destroy', 'group_id': 9, 'full_path': 'core'})
+        worker.run_one()
+        self.assertFalse(self.config.groups.exists())
+        self.assertFalse(self.config.projects.exists())
+
+    def test_subgroup_create(self):
+        self.post_event({
+            'event_name': 'subgroup_create', 'group_id': 12, 'name': 'Tools', 'path': 'tools',
+            'full_path': 'team/sub/tools', 'parent_group_id': 10, 'parent_full_path': 'team/sub',
+        })
+        DeploymentWorker('test-worker').run_one()
+
+        self.assertEqual(SystemHookEvent.objects.get().status, 'done')
+        group = self.config.groups.get(gitlab_id=12)
+        self.assertEqual(
+            (group.name, group.path, group.full_path, group.parent_id, group.web_url),
+            ('Tools', 'tools', 'team/sub/tools', 10, 'https://gitlab.example.com/groups/team/sub/tools')
+        )
+
+    def test_subgroup_destroy(self):
+        now = timezone.now()
+        GitLabProject.objects.create(
+            config=self.config, gitlab_id=1, name='app', path_with_namespace='team/sub/app',
+            web_url='https://gitlab.example.com/team/sub/app', synced_at=now
+        )
+        GitLabProject.objects.create(
+            config=self.config, gitlab_id=2, name='web', path_with_namespace='team/web',
+            web_url='https://gitlab.example.com/team/web', synced_at=now
+        )
+        self.post_event({
+            'event_name': 'subgroup_destroy', 'group_id': 10, 'name': 'sub', 'path': 'sub',
+            'full_path': 'team/sub', 'parent_group_id': 9, 'parent_full_path': 'team',
+        })
+        DeploymentWorker('test-worker').run_one()
+
+        self.assertEqual(SystemHookEvent.objects.get().status, 'done')
+        self.assertEqual(list(self.config.groups.values_list('full_path', flat=True)), ['team'])
+        self.assertEqual(list(self.config.projects.values_list('path_with_namespace', flat=True)), ['team/web'])
+
+
+class BulkDeploymentTests(DeploymentTestCase):
+    """批量部署通过 GitLab GraphQL 按批校验目标并解析名称"""
+
+    def setUp(self):
+        super().setUp()
+        self.queries = []
+
+    def graphql(self, session, url, json=None, **kwargs):
+        self.assertEqual(url, 'https://gitlab.example.com/api/graphql')
+        variables = json['variables']
+        self.queries.append(variables)
+        if 'ids' in variables:
+            nodes = [
+                {'id': gid, 'name': f'app-{gid.rsplit("/", 1)[1]}', 'fullPath': f'team/app-{gid.rsplit("/", 1)[1]}',
+                 'webUrl': 'https://x'}
+                for gid in variables['ids'] if int(gid.rsplit('/', 1)[1]) < 1000
+            ]
+            return FakeResponse({'data': {'projects': {
+                'nodes': nodes, 'pageInfo': {'hasNextPage': False, 'endCursor': None}
+            }}})
+        if 'fullPaths' in variables:
+            nodes = [{'id': 'gid://gitlab/Project/5000', 'name': 'api', 'fullPath': 'Team/API', 'webUrl': 'https://x'}]
+            return FakeResponse({'data': {'projects': {
+                'nodes': nodes, 'pageInfo': {'hasNextPage': False, 'endCursor': None}
+            }}})
+        return FakeResponse({'data': {
+            alias: {'id': 'gid://gitlab/Group/9', 'name': 'sub', 'path': 'sub', 'fullPath': 'team/sub', 'webUrl': 'https://x'}
+            if path == 'team/sub' else None
+            for alias, path in (('g' + key[1:], value) for key, value in variables.items())
+        }})
+
+    def bulk_deploy(self, level, targets):
+        with mock.patch.object(GitLabSession, 'post', autospec=True, side_effect=self.graphql):
+            return self.client.post(
+                f'/api/deployments/{self.hook.id}/deploy/bulk',
+                {'deployment_level': level, 'targets': targets},
+                content_type='application/json',
+            )
+
+    def test_projects_resolved_in_batches(self):
+        targets = [str(i) for i in range(1, 151)] + ['team/api', '7']
+        response = self.bulk_deploy('project', targets)
+        self.assertEqual(response.status_code, 200)
+
+        # 150 个 id 分两批，路径一批
+        self.assertEqual(len(self.queries), 3)
+        items = response.json()
+        self.assertEqual(len(items), 151)
+        self.assertEqual(items[-1]['target_id'], '5000')
+        self.assertEqual(items[-1]['target_name'], 'Team/API')
+        self.assertEqual(items[0]['target_name'], 'team/app-1')
+        self.assertEqual(DeploymentJob.objects.count(), 151)
+
+    def test_unknown_targets_are_rejected(self):
+        response = self.bulk_deploy('project', ['1', '1001'])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('1001', response.json()['message'])
+        self.assertFalse(Deployment.objects.exists())
+
+        response = self.bulk_deploy('group', ['team/sub', 'team/missing'])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('team/missing', response.json()['message'])
+
+        response = self.bulk_deploy('group', ['team/sub/'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(d['target_id'], d['target_name']) for d in response.json()], [('9', 'team/sub')])
+
+    def test_group_paths_resolved_in_small_alias_batches(self):
+        paths = ['team/sub'] + [f'team/missing-{i}' for i in range(69)]
+        session = GitLabSession('https://gitlab.example.com', 'secret')
+        with mock.patch.object(GitLabSession, 'post', autospec=True, side_effect=self.graphql):
+            found = fetch_groups(session, paths)
+
+        # 每个别名都计入查询复杂度，70 个路径拆成 30、30、10 三个查询
+        self.assertEqual([len(variables) for variables in self.queries], [30, 30, 10])
+        self.assertTrue(all(len(variables) <= GRAPHQL_ALIAS_BATCH_SIZE for variables in self.queries))
+        self.assertEqual(list(found), ['team/sub'])
+        self.assertEqual(found['team/sub']['id'], 9)
+
+
+class GitLabHealthTests(TestCase):
+    """后台并发探测所有实例，server-info 从探测记录汇总"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='admin', password='admin')
+        cls.up = GitLabConfig.objects.create(url='https://gitlab.example.com', token='secret')
+        cls.down = GitLabConfig.objects.create(url='https://down.example.com', token='secret')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    async def send(self, client, request, **kwargs):
+        if request.url.host == 'down.example.com':
+            raise httpx.ConnectError('connection refused', request=request)
+        return httpx.Response(200, json={'version': '17.5.1', 'revision': 'abc123'}, request=request)
+
+    def test_probes_all_configs(self):
+        with mock.patch.object(httpx.AsyncClient, 'send', autospec=True, side_effect=self.send), \
+                self.assertLogs('gitlab_integration.health', 'WARNING'):
+            samples = run_health_checks()
+        self.assertEqual([(sample.config_id, sample.ok) for sample in samples], [(self.up.id, True), (self.down.id, False)])
+
+        info = self.client.get(f'/api/gitlab/configs/{self.up.id}/server-info').json()
+        self.assertEqual((info['status'], info['version'], info['revision']), ('up', '17.5.1', 'abc123'))
+        self.assertEqual(info['samples'], 1)
+
+        info = self.client.get(f'/api/gitlab/configs/{self.down.id}/server-info').json()
+        self.assertEqual((info['status'], info['version'], info['availability']), ('down', None, 0.0))
+        self.assertIn('connection refused', info['error'])
+
+    def test_latency_percentiles_and_retention(self):
+        now = timezone.now()
+        GitLabHealthSample.objects.bulk_create([
+            GitLabHealthSample(
+                config=self.up, checked_at=now - timedelta(seconds=i), ok=i != 5, latency_ms=(i + 1) * 10,
+                version='17.5.1'
+            )
+            for i in range(20)
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            info = self.client.get(f'/api/gitlab/configs/{self.up.id}/server-info').json()
+        # 19 个成功样本的延迟为 10..200（去掉 60）
+        self.assertEqual((info['p50_ms'], info['p95_ms']), (110, 200))
+        self.assertEqual(info['availability'], 0.95)
+        self.assertLessEqual(len([q for q in queries if 'gitlab_integration_gitlabhealthsample' in q['sql']]), 3)
+
+        prune_samples(self.up, keep=5)
+        self.assertEqual(
+            list(self.up.health_samples.order_by('-checked_at').values_list('latency_ms', flat=True)),
+            [10, 20, 30, 40, 50]
+        )
+        self.assertEqual(self.client.get(f'/api/gitlab/configs/{self.down.id}/server-info').json()['status'], 'unknown')
+
+
+class AuditSinkTests(TestCase):
+    """审计日志缓冲后批量写入，数据库不可用时写入 spool 文件并在恢复后重放"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='admin', password='admin')
+
+    def setUp(self):
+        spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spool_dir)
+        self.spool = Path(spool_dir) / 'audit.jsonl'
+
+    def sink(self, **kwargs):
+        return AuditSink(spool_path=self.spool, background=False, **kwargs)
+
+    def entry(self, user=None, action='hook_create'):
+        return AuditLog(
+            user_id=(user or self.user).pk, action=action, resource_type='hook', details={'method': 'POST'},
+            ip_address='127.0.0.1', created_at=timezone.now()
+        )
+
+    @override_settings(AUDIT_LOG_BUFFERED=True)
+    def test_entries_are_written_in_one_batch(self):
+        sink = self.sink(batch_size=100)
+        for _ in range(50):
+            sink.add(self.entry())
+        self.assertEqual(sink.pending(), 50)
+        self.assertFalse(AuditLog.objects.exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(sink.flush())
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('INSERT')]), 1)
+        self.assertEqual(AuditLog.objects.count(), 50)
+
+    @override_settings(AUDIT_LOG_BUFFERED=True)
+    def test_spool_when_database_unavailable(self):
+        deleted = User.objects.create_user(username='gone')
+        sink = self.sink(max_buffer=3)
+        for user in (self.user, self.user, deleted):
+            sink.add(self.entry(user))
+        # 缓冲区已满，直接写入 spool
+        sink.add(self.entry(action='overflow'))
+        self.assertEqual(len(self.spool.read_text().splitlines()), 1)
+
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=OperationalError('database is locked')), \
+                self.assertLogs('audit.sink', 'WARNING'):
+            self.assertFalse(sink.flush())
+        self.assertEqual(len(self.spool.read_text().splitlines()), 4)
+        self.assertFalse(AuditLog.objects.exists())
+
+        deleted.delete()
+        self.assertTrue(sink.flush())
+        self.assertFalse(self.spool.exists())
+        self.assertEqual(AuditLog.objects.count(), 4)
+        self.assertEqual(AuditLog.objects.filter(user__isnull=True).count(), 1)
+        self.assertTrue(AuditLog.objects.filter(action='overflow').exists())
+
+    @override_settings(AUDIT_LOG_BUFFERED=True)
+    def test_replay_keeps_spool_when_user_lookup_fails(self):
+        sink = self.sink()
+        sink._spool([self.entry()])
+
+        with mock.patch.object(User.objects, 'filter', side_effect=OperationalError('database is locked')), \
+                self.assertLogs('audit.sink', 'WARNING'):
+            self.assertFalse(sink.flush())
+        self.assertFalse(AuditLog.objects.exists())
+
+        self.assertTrue(sink.flush())
+        self.assertEqual(AuditLog.objects.count(), 1)
+
+    @override_settings(AUDIT_LOG_BUFFERED=True)
+    def test_writer_thread_survives_flush_errors(self):
+        sink = AuditSink(spool_path=self.spool, flush_interval=0.01)
+        flushed = threading.Event()
+        errors = [RuntimeError('boom')]
+
+        def flush():
+            if errors:
+                raise errors.pop()
+            flushed.set()
+            return True
+
+        with mock.patch.object(sink, 'flush', side_effect=flush), self.assertLogs('audit.sink', 'ERROR'):
+            sink.add(self.entry())
+            self.assertTrue(flushed.wait(5))
+            self.assertTrue(sink._thread.is_alive())
+            sink.close()
+
+    @override_settings(AUDIT_LOG_BUFFERED=True)
+    def test_dead_writer_thread_is_restarted(self):
+        sink = AuditSink(spool_path=self.spool, flush_interval=0.01)
+        with mock.patch.object(sink, '_run'):
+            sink._ensure_started()
+            sink._thread.join()
+
+        flushed = threading.Event()
+        with mock.patch.object(sink, 'flush', side_effect=flushed.set):
+            sink.add(self.entry())
+            self.assertTrue(flushed.wait(5))
+            self.assertTrue(sink._thread.is_alive())
+            sink.close()
+
+    def test_middleware_records_mutating_requests(self):
+        self.client.force_login(self.user)
+        self.client.post('/api/gitlab/configs', {'url': 'https://gitlab.example.com', 'token': 'secret'},
+                         content_type='application/json')
+        log = AuditLog.objects.get()
+        self.assertEqual((log.action, log.user, log.details['request']['token']), ('gitlab_configs', self.user, '******'))
+
+
+class AuditMiddlewareTests(TestCase):
+    """审计中间件从 API 层记录的上下文取请求体和结果，不重新解析请求或响应"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='admin', password='admin')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_result_comes_from_audit_context(self):
+        with mock.patch('audit.middleware.json') as middleware_json, \
+                mock.patch.object(AuditLogMiddleware, 'should_log', autospec=True, return_value=True) as should_log:
+            response = self.client.post('/api/gitlab/configs', {'url': 'https://gitlab.example.com', 'token': 'secret'},
+                                        content_type='application/json')
+        middleware_json.loads.assert_not_called()
+        self.assertEqual(should_log.call_count, 1)
+        log = AuditLog.objects.get()
+        self.assertEqual(log.details['result_id'], response.json()['id'])
+        self.assertEqual(log.details['request'], {'url': 'https://gitlab.example.com', 'token': '******'})
+
+    @override_settings(AUDIT_LOG_MAX_BODY_SIZE=32)
+    def test_large_request_body_is_not_captured(self):
+        body = json.dumps({'url': 'https://gitlab.example.com', 'token': 'secret'})
+        self.client.post('/api/gitlab/configs', body, content_type='application/json')
+        self.assertEqual(AuditLog.objects.get().details['request'], {'omitted': 'body too large', 'size': len(body)})
+
+    def test_streaming_response_is_skipped(self):
+        request = RequestFactory().post('/api/hooks/1/download', '', content_type='application/json')
+        request.user = self.user
+        middleware = AuditLogMiddleware(lambda request: StreamingHttpResponse(iter([b'data'])))
+        response = middleware(request)
+        self.assertEqual(b''.join(response.streaming_content), b'data')
+        self.assertFalse(AuditLog.objects.exists())
+
+
+class AuditArchiveTests(TestCase):
+    """过期审计日志按天归档后从数据库删除，查询和导出接口在数据库中的日志之外继续读取归档"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='admin', password='admin')
+        now = timezone.now()
+        AuditLog.objects.bulk_create([
+            AuditLog(user=cls.user, action='hook_delete' if i % 2 else 'hook_create', resource_type='hook',
+                     resource_id=str(i), created_at=now - timedelta(days=days, minutes=i))
+            for i, days in enumerate([0, 0, 0, 10, 10, 10, 11, 30])
+        ])
+
+    def setUp(self):
+        archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_dir)
+        override = override_settings(AUDIT_LOG_ARCHIVE_DIR=archive_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client.force_login(self.user)
+
+    def archive(self):
+        call_command('audit_archive', days=5, batch_size=2, stdout=io.StringIO())
+
+    def test_old_entries_move_to_day_partitions(self):
+        self.archive()
+        self.assertEqual(sorted(AuditLog.objects.values_list('resource_id', flat=True)), ['0', '1', '2'])
+        days = archived_days()
+        self.assertEqual(sum(len(read_partition(day)) for day in days), 5)
+        self.assertTrue(all(Path(partition_path(day)).exists() for day in days))
+
+        # 再次运行没有新的过期日志，归档不变
+        self.archive()
+        self.assertEqual(sum(len(read_partition(day)) for day in days), 5)
+
+    def test_interrupted_run_is_repeatable(self):
+        # 归档文件已写入，删除时失败
+        with mock.patch.object(QuerySet, 'delete', side_effect=OperationalError('database is locked')), \
+                self.assertRaises(OperationalError):
+            self.archive()
+        self.assertEqual(AuditLog.objects.count(), 8)
+
+        self.archive()
+        self.assertEqual(AuditLog.objects.count(), 3)
+        records = [record for day in archived_days() for record in read_partition(day)]
+        self.assertEqual(len(records), len({record['id'] for record in records}))
+        self.assertEqual(len(records), 5)
+
+    def test_query_api_reads_back_from_archive(self):
+        expected = list(AuditLog.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.archive()
+
+        items, cursor = [], None
+        while True:
+            params = {'limit': 3, **({'cursor': cursor} if cursor else {})}
+            data = self.client.get('/api/audit-logs/', params).json()
+            items.extend(data['items'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual([item['id'] for item in items], expected)
+        self.assertEqual(items[-1]['user'], {'id': self.user.id, 'username': 'admin'})
+
+        start = (timezone.now() - timedelta(days=20)).isoformat()
+        data = self.client.get('/api/audit-logs/', {'action': 'hook_delete', 'start_date': start}).json()
+        self.assertEqual([item['resource_id'] for item in data['items']], ['1', '3', '5'])
+
+    @override_settings(AUDIT_LOG_ARCHIVE_SCAN_DAYS=1)
+    def test_each_page_opens_a_bounded_number_of_partitions(self):
+        expected = list(
+            AuditLog.objects.filter(action='hook_create').order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.archive()
+        self.assertGreater(len(archived_days()), 1)
+
+        items, cursor = [], None
+        while True:
+            params = {'action': 'hook_create', 'limit': 10, **({'cursor': cursor} if cursor else {})}
+            with mock.patch('audit.archive.read_partition', wraps=read_partition) as opened:
+                data = self.client.get('/api/audit-logs/', params).json()
+            self.assertLessEqual(opened.call_count, 1)
+            items.extend(data['items'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual([item['id'] for item in items], expected)
+
+    def export(self, **params):
+        response = self.client.get('/api/audit-logs/export', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_export_streams_archive_and_table(self):
+        expected = list(AuditLog.objects.order_by('created_at', 'id').values_list('id', flat=True))
+        self.archive()
+
+        # partitions are decoded line by line, never loaded whole
+        with mock.patch('audit.archive.read_partition', side_effect=AssertionError('partition loaded whole')):
+            response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual([record['id'] for record in records], expected)
+        self.assertEqual(records[0]['user'], {'id': self.user.id, 'username': 'admin'})
+
+        response, content = self.export(format='csv', gzip='true', action='hook_delete')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.csv.gz"'))
+        rows = list(csv.DictReader(io.StringIO(gzip.decompress(content).decode())))
+        self.assertEqual([row['resource_id'] for row in rows], ['7', '5', '3', '1'])
+        self.assertEqual(json.loads(rows[0]['details']), {})
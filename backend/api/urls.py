@@ -1,5 +1,6 @@
+import logging
+
 from django.urls import path
-from ninja import NinjaAPI
 from ninja.security import django_auth
 from ninja.errors import ValidationError
 
@@ -13,6 +14,7 @@ from hooks.api import router as hooks_router
 from deployments.api import router as deployments_router
 from gitlab_integration.api import router as gitlab_router
 from audit.api import router as audit_router
+from audit.context import AuditedNinjaAPI
 
 # 定义请求和响应模型
 class LoginRequest(BaseModel):
@@ -30,11 +32,13 @@ class UserResponse(BaseModel):
 class ErrorResponse(BaseModel):
     message: str
 
-api = NinjaAPI(title="GitLab Enhancer API", version="1.0.0")
+logger = logging.getLogger(__name__)
+
+api = AuditedNinjaAPI(title="GitLab Enhancer API", version="1.0.0")
 
 @api.exception_handler(ValidationError)
 def custom_validation_errors(request, exc):
-    print(exc.errors)  # <--------------------- !!!!
+    logger.info("Validation error on %s %s: %s", request.method, request.path, exc.errors)
     return api.create_response(request, {"detail": exc.errors}, status=422)
 
 # 注册各模块路由 - 添加认证要求
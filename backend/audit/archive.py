@@ -0,0 +1,262 @@
+import glob
+import gzip
+import json
+import logging
+import os
+import shutil
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.files import locks
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_DAYS = 90
+DEFAULT_ARCHIVE_BATCH_SIZE = 5000
+# At most this many partitions are opened for one page of the list API
+DEFAULT_ARCHIVE_SCAN_DAYS = 7
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def archive_dir():
+    return str(_setting('AUDIT_LOG_ARCHIVE_DIR', settings.BASE_DIR / 'audit_archive'))
+
+
+def partition_path(day):
+    """One gzipped NDJSON file per UTC day: <dir>/YYYY/MM/audit-YYYY-MM-DD.ndjson.gz"""
+    return os.path.join(archive_dir(), f"{day:%Y}", f"{day:%m}", f"audit-{day:%Y-%m-%d}.ndjson.gz")
+
+
+def _day_start(day):
+    return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+
+def archived_days():
+    """Days that have an archive partition, oldest first."""
+    days = []
+    for path in glob.glob(os.path.join(archive_dir(), '*', '*', 'audit-*.ndjson.gz')):
+        try:
+            days.append(date.fromisoformat(os.path.basename(path)[len('audit-'):-len('.ndjson.gz')]))
+        except ValueError:
+            continue
+    return sorted(days)
+
+
+def archive_horizon():
+    """Start of the day after the newest partition; nothing at or after it is archived. None without archives."""
+    days = archived_days()
+    return _day_start(days[-1] + timedelta(days=1)) if days else None
+
+
+def to_record(entry):
+    """The archived (and exported) form of an AuditLog; the username is kept in case the user is deleted."""
+    return {
+        'id': entry.id,
+        'user': {'id': entry.user.id, 'username': entry.user.username} if entry.user else None,
+        'action': entry.action,
+        'resource_type': entry.resource_type,
+        'resource_id': entry.resource_id,
+        'details': entry.details,
+        'ip_address': entry.ip_address,
+        'created_at': entry.created_at.isoformat(),
+    }
+
+
+def iter_partition(day):
+    """
+    Records of one day in file order, decoded one line at a time; multi-member
+    gzip files (from re-runs) read as one stream.
+    """
+    path = partition_path(day)
+    if not os.path.exists(path):
+        return
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_partition(day):
+    """All records of one day, in file order."""
+    return list(iter_partition(day))
+
+
+def archive_logs(before, batch_size=None):
+    """
+    Move every entry created before `before` into its day partition and delete
+    it from the table. Returns the number of entries archived.
+
+    Each day is written to a temporary file and renamed into place before any
+    row is deleted, and rows are then deleted by id in batches of batch_size,
+    each in its own short transaction. A run interrupted at any point can be
+    repeated: rows already present in a partition are not written twice.
+
+    Runs hold an exclusive lock on the archive directory, so overlapping runs
+    (cron and --interval) wait for each other instead of both rewriting the
+    same partition and deleting rows the other one dropped.
+    """
+    batch_size = batch_size or _setting('AUDIT_LOG_ARCHIVE_BATCH_SIZE', DEFAULT_ARCHIVE_BATCH_SIZE)
+    os.makedirs(archive_dir(), exist_ok=True)
+    total = 0
+    with open(os.path.join(archive_dir(), '.lock'), 'wb') as lock_file:
+        locks.lock(lock_file, locks.LOCK_EX)
+        while True:
+            oldest = AuditLog.objects.filter(created_at__lt=before).order_by('created_at', 'id').values_list(
+                'created_at', flat=True
+            ).first()
+            if oldest is None:
+                return total
+            day = oldest.astimezone(dt_timezone.utc).date()
+            total += _archive_day(day, min(_day_start(day + timedelta(days=1)), before), batch_size)
+
+
+def _archive_day(day, end, batch_size):
+    path = partition_path(day)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    existing = {record['id'] for record in iter_partition(day)}
+
+    rows = AuditLog.objects.filter(created_at__gte=_day_start(day), created_at__lt=end).select_related(
+        'user'
+    ).order_by('created_at', 'id')
+    ids = []
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'wb') as raw:
+            if existing:
+                # gzip members can be concatenated; keep the earlier run's member as-is
+                with open(path, 'rb') as old:
+                    shutil.copyfileobj(old, raw)
+            with gzip.GzipFile(fileobj=raw, mode='wb') as f:
+                last = None
+                while True:
+                    page = rows
+                    if last is not None:
+                        page = rows.filter(
+                            Q(created_at__gt=last.created_at) | Q(created_at=last.created_at, id__gt=last.id)
+                        )
+                    batch = list(page[:batch_size])
+                    if not batch:
+                        break
+                    lines = [json.dumps(to_record(entry), default=str) + '\n' for entry in batch
+                             if entry.id not in existing]
+                    f.write(''.join(lines).encode('utf-8'))
+                    ids.extend(entry.id for entry in batch)
+                    last = batch[-1]
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    for i in range(0, len(ids), batch_size):
+        AuditLog.objects.filter(id__in=ids[i:i + batch_size]).delete()
+    logger.info("Archived %s audit log entries from %s to %s", len(ids), day, path)
+    return len(ids)
+
+
+def _aware(value):
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def _matches(record, filters):
+    if filters is None:
+        return True
+    user = record['user']
+    if filters.user_id and (user or {}).get('id') != filters.user_id:
+        return False
+    if filters.action and record['action'] != filters.action:
+        return False
+    if filters.resource_type and record['resource_type'] != filters.resource_type:
+        return False
+    if filters.resource_id and record['resource_id'] != filters.resource_id:
+        return False
+    if filters.start_date and record['created_at'] < _aware(filters.start_date):
+        return False
+    if filters.end_date and record['created_at'] > _aware(filters.end_date):
+        return False
+    return True
+
+
+def _to_entry(record):
+    """An object shaped like AuditLog for AuditLogSchema and the keyset cursor."""
+    user = SimpleNamespace(**record['user']) if record['user'] else None
+    return SimpleNamespace(**{**record, 'user': user})
+
+
+def _partition_days(filters, until=None):
+    """Archived days inside the filter's date range (and not after `until`), oldest first."""
+    days = archived_days()
+    if filters is not None and filters.start_date:
+        days = [day for day in days if day >= _aware(filters.start_date).astimezone(dt_timezone.utc).date()]
+    upper = [until] if until is not None else []
+    if filters is not None and filters.end_date:
+        upper.append(_aware(filters.end_date))
+    if upper:
+        last_day = min(upper).astimezone(dt_timezone.utc).date()
+        days = [day for day in days if day <= last_day]
+    return days
+
+
+def _matching_records(day, filters):
+    """Records of one partition that match `filters`, oldest first."""
+    records = []
+    for record in read_partition(day):
+        record['created_at'] = parse_datetime(record['created_at'])
+        if _matches(record, filters):
+            records.append(record)
+    records.sort(key=lambda record: (record['created_at'], record['id']))
+    return records
+
+
+def read_archive(filters=None, before=None, limit=50, max_days=None):
+    """
+    Up to `limit` archived entries matching `filters`, newest first, strictly
+    before the (created_at, id) pair `before` when given. Only the partitions
+    inside the filter's date range are opened, and at most `max_days` of them
+    (AUDIT_LOG_ARCHIVE_SCAN_DAYS).
+
+    Returns (entries, resume): when the scan stops at max_days with older
+    partitions left unread, `resume` is the (created_at, id) pair to continue
+    from (the start of the oldest day read); otherwise it is None.
+    """
+    max_days = max_days or _setting('AUDIT_LOG_ARCHIVE_SCAN_DAYS', DEFAULT_ARCHIVE_SCAN_DAYS)
+    days = _partition_days(filters, before[0] if before is not None else None)
+    if before is not None:
+        days = [day for day in days if _day_start(day) < before[0]]
+
+    entries = []
+    for scanned, day in enumerate(reversed(days), start=1):
+        records = _matching_records(day, filters)
+        if before is not None:
+            records = [record for record in records if (record['created_at'], record['id']) < before]
+        entries.extend(_to_entry(record) for record in reversed(records))
+        if len(entries) >= limit:
+            return entries[:limit], None
+        if scanned >= max_days and scanned < len(days):
+            # ids are positive, so (day start, 0) sorts after every entry of the days already read
+            return entries, (_day_start(day), 0)
+    return entries, None
+
+
+def iter_archive(filters=None):
+    """
+    Yield archived records matching `filters` as (day, record) pairs, oldest
+    day first. Partitions are decoded line by line, so memory use does not
+    grow with the size of a day. Records come in file order, which is oldest
+    first: each archive run writes its rows sorted, after those of earlier runs.
+    """
+    for day in _partition_days(filters):
+        for record in iter_partition(day):
+            record['created_at'] = parse_datetime(record['created_at'])
+            if _matches(record, filters):
+                yield day, record
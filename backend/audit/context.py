@@ -0,0 +1,79 @@
+from django.conf import settings
+from ninja import NinjaAPI
+from ninja.parser import Parser
+
+# Request bodies larger than this are recorded by size only
+DEFAULT_MAX_BODY_SIZE = 64 * 1024
+
+_UNSET = object()
+
+
+def max_body_size():
+    return getattr(settings, 'AUDIT_LOG_MAX_BODY_SIZE', DEFAULT_MAX_BODY_SIZE)
+
+
+class AuditContext:
+    """
+    Per-request audit state, attached as request.audit by AuditLogMiddleware
+    for requests it is going to log (request.audit is None otherwise).
+
+    The API layer fills in the parsed request body and the id/name of the
+    returned object as it produces them, so the middleware never re-reads or
+    re-parses request or response bodies. Views that return something other
+    than the audited object can call set_result() themselves.
+    """
+
+    __slots__ = ('request_body', 'result_id', 'result_name', 'view_kwargs')
+
+    def __init__(self):
+        self.request_body = _UNSET
+        self.result_id = None
+        self.result_name = None
+        self.view_kwargs = {}
+
+    @property
+    def has_request_body(self):
+        return self.request_body is not _UNSET
+
+    def set_request_body(self, body, size):
+        if size > max_body_size():
+            self.request_body = {'omitted': 'body too large', 'size': size}
+        else:
+            self.request_body = body
+
+    def set_result(self, id=None, name=None):
+        # Stored in a JSONField; ids may be UUIDs before the response is rendered
+        if id is not None:
+            self.result_id = id if isinstance(id, (int, str)) else str(id)
+        if name is not None:
+            self.result_name = str(name)
+
+
+def audit_context(request):
+    """The request's AuditContext, or None when the request is not audited."""
+    return getattr(request, 'audit', None)
+
+
+class AuditParser(Parser):
+    """JSON parser that hands the parsed body to the audit context."""
+
+    def parse_body(self, request):
+        data = super().parse_body(request)
+        context = audit_context(request)
+        if context is not None:
+            context.set_request_body(data, len(request.body))
+        return data
+
+
+class AuditedNinjaAPI(NinjaAPI):
+    """NinjaAPI that records the id and name of returned objects in the audit context."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('parser', AuditParser())
+        super().__init__(*args, **kwargs)
+
+    def create_response(self, request, data, *, status=None, temporal_response=None):
+        context = audit_context(request)
+        if context is not None and isinstance(data, dict):
+            context.set_result(data.get('id'), data.get('name'))
+        return super().create_response(request, data, status=status, temporal_response=temporal_response)
@@ -0,0 +1,48 @@
+import signal
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from audit.archive import DEFAULT_RETENTION_DAYS, archive_dir, archive_logs
+
+
+class Command(BaseCommand):
+    help = "把超过保留天数的审计日志按天写入压缩归档（NDJSON + gzip）并分批从数据库删除"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=getattr(settings, 'AUDIT_LOG_RETENTION_DAYS', DEFAULT_RETENTION_DAYS),
+            help="保留最近多少天的日志（默认 AUDIT_LOG_RETENTION_DAYS）"
+        )
+        parser.add_argument('--batch-size', type=int, help="每批读取和删除的行数（默认 AUDIT_LOG_ARCHIVE_BATCH_SIZE）")
+        parser.add_argument(
+            '--interval', type=float, nargs='?', const=getattr(settings, 'AUDIT_LOG_ARCHIVE_INTERVAL', 24 * 3600),
+            help="每隔多少秒归档一次（不带值时使用 AUDIT_LOG_ARCHIVE_INTERVAL），持续运行直到收到 SIGTERM"
+        )
+
+    def handle(self, *args, **options):
+        stopping = False
+
+        def stop(*args):
+            nonlocal stopping
+            stopping = True
+
+        if options['interval']:
+            signal.signal(signal.SIGTERM, stop)
+            signal.signal(signal.SIGINT, stop)
+
+        while True:
+            before = timezone.now() - timedelta(days=options['days'])
+            count = archive_logs(before, options['batch_size'])
+            self.stdout.write(f"archived {count} audit log entries older than {before:%Y-%m-%d %H:%M} to {archive_dir()}")
+            if not options['interval']:
+                return
+
+            deadline = time.monotonic() + options['interval']
+            while not stopping and time.monotonic() < deadline:
+                time.sleep(min(1, options['interval']))
+            if stopping:
+                return
@@ -0,0 +1,116 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from audit.models import AuditLog
+
+ACTIONS = ['hook_create', 'hook_update', 'hook_delete', 'hook_deploy', 'deployment_create', 'gitlab_configs',
+           'gitlab_update', 'auth_login', 'auth_logout']
+RESOURCE_TYPES = ['hook', 'deployment', 'gitlab', 'auth']
+
+
+class Command(BaseCommand):
+    help = "基准测试：生成合成的审计日志，报告分页查询接口在各种过滤条件下的延迟（不会保留任何数据）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help="审计日志行数（验收目标为 10000000）")
+        parser.add_argument('--users', type=int, default=50, help="用户数量")
+        parser.add_argument('--samples', type=int, default=50, help="每种查询的采样次数")
+        parser.add_argument('--limit', type=int, default=50, help="每页条数")
+        parser.add_argument('--target-ms', type=float, default=100, help="p95 延迟目标（毫秒）")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        rows = options['rows']
+
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+            prefix = f'bench-audit-{time.time_ns()}'
+            users = User.objects.bulk_create(
+                [User(username=f'{prefix}-{i}') for i in range(options['users'])]
+            )
+
+            start = time.perf_counter()
+            self.seed(rng, users, rows)
+            with connection.cursor() as cursor:
+                # 让查询规划器拿到新数据的统计信息
+                cursor.execute('ANALYZE')
+            seed_seconds = time.perf_counter() - start
+            self.stdout.write(f"seeded {rows} rows in {seed_seconds:.1f} s")
+
+            client = Client()
+            client.force_login(users[0])
+            end = timezone.now()
+            limit = options['limit']
+            queries = {
+                'first page': lambda: {},
+                'by user': lambda: {'user_id': rng.choice(users).id},
+                'by action': lambda: {'action': rng.choice(ACTIONS)},
+                'by resource': lambda: {'resource_type': 'hook', 'resource_id': str(rng.randrange(1, 10000))},
+                'by date range': lambda: self.date_range(rng, end),
+                'by action + date range': lambda: {'action': rng.choice(ACTIONS), **self.date_range(rng, end)},
+            }
+
+            failed = []
+            for name, make_params in queries.items():
+                samples = []
+                deep = []
+                for _ in range(options['samples']):
+                    params = {**make_params(), 'limit': limit}
+                    start = time.perf_counter()
+                    data = client.get('/api/audit-logs/', params).json()
+                    samples.append((time.perf_counter() - start) * 1000)
+                    if data['next_cursor']:
+                        # 从第一页的游标继续翻页，耗时与页码无关
+                        start = time.perf_counter()
+                        client.get('/api/audit-logs/', {**params, 'cursor': data['next_cursor']})
+                        deep.append((time.perf_counter() - start) * 1000)
+                p95 = self.p95(samples + deep)
+                if p95 > options['target_ms']:
+                    failed.append(name)
+                self.stdout.write(
+                    f"{name:24} p50 {statistics.median(samples):7.2f} ms   p95 {p95:7.2f} ms   "
+                    f"next page p50 {statistics.median(deep) if deep else 0:7.2f} ms"
+                )
+
+            transaction.set_rollback(True)
+
+        if failed:
+            self.stdout.write(self.style.WARNING(f"p95 above {options['target_ms']:.0f} ms: {', '.join(failed)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"all queries p95 within {options['target_ms']:.0f} ms"))
+
+    def seed(self, rng, users, rows, chunk=10000):
+        """按时间顺序生成约一年的日志，分布大致接近真实使用"""
+        now = timezone.now()
+        step = timedelta(days=365) / rows
+        started = now - timedelta(days=365)
+        for offset in range(0, rows, chunk):
+            entries = []
+            for i in range(offset, min(offset + chunk, rows)):
+                resource_type = rng.choice(RESOURCE_TYPES)
+                entries.append(AuditLog(
+                    user_id=rng.choice(users).id,
+                    action=rng.choice(ACTIONS),
+                    resource_type=resource_type,
+                    resource_id=str(rng.randrange(1, 10000)),
+                    details={'method': 'POST', 'path': f'/api/{resource_type}s/', 'status_code': 200},
+                    ip_address='10.0.0.1',
+                    created_at=started + step * i,
+                ))
+            AuditLog.objects.bulk_create(entries)
+
+    def date_range(self, rng, end):
+        start = end - timedelta(days=rng.randrange(1, 365))
+        return {'start_date': start.isoformat(), 'end_date': (start + timedelta(days=7)).isoformat()}
+
+    def p95(self, samples):
+        return statistics.quantiles(samples, n=20)[-1] if len(samples) > 1 else samples[0]
@@ -0,0 +1,104 @@
+import json
+import statistics
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
+
+from audit.context import AuditParser, audit_context
+from audit.middleware import AuditLogMiddleware
+
+
+class _Collector:
+    """代替 audit_sink，只计数，不写数据库"""
+
+    def __init__(self):
+        self.count = 0
+
+    def add(self, entry):
+        self.count += 1
+
+
+class Command(BaseCommand):
+    help = "基准测试：审计中间件在不同请求/响应上的单次请求开销（不访问数据库）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help="每个场景的请求次数")
+        parser.add_argument('--body-size', type=int, default=1024 * 1024, help="大请求体场景的请求体字节数")
+        parser.add_argument('--download-size', type=int, default=8 * 1024 * 1024, help="大响应场景的响应体字节数")
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        user = User(pk=1, username='bench')
+        parser = AuditParser()
+        count = options['requests']
+
+        small_body = json.dumps({'name': 'check-commit', 'token': 'secret', 'description': 'x' * 200})
+        large_body = json.dumps({'targets': ['group/project'] * (options['body_size'] // 17)})
+        small_result = json.dumps({'id': 1, 'name': 'check-commit'}).encode()
+        download = b'\0' * options['download_size']
+
+        def api_view(content):
+            # 模拟 API 层：解析请求体，返回对象，由 AuditedNinjaAPI 记录 id/name
+            def view(request):
+                if request.body:
+                    parser.parse_body(request)
+                context = audit_context(request)
+                if context is not None:
+                    context.set_result(1, 'check-commit')
+                return HttpResponse(content, content_type='application/json')
+            return view
+
+        def streaming_view(request):
+            return StreamingHttpResponse(iter([download]), content_type='application/octet-stream')
+
+        scenarios = [
+            ('GET (not audited)', lambda: factory.get('/api/hooks/'), api_view(small_result)),
+            ('POST small JSON', lambda: factory.post('/api/hooks/', small_body, content_type='application/json'),
+             api_view(small_result)),
+            ('POST large JSON', lambda: factory.post('/api/deployments/1/deploy/bulk', large_body,
+                                                     content_type='application/json'), api_view(small_result)),
+            ('POST large binary response', lambda: factory.post('/api/hooks/1/export', '',
+                                                                content_type='application/json'), api_view(download)),
+            ('POST streaming response', lambda: factory.post('/api/hooks/1/download', '',
+                                                             content_type='application/json'), streaming_view),
+        ]
+
+        collector = _Collector()
+        self.stdout.write(f"{count} requests per scenario; overhead = with middleware - view alone")
+        with mock.patch('audit.middleware.audit_sink', collector):
+            for name, make_request, view in scenarios:
+                middleware = AuditLogMiddleware(view)
+
+                def bare():
+                    request = make_request()
+                    request.user = user
+                    request.audit = None
+                    view(request)
+
+                def audited():
+                    request = make_request()
+                    request.user = user
+                    middleware(request)
+
+                baseline = self.measure(bare, count)
+                total = self.measure(audited, count)
+                overhead = statistics.median(total) - statistics.median(baseline)
+                self.stdout.write(
+                    f"{name:28} view {statistics.median(baseline):8.1f} µs   "
+                    f"with middleware {statistics.median(total):8.1f} µs   "
+                    f"overhead {overhead:7.1f} µs"
+                )
+        self.stdout.write(f"audit entries produced: {collector.count}")
+
+    def measure(self, func, count):
+        func()  # 预热
+        samples = []
+        for _ in range(count):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1_000_000)
+        return samples
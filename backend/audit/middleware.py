@@ -2,7 +2,11 @@ import json
 import re
 from django.utils.deprecation import MiddlewareMixin
 from django.contrib.auth.models import AnonymousUser
+from django.http.request import RawPostDataException
+from django.utils import timezone
+from .context import AuditContext, audit_context, max_body_size
 from .models import AuditLog
+from .sink import audit_sink
 
 # Paths that should not be logged
 EXCLUDED_PATHS = [
@@ -15,24 +19,21 @@ EXCLUDED_PATHS = [
 # Request methods that should be logged
 LOGGED_METHODS = ['POST', 'PUT', 'PATCH', 'DELETE']
 
+SENSITIVE_KEYS = ['password', 'token', 'secret', 'key']
+
 class AuditLogMiddleware(MiddlewareMixin):
     def __init__(self, get_response=None):
         self.get_response = get_response
-        self.excluded_paths_regex = [re.compile(path) for path in EXCLUDED_PATHS]
+        self.excluded_paths_regex = re.compile('|'.join(f'(?:{path})' for path in EXCLUDED_PATHS))
         super().__init__(get_response)
 
     def should_log(self, request):
-        # Skip if path is in excluded paths
-        path = request.path
-        for pattern in self.excluded_paths_regex:
-            if pattern.match(path):
-                return False
-
         # Only log specific methods
         if request.method not in LOGGED_METHODS:
             return False
 
-        return True
+        # Skip if path is in excluded paths
+        return not self.excluded_paths_regex.match(request.path)
 
     def get_client_ip(self, request):
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -82,42 +83,70 @@ class AuditLogMiddleware(MiddlewareMixin):
         
         return resource_type, action, resource_id
 
-    def extract_request_body(self, request):
+    def sanitize(self, body):
+        """Mask sensitive fields"""
+        if isinstance(body, dict):
+            sanitized = body.copy()
+            for key in body:
+                if any(sensitive in key.lower() for sensitive in SENSITIVE_KEYS):
+                    sanitized[key] = '******'
+            return sanitized
+        return body
+
+    def extract_request_body(self, request, context):
         """Extract and sanitize request body for logging"""
-        if not request.body:
-            return {}
-            
+        if context.has_request_body:
+            # Already parsed by the API layer
+            return self.sanitize(context.request_body)
+
+        # Not an API view (e.g. the admin); only read bodies small enough to keep
+        try:
+            size = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            size = 0
+        if size > max_body_size():
+            return {'omitted': 'body too large', 'size': size}
+
         try:
-            body = json.loads(request.body.decode('utf-8'))
-            # Sanitize sensitive fields
-            if isinstance(body, dict):
-                sanitized = body.copy()
-                for key in body:
-                    if any(sensitive in key.lower() for sensitive in ['password', 'token', 'secret', 'key']):
-                        sanitized[key] = '******'
-                return sanitized
-            return body
+            if not request.body:
+                return {}
+        except RawPostDataException:
+            # Multipart uploads have already been consumed by the view
+            return {'raw': 'non-JSON body'}
+
+        try:
+            return self.sanitize(json.loads(request.body.decode('utf-8')))
         except json.JSONDecodeError:
             return {'raw': 'non-JSON body'}
         except Exception:
             return {'error': 'Could not parse request body'}
 
-    def process_view(self, request, view_func, view_args, view_kwargs):
-        if not self.should_log(request):
-            return None
+    def process_request(self, request):
+        # Decide once per request; views and the API layer fill the context in
+        request.audit = AuditContext() if self.should_log(request) else None
+        return None
 
-        # Store view_kwargs in request for later use in process_response
-        request.view_kwargs = view_kwargs
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        context = audit_context(request)
+        if context is not None:
+            # Store view_kwargs for later use in process_response
+            context.view_kwargs = view_kwargs
 
         # Continue with normal request processing
         return None
 
     def process_response(self, request, response):
-        if not self.should_log(request):
+        context = audit_context(request)
+        if context is None:
+            return response
+
+        # Streaming and file responses (e.g. hook downloads) are never inspected or logged
+        if response.streaming:
             return response
 
         # Don't log if user is not authenticated
-        if isinstance(request.user, AnonymousUser):
+        user = getattr(request, 'user', None)
+        if user is None or isinstance(user, AnonymousUser):
             return response
 
         # Extract resource information
@@ -131,35 +160,27 @@ class AuditLogMiddleware(MiddlewareMixin):
         
         # Add request body for certain methods
         if request.method in ['POST', 'PUT', 'PATCH']:
-            details['request'] = self.extract_request_body(request)
+            details['request'] = self.extract_request_body(request, context)
             
         # Add response status
         details['status_code'] = response.status_code
         
-        # Add response data for successful requests
-        if 200 <= response.status_code < 300 and hasattr(response, 'content'):
-            try:
-                response_data = json.loads(response.content.decode('utf-8'))
-                # Extract relevant fields from response
-                if isinstance(response_data, dict):
-                    if 'id' in response_data:
-                        details['result_id'] = response_data['id']
-                    if 'name' in response_data:
-                        details['result_name'] = response_data['name']
-            except (json.JSONDecodeError, UnicodeDecodeError):
-                pass
-
-        # Get view_kwargs from request if available
-        view_kwargs = getattr(request, 'view_kwargs', {})
-
-        # Create audit log entry
-        AuditLog.objects.create(
-            user=request.user,
+        # Add the id/name of the returned object, as recorded by the API layer
+        if 200 <= response.status_code < 300:
+            if context.result_id is not None:
+                details['result_id'] = context.result_id
+            if context.result_name is not None:
+                details['result_name'] = context.result_name
+
+        # Queue the entry; the sink writes it in a batch outside the request
+        audit_sink.add(AuditLog(
+            user_id=user.pk,
             action=f"{resource_type}_{action}",
             resource_type=resource_type,
-            resource_id=resource_id or view_kwargs.get('id', ''),
+            resource_id=resource_id or context.view_kwargs.get('id', ''),
             details=details,
-            ip_address=self.get_client_ip(request)
-        )
+            ip_address=self.get_client_ip(request),
+            created_at=timezone.now()
+        ))
 
-        return response
\ No newline at end of file
+        return response
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 class AuditLog(models.Model):
@@ -8,10 +9,19 @@ class AuditLog(models.Model):
     resource_id = models.CharField(max_length=100, blank=True)
     details = models.JSONField(default=dict)
     ip_address = models.GenericIPAddressField(null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the request is handled, not when the buffered entry is written
+    created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ['-created_at']
+        # 每个索引以一个过滤字段开头、以分页顺序结尾，过滤和翻页都只扫描一段索引
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='audit_created_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='audit_user_created_idx'),
+            models.Index(fields=['action', '-created_at', '-id'], name='audit_action_created_idx'),
+            models.Index(fields=['resource_type', '-created_at', '-id'], name='audit_type_created_idx'),
+            models.Index(fields=['resource_id', '-created_at', '-id'], name='audit_resource_created_idx'),
+        ]
         
     def __str__(self):
         return f"{self.action} by {self.user} at {self.created_at}"
\ No newline at end of file
@@ -0,0 +1,222 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connection
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_MAX_BUFFER = 10000
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _to_record(entry):
+    return {
+        'user_id': entry.user_id,
+        'action': entry.action,
+        'resource_type': entry.resource_type,
+        'resource_id': entry.resource_id,
+        'details': entry.details,
+        'ip_address': entry.ip_address,
+        'created_at': entry.created_at.isoformat(),
+    }
+
+
+def _from_record(record):
+    return AuditLog(**{**record, 'created_at': parse_datetime(record['created_at'])})
+
+
+class AuditSink:
+    """
+    Buffers audit log entries in memory and writes them with bulk_create from a
+    background thread, so mutating requests do not wait for the audit insert.
+
+    The buffer is flushed when it reaches batch_size entries or every
+    flush_interval seconds, and once more at interpreter shutdown. Entries that
+    cannot be written (database unavailable, or the buffer is full) are appended
+    to a local spool file as JSON lines and replayed after the next successful
+    write.
+    """
+
+    def __init__(self, batch_size=None, flush_interval=None, max_buffer=None, spool_path=None, background=True):
+        self.background = background
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._max_buffer = max_buffer
+        self._spool_path = spool_path
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    @property
+    def batch_size(self):
+        return self._batch_size or _setting('AUDIT_LOG_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+    @property
+    def flush_interval(self):
+        return self._flush_interval or _setting('AUDIT_LOG_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+
+    @property
+    def max_buffer(self):
+        return self._max_buffer or _setting('AUDIT_LOG_MAX_BUFFER', DEFAULT_MAX_BUFFER)
+
+    @property
+    def spool_path(self):
+        return str(self._spool_path or _setting('AUDIT_LOG_SPOOL_PATH', settings.BASE_DIR / 'audit_spool.jsonl'))
+
+    def add(self, entry):
+        """Queue an unsaved AuditLog; created_at must already be set."""
+        if not _setting('AUDIT_LOG_BUFFERED', True):
+            self._write([entry])
+            return
+
+        if self.background:
+            self._ensure_started()
+        overflow = None
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                # Never block the request on a stalled writer; keep the entry on disk instead
+                overflow = [entry]
+            else:
+                self._buffer.append(entry)
+                if len(self._buffer) >= self.batch_size:
+                    self._wake.set()
+        if overflow:
+            self._spool(overflow)
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self):
+        """Write everything buffered so far, then replay the spool if the write succeeded."""
+        with self._flush_lock:
+            with self._lock:
+                entries, self._buffer = self._buffer, []
+            if entries and not self._write(entries):
+                return False
+            return self._replay_spool()
+
+    def close(self):
+        """Stop the background thread and flush what is left."""
+        self._stopping.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=self.flush_interval + 30)
+        self.flush()
+        self._thread = None
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        if self._running(pid):
+            return
+        with self._lock:
+            if self._running(pid):
+                return
+            if self._pid is not None and self._pid != pid:
+                # Forked worker: the parent's buffer and thread belong to the parent
+                self._buffer = []
+            self._pid = pid
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread.start()
+
+    def _running(self, pid):
+        # A writer that died (or was never started in this process) is replaced on the next add()
+        return self._thread is not None and self._pid == pid and self._thread.is_alive()
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                try:
+                    self.flush()
+                except Exception:
+                    # Never let one bad flush stop the writer; later entries still have to be written
+                    logger.exception("Audit log flush failed")
+                    self._reset_connection()
+        finally:
+            connection.close()
+
+    def _write(self, entries):
+        try:
+            AuditLog.objects.bulk_create(entries, batch_size=500)
+        except DatabaseError as e:
+            logger.warning("Could not write %s audit log entries, spooling to %s: %s", len(entries), self.spool_path, e)
+            self._reset_connection()
+            self._spool(entries)
+            return False
+        return True
+
+    def _reset_connection(self):
+        # Drop a broken connection so the next flush reconnects; only the writer thread owns its connection
+        if threading.current_thread() is self._thread:
+            connection.close()
+
+    def _spool(self, entries):
+        data = ''.join(json.dumps(_to_record(entry), default=str) + '\n' for entry in entries)
+        try:
+            with open(self.spool_path, 'a', encoding='utf-8') as f:
+                f.write(data)
+        except OSError:
+            logger.exception("Lost %s audit log entries: spool file %s is not writable", len(entries), self.spool_path)
+
+    def _replay_spool(self):
+        path = self.spool_path
+        candidates = sorted(glob.glob(f"{path}.*.replay"))
+        if os.path.exists(path):
+            candidates.append(path)
+
+        own = f"{path}.{os.getpid()}.{threading.get_ident()}."
+        for candidate in candidates:
+            # Claim each file by renaming it; if another process got there first, skip it
+            claimed = candidate if candidate.startswith(own) else f"{own}{time.time_ns()}.replay"
+            try:
+                os.replace(candidate, claimed)
+                with open(claimed, encoding='utf-8') as f:
+                    entries = [_from_record(json.loads(line)) for line in f if line.strip()]
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError):
+                logger.exception("Skipping unreadable audit spool file %s", claimed)
+                continue
+
+            try:
+                # Users may have been deleted while the entries were waiting on disk
+                user_ids = {entry.user_id for entry in entries if entry.user_id is not None}
+                existing = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+                for entry in entries:
+                    if entry.user_id not in existing:
+                        entry.user_id = None
+                AuditLog.objects.bulk_create(entries, batch_size=500)
+            except DatabaseError as e:
+                logger.warning("Could not replay audit spool %s: %s", claimed, e)
+                self._reset_connection()
+                return False
+            os.remove(claimed)
+            logger.info("Replayed %s spooled audit log entries from %s", len(entries), claimed)
+        return True
+
+
+audit_sink = AuditSink()
+atexit.register(audit_sink.close)
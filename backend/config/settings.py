@@ -52,6 +52,7 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
+    'api.middleware.MultipartPutMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -96,6 +97,10 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # 部署 worker 与 Web 进程同时写入时，等待锁而不是立即报错
+            'timeout': 20,
+        },
     }
 }
 
@@ -141,6 +146,63 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Hook 下载方式：None 表示由 Django 分块流式返回
+# 'x-accel-redirect'（nginx）或 'x-sendfile'（Apache）表示交给前端服务器发送文件
+HOOK_DOWNLOAD_SENDFILE = None
+HOOK_DOWNLOAD_ACCEL_PREFIX = '/protected-media/'
+
+# Hook 版本历史的差量存储：每隔多少个版本保留完整快照、参与差量的最大文件大小、重建结果缓存大小
+HOOK_SNAPSHOT_INTERVAL = 20
+HOOK_DELTA_MAX_SIZE = 4 * 1024 * 1024
+HOOK_VERSION_CACHE_SIZE = 64 * 1024 * 1024
+# 分块上传会话多少秒没有新的分块即视为放弃，由 expire_hook_uploads 命令删除会话和临时文件
+HOOK_UPLOAD_EXPIRE_SECONDS = 24 * 3600
+
+# 部署任务队列：最大尝试次数、worker 租约时长、失败重试的退避时间（秒）
+DEPLOY_JOB_MAX_ATTEMPTS = 5
+DEPLOY_JOB_LEASE_SECONDS = 60
+DEPLOY_JOB_RETRY_BASE_SECONDS = 10
+DEPLOY_JOB_RETRY_MAX_SECONDS = 600
+
+# 组级别部署时同时向 GitLab 发起的项目部署数
+GITLAB_DEPLOY_CONCURRENCY = 8
+
+# GitLab API 共享连接池：每个实例的最大连接数（不应小于部署并发数）、默认超时（连接, 读取）
+GITLAB_HTTP_POOL_SIZE = 16
+GITLAB_HTTP_TIMEOUT = (5, 30)
+# 异步视图使用的 httpx 连接池大小（每个实例），不占用线程，可以比同步连接池大得多
+GITLAB_ASYNC_POOL_SIZE = 100
+# 按配置缓存的 GitLab 客户端有效期（秒）；本进程内修改配置时立即失效
+GITLAB_CLIENT_TTL = 300
+# GitLab GET 响应的条件请求缓存（ETag / Last-Modified）总大小（字节），0 表示不缓存
+GITLAB_RESPONSE_CACHE_SIZE = 32 * 1024 * 1024
+
+# GitLab 请求调度：每个实例的令牌桶速率（次/秒）与突发容量，幂等请求的重试次数与退避基数，
+# 单次请求最长等待时间，连续失败多少次后熔断以及熔断冷却时间（秒）
+GITLAB_RATE_LIMIT = 10.0
+GITLAB_RATE_BURST = 20
+GITLAB_MAX_RETRIES = 3
+GITLAB_RETRY_BASE_SECONDS = 0.5
+GITLAB_RETRY_MAX_WAIT = 30
+GITLAB_CIRCUIT_FAILURES = 5
+GITLAB_CIRCUIT_RESET_SECONDS = 30
+
+# 本地项目目录：增量同步向前重叠的秒数（GitLab 每小时最多刷新一次 last_activity_at），以及全量同步间隔
+GITLAB_CATALOG_SYNC_OVERLAP = 3600
+GITLAB_CATALOG_FULL_SYNC_INTERVAL = 24 * 3600
+# GitLab 健康检查：check_gitlab_health 的默认探测间隔（秒）、每个配置保留的记录数和单次探测超时
+GITLAB_HEALTH_INTERVAL = 60
+GITLAB_HEALTH_MAX_SAMPLES = 1440
+GITLAB_HEALTH_TIMEOUT = (5, 10)
+
+# 组展开（组及所有子组下的项目）的缓存有效期（秒），同步目录时失效
+GITLAB_GROUP_TREE_TTL = 300
+
+# GitLab 系统钩子事件处理失败时的最大尝试次数和重试退避时间（秒）
+GITLAB_EVENT_MAX_ATTEMPTS = 5
+GITLAB_EVENT_RETRY_BASE_SECONDS = 10
+GITLAB_EVENT_RETRY_MAX_SECONDS = 600
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -154,3 +216,21 @@ SESSION_COOKIE_AGE = 86400  # 会话有效期（秒），这里设置为 24 小
 
 # CSRF 设置
 CSRF_TRUSTED_ORIGINS = ["http://localhost:3000"]
+
+# 审计日志在内存中缓冲，由后台线程批量写入：达到批大小或间隔（秒）时写入；缓冲区满或数据库不可用时写入本地 spool 文件
+AUDIT_LOG_BUFFERED = True
+AUDIT_LOG_BATCH_SIZE = 100
+AUDIT_LOG_FLUSH_INTERVAL = 1.0
+AUDIT_LOG_MAX_BUFFER = 10000
+AUDIT_LOG_SPOOL_PATH = BASE_DIR / 'audit_spool.jsonl'
+# 审计日志记录的请求体上限（字节），超过时只记录大小
+AUDIT_LOG_MAX_BODY_SIZE = 64 * 1024
+# 超过保留天数的审计日志由 audit_archive 命令按天写入压缩归档（NDJSON + gzip）并分批从数据库删除
+AUDIT_LOG_RETENTION_DAYS = 90
+# 归档目录；默认不放在 MEDIA_ROOT 下，因为 DEBUG 时 MEDIA_ROOT 会被直接对外提供
+AUDIT_LOG_ARCHIVE_DIR = BASE_DIR / 'audit_archive'
+AUDIT_LOG_ARCHIVE_BATCH_SIZE = 5000
+# 审计日志列表每页最多读取的归档分区（天）数，读不满一页时返回从更早分区继续的游标
+AUDIT_LOG_ARCHIVE_SCAN_DAYS = 7
+# audit_archive --interval 不带值时的运行间隔（秒）
+AUDIT_LOG_ARCHIVE_INTERVAL = 24 * 3600
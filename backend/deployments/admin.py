@@ -1,8 +1,13 @@
 from django.contrib import admin
-from .models import Deployment
+from .models import Deployment, DeploymentJob
 
 @admin.register(Deployment)
 class DeploymentAdmin(admin.ModelAdmin):
     list_display = ('hook', 'hook_version', 'deployment_level', 'target_name', 'status', 'deployed_at', 'deployed_by')
     list_filter = ('status', 'deployment_level', 'deployed_at')
-    search_fields = ('hook__name', 'target_name')
\ No newline at end of file
+    search_fields = ('hook__name', 'target_name')
+
+@admin.register(DeploymentJob)
+class DeploymentJobAdmin(admin.ModelAdmin):
+    list_display = ('deployment', 'status', 'attempts', 'run_after', 'locked_by', 'lease_expires_at')
+    list_filter = ('status',)
\ No newline at end of file
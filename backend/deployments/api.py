@@ -1,12 +1,26 @@
+import logging
 from typing import List
 from ninja import Router
+from ninja.errors import HttpError
+from ninja.pagination import paginate
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.db.models import Q
+from requests.exceptions import RequestException
 
+from api.pagination import KeysetPagination
+from gitlab_integration.graphql import fetch_groups, fetch_projects, missing_targets, normalize_target
+from gitlab_integration.models import GitLabConfig
+from gitlab_integration.registry import get_client
+from gitlab_integration.scheduler import GitLabUnavailable
+from gitlab_integration.schemas import ErrorResponseSchema
 from hooks.models import Hook, HookVersion
 from .models import Deployment
-from .schemas import DeploymentCreateSchema, DeploymentSchema, DeploymentListSchema
+from .queue import enqueue_deployment, enqueue_deployments
+from .schemas import DeploymentBulkCreateSchema, DeploymentCreateSchema, DeploymentSchema, DeploymentListSchema
+
+logger = logging.getLogger(__name__)
 
 router = Router()
 
@@ -15,38 +29,46 @@ def deploy_hook(request, hook_id: int, payload: DeploymentCreateSchema):
     """部署Hook"""
     hook = get_object_or_404(Hook, id=hook_id)
     user = User.objects.first()  # 临时使用第一个用户，实际应该使用认证用户
+    hook_version = _hook_version(hook, payload.hook_version_id, user)
     
-    # 确定使用哪个版本
-    if payload.hook_version_id:
-        hook_version = get_object_or_404(HookVersion, id=payload.hook_version_id, hook=hook)
-    else:
-        # 使用最新版本
-        hook_version = hook.versions.first()
-        if not hook_version:
-            # 如果没有版本记录，创建一个初始版本
-            hook_version = HookVersion.objects.create(
-                hook=hook,
-                version=1,
-                file=hook.file,
-                created_by=user
-            )
-    
-    # 创建部署记录
-    deployment = Deployment.objects.create(
-        hook=hook,
-        hook_version=hook_version,
-        deployment_level=payload.deployment_level,
-        target_id=payload.target_id,
-        target_name=payload.target_name,
-        deployed_by=user
-    )
-    
-    # 这里应该添加实际的部署逻辑，例如调用GitLab API
-    # 根据部署级别和目标进行不同的部署操作
-    
-    # 假设部署成功
-    deployment.status = 'success'
-    deployment.save()
+    configs = _target_configs(payload)
+    cross_instance = len(configs) > 1
+
+    # 部署记录、跨实例子部署和队列任务在同一事务中创建，避免留下没有任务的部署
+    with transaction.atomic():
+        # 创建部署记录
+        deployment = Deployment.objects.create(
+            hook=hook,
+            hook_version=hook_version,
+            deployment_level=payload.deployment_level,
+            target_id=payload.target_id,
+            target_name=payload.target_name,
+            gitlab_config=None if cross_instance else next(iter(configs), None),
+            cross_instance=cross_instance,
+            deployed_by=user
+        )
+
+        if cross_instance:
+            # 项目和组的 id 在各实例之间不同，按完整路径定位（GitLab API 接受 URL 编码的路径作为 id）
+            target_id = payload.target_id
+            if payload.deployment_level in ('project', 'group') and payload.target_name:
+                target_id = payload.target_name
+            Deployment.objects.bulk_create([
+                Deployment(
+                    parent=deployment,
+                    hook=hook,
+                    hook_version=hook_version,
+                    deployment_level=payload.deployment_level,
+                    target_id=target_id,
+                    target_name=payload.target_name,
+                    gitlab_config=config,
+                    deployed_by=user
+                )
+                for config in configs
+            ])
+
+        # 实际部署由后台 worker 执行（manage.py run_deploy_workers），这里立即返回 pending 状态
+        enqueue_deployment(deployment)
     
     return {
         "id": deployment.id,
@@ -61,6 +83,8 @@ def deploy_hook(request, hook_id: int, payload: DeploymentCreateSchema):
         "deployment_level": deployment.deployment_level,
         "target_id": deployment.target_id,
         "target_name": deployment.target_name,
+        "gitlab_config_id": deployment.gitlab_config_id,
+        "cross_instance": deployment.cross_instance,
         "status": deployment.status,
         "error_message": deployment.error_message,
         "deployed_at": deployment.deployed_at,
@@ -70,44 +94,115 @@ def deploy_hook(request, hook_id: int, payload: DeploymentCreateSchema):
         }
     }
 
+@router.post(
+    "/{hook_id}/deploy/bulk",
+    response={200: List[DeploymentSchema], 400: ErrorResponseSchema, 502: ErrorResponseSchema, 503: ErrorResponseSchema}
+)
+def bulk_deploy_hook(request, hook_id: int, payload: DeploymentBulkCreateSchema):
+    """
+    把 Hook 部署到多个项目或组，每个目标一条部署记录
+    目标可以是 id 或完整路径，通过 GitLab GraphQL 每 100 个目标一次请求完成校验和名称解析
+    """
+    hook = get_object_or_404(Hook, id=hook_id)
+    user = User.objects.first()  # 与单个部署一致，临时使用第一个用户
+    hook_version = _hook_version(hook, payload.hook_version_id, user)
+    config = next(iter(_target_configs(payload)), None)
+    if config is None:
+        return 400, {"message": "No active GitLab configuration found"}
+
+    fetch = fetch_projects if payload.deployment_level == 'project' else fetch_groups
+    try:
+        found = fetch(get_client(config.id).session, payload.targets)
+    except GitLabUnavailable as e:
+        return 503, {"message": str(e)}
+    except RequestException as e:
+        logger.warning("Failed to resolve deployment targets on %s: %s", config.url, e)
+        return 502, {"message": f"Failed to resolve targets on GitLab: {e}"}
+
+    missing = missing_targets(payload.targets, found)
+    if missing:
+        return 400, {"message": f"Unknown {payload.deployment_level}s: {', '.join(missing[:20])}"}
+
+    targets = {}
+    for target in payload.targets:
+        item = found[normalize_target(target)]
+        targets.setdefault(item['id'], item)
+
+    with transaction.atomic():
+        deployments = Deployment.objects.bulk_create([
+            Deployment(
+                hook=hook,
+                hook_version=hook_version,
+                deployment_level=payload.deployment_level,
+                target_id=str(item['id']),
+                target_name=item.get('path_with_namespace') or item.get('full_path'),
+                gitlab_config=config,
+                deployed_by=user
+            )
+            for item in targets.values()
+        ])
+        enqueue_deployments(deployments)
+    return 200, deployments
+
+def _hook_version(hook, hook_version_id, user):
+    """确定部署的版本：指定的版本或最新版本"""
+    if hook_version_id:
+        return get_object_or_404(HookVersion, id=hook_version_id, hook=hook)
+    hook_version = hook.versions.first()
+    if not hook_version:
+        # 如果没有版本记录，创建一个初始版本
+        hook_version = HookVersion.objects.create(
+            hook=hook,
+            version=1,
+            file=hook.file,
+            created_by=user
+        )
+    return hook_version
+
+def _target_configs(payload):
+    """解析部署目标实例；未指定时使用第一个启用的配置"""
+    config_ids = getattr(payload, 'gitlab_config_ids', None) or (
+        [payload.gitlab_config_id] if payload.gitlab_config_id else []
+    )
+    if not config_ids:
+        config = GitLabConfig.objects.filter(is_active=True).first()
+        return [config] if config else []
+
+    configs = list(GitLabConfig.objects.filter(id__in=config_ids, is_active=True).order_by('id'))
+    if len(configs) != len(set(config_ids)):
+        raise HttpError(400, "Unknown or inactive GitLab configuration")
+    return configs
+
 @router.get("/", response=List[DeploymentListSchema])
-def list_deployments(request, hook_id: int = None, status: str = None):
-    """获取部署历史"""
-    query = Q()
+@paginate(KeysetPagination, ordering=('-deployed_at', '-id'))
+def list_deployments(
+    request,
+    hook_id: int = None,
+    status: str = None,
+    deployment_level: str = None,
+    target_name: str = None,
+    gitlab_config_id: int = None
+):
+    """获取部署历史（游标分页，target_name 按前缀匹配）"""
+    # 组级别部署的子部署通过 /{deployment_id}/results 查看
+    query = Q(parent__isnull=True)
     
     if hook_id:
         query &= Q(hook_id=hook_id)
     
     if status:
         query &= Q(status=status)
+
+    if deployment_level:
+        query &= Q(deployment_level=deployment_level)
+
+    if target_name:
+        query &= Q(target_name__startswith=target_name)
+
+    if gitlab_config_id:
+        query &= Q(gitlab_config_id=gitlab_config_id)
     
-    deployments = Deployment.objects.filter(query)
-    
-    result = []
-    for deployment in deployments:
-        deployment_data = {
-            "id": deployment.id,
-            "hook": {
-                "id": deployment.hook.id,
-                "name": deployment.hook.name
-            },
-            "hook_version": {
-                "id": deployment.hook_version.id,
-                "version": deployment.hook_version.version
-            } if deployment.hook_version else None,
-            "deployment_level": deployment.deployment_level,
-            "target_id": deployment.target_id,
-            "target_name": deployment.target_name,
-            "status": deployment.status,
-            "deployed_at": deployment.deployed_at,
-            "deployed_by": {
-                "id": deployment.deployed_by.id,
-                "username": deployment.deployed_by.username
-            }
-        }
-        result.append(deployment_data)
-    
-    return result
+    return Deployment.objects.filter(query).select_related('hook', 'hook_version', 'deployed_by')
 
 @router.get("/{deployment_id}", response=DeploymentSchema)
 def get_deployment(request, deployment_id: int):
@@ -127,6 +222,8 @@ def get_deployment(request, deployment_id: int):
         "deployment_level": deployment.deployment_level,
         "target_id": deployment.target_id,
         "target_name": deployment.target_name,
+        "gitlab_config_id": deployment.gitlab_config_id,
+        "cross_instance": deployment.cross_instance,
         "status": deployment.status,
         "error_message": deployment.error_message,
         "deployed_at": deployment.deployed_at,
@@ -134,4 +231,14 @@ def get_deployment(request, deployment_id: int):
             "id": deployment.deployed_by.id,
             "username": deployment.deployed_by.username
         }
-    }
\ No newline at end of file
+    }
+
+@router.get("/{deployment_id}/results", response=List[DeploymentListSchema])
+@paginate(KeysetPagination, ordering=('-deployed_at', '-id'))
+def list_deployment_results(request, deployment_id: int, status: str = None):
+    """获取组级别部署中每个项目、或跨实例部署中每个实例的部署结果"""
+    deployment = get_object_or_404(Deployment, id=deployment_id)
+    results = deployment.children.select_related('hook', 'hook_version', 'deployed_by')
+    if status:
+        results = results.filter(status=status)
+    return results
\ No newline at end of file
@@ -3,4 +3,8 @@ from django.apps import AppConfig
 
 class DeploymentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'deployments'
\ No newline at end of file
+    name = 'deployments'
+
+    def ready(self):
+        # 注册 GitLab 系统钩子事件的自动部署处理
+        from . import autodeploy  # noqa: F401
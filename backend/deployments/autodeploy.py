@@ -0,0 +1,103 @@
+import logging
+
+from django.db.models import Q
+from django.dispatch import receiver
+
+from gitlab_integration.catalog import namespace_group_ids
+from gitlab_integration.events import system_hook_preparing, system_hook_received
+from gitlab_integration.models import GitLabConfig
+from gitlab_integration.registry import get_client
+
+from .models import Deployment
+from .queue import enqueue_deployment
+
+logger = logging.getLogger(__name__)
+
+# 项目出现在某个组下的事件：新建项目，或从其他命名空间转入
+AUTO_DEPLOY_EVENTS = ('project_create', 'project_transfer')
+
+
+def _namespaces(path_with_namespace):
+    """'a/b/c/app' -> ['a', 'a/b', 'a/b/c']"""
+    parts = path_with_namespace.split('/')[:-1]
+    return ['/'.join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+
+def resolve_namespaces(config, path_with_namespace):
+    """项目所在组及所有上级组的 {full_path: GitLab 组 id}；组目录未同步时需要请求 GitLab"""
+    namespaces = _namespaces(path_with_namespace)
+    if not namespaces:
+        return {}
+    return namespace_group_ids(get_client(config.pk), namespaces)
+
+
+def deploy_group_hooks_to_project(config, project_id, path_with_namespace, group_ids=None):
+    """
+    把已成功部署到项目所在组（含所有上级组）的组级别 Hook 部署到该项目
+    每个 Hook 使用最近一次成功的组级别部署的版本和部署人，返回创建的部署
+    group_ids 为 resolve_namespaces() 的结果；在事务中调用时应事先取得，避免在事务中请求 GitLab
+    """
+    namespaces = _namespaces(path_with_namespace)
+    if not namespaces:
+        return []
+    if group_ids is None:
+        group_ids = resolve_namespaces(config, path_with_namespace)
+    # 普通部署以组 id 为目标，跨实例部署的子部署以组路径为目标
+    targets = namespaces + [str(group_id) for group_id in group_ids.values()]
+
+    instance = Q(gitlab_config=config)
+    if config.pk == GitLabConfig.objects.filter(is_active=True).values_list('id', flat=True).first():
+        # 未记录实例的旧部署属于第一个启用的配置
+        instance |= Q(gitlab_config__isnull=True, cross_instance=False)
+    group_deployments = Deployment.objects.filter(
+        instance, deployment_level='group', status='success', target_id__in=targets
+    ).order_by('-deployed_at', '-id')
+
+    latest = {}
+    for deployment in group_deployments:
+        latest.setdefault(deployment.hook_id, deployment)
+
+    created = []
+    for deployment in latest.values():
+        existing = Deployment.objects.filter(
+            hook_id=deployment.hook_id,
+            hook_version_id=deployment.hook_version_id,
+            deployment_level='project',
+            target_id=str(project_id),
+            gitlab_config=config,
+            parent__isnull=True,
+        ).exclude(status='failed')
+        if existing.exists():
+            # GitLab 可能重复投递同一个事件
+            continue
+
+        project_deployment = Deployment.objects.create(
+            hook_id=deployment.hook_id,
+            hook_version_id=deployment.hook_version_id,
+            deployment_level='project',
+            target_id=str(project_id),
+            target_name=path_with_namespace,
+            gitlab_config=config,
+            deployed_by_id=deployment.deployed_by_id
+        )
+        enqueue_deployment(project_deployment)
+        created.append(project_deployment)
+
+    if created:
+        logger.info("Queued %s group hook deployment(s) for new project %s", len(created), path_with_namespace)
+    return created
+
+
+@receiver(system_hook_preparing)
+def _resolve_new_project_namespaces(sender, event, context, **kwargs):
+    if event.event_name in AUTO_DEPLOY_EVENTS:
+        context['group_ids'] = resolve_namespaces(event.config, event.payload['path_with_namespace'])
+
+
+@receiver(system_hook_received)
+def _deploy_to_new_project(sender, event, context, **kwargs):
+    if event.event_name in AUTO_DEPLOY_EVENTS:
+        deploy_group_hooks_to_project(
+            event.config, event.payload['project_id'], event.payload['path_with_namespace'],
+            group_ids=context.get('group_ids')
+        )
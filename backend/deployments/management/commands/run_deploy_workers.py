@@ -0,0 +1,70 @@
+import logging
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from deployments.queue import DEFAULT_LEASE_SECONDS
+from deployments.worker import DeploymentWorker
+
+logger = logging.getLogger(__name__)
+
+
+def _run_worker(lease_seconds, poll_interval):
+    worker = DeploymentWorker(lease_seconds=lease_seconds, poll_interval=poll_interval)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+class Command(BaseCommand):
+    help = "启动部署 worker 进程，从数据库任务队列中领取并执行部署任务"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="worker 进程数")
+        parser.add_argument('--lease', type=int, default=DEFAULT_LEASE_SECONDS, help="任务租约时长（秒）")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="队列为空时的轮询间隔（秒）")
+        parser.add_argument('--once', action='store_true', help="在当前进程中执行完所有可执行的任务后退出")
+
+    def handle(self, *args, **options):
+        lease_seconds = options['lease']
+        poll_interval = options['poll_interval']
+
+        if options['once']:
+            DeploymentWorker(lease_seconds=lease_seconds, poll_interval=poll_interval).run(once=True)
+            return
+
+        # 子进程不能继承父进程的数据库连接
+        connections.close_all()
+        stopping = False
+
+        def start_worker():
+            process = multiprocessing.Process(target=_run_worker, args=(lease_seconds, poll_interval), daemon=False)
+            process.start()
+            return process
+
+        def stop(*args):
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        processes = [start_worker() for _ in range(options['workers'])]
+        self.stdout.write(f"Started {len(processes)} deployment workers")
+
+        # 监控子进程，异常退出的 worker 会被重新启动；它持有的任务在租约过期后由其他 worker 接管
+        while not stopping:
+            for i, process in enumerate(processes):
+                if not process.is_alive():
+                    logger.warning("Deployment worker pid=%s exited with %s, restarting", process.pid, process.exitcode)
+                    processes[i] = start_worker()
+            time.sleep(1)
+
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+        self.stdout.write("Deployment workers stopped")
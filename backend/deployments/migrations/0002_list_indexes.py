@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deployments', '0001_initial'),
+        ('hooks', '0005_list_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deployment',
+            index=models.Index(fields=['-deployed_at', '-id'], name='deploy_deployed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deployment',
+            index=models.Index(fields=['hook', '-deployed_at', '-id'], name='deploy_hook_deployed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deployment',
+            index=models.Index(fields=['status', '-deployed_at', '-id'], name='deploy_status_deployed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deployment',
+            index=models.Index(fields=['deployment_level', '-deployed_at', '-id'], name='deploy_level_deployed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deployment',
+            index=models.Index(fields=['target_name'], name='deploy_target_name_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deployments', '0003_deploymentjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deployment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='deployments.deployment'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deployments', '0004_deployment_parent'),
+        ('gitlab_integration', '0003_catalog_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deployment',
+            name='cross_instance',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='deployment',
+            name='gitlab_config',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='deployments', to='gitlab_integration.gitlabconfig'),
+        ),
+    ]
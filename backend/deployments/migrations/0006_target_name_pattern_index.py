@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:20
+
+from django.db import migrations
+
+# PostgreSQL 在非 C 排序规则下，普通 btree 索引不能用于 target_name LIKE 'x%'（startswith）
+# 另建 varchar_pattern_ops 索引；deploy_target_name_idx 仍用于等值查询和排序
+PATTERN_INDEX = ('deploy_target_name_like_idx', 'deployments_deployment', 'target_name')
+
+
+def create_pattern_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    name, table, column = PATTERN_INDEX
+    schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ("{column}" varchar_pattern_ops)')
+
+
+def drop_pattern_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {PATTERN_INDEX[0]}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deployments', '0005_gitlab_instance'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_pattern_index, drop_pattern_index),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
+from gitlab_integration.models import GitLabConfig
 from hooks.models import Hook, HookVersion
 
 class Deployment(models.Model):
@@ -19,6 +21,7 @@ class Deployment(models.Model):
         max_length=20,
         choices=[
             ('pending', 'Pending'),
+            ('running', 'Running'),
             ('success', 'Success'),
             ('failed', 'Failed')
         ],
@@ -27,9 +30,61 @@ class Deployment(models.Model):
     error_message = models.TextField(blank=True)
     deployed_at = models.DateTimeField(auto_now_add=True)
     deployed_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    # 组级别部署会为组内每个项目创建一条子部署记录
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    # 部署目标所在的 GitLab 实例；为空时使用第一个启用的配置（兼容旧记录）
+    gitlab_config = models.ForeignKey(
+        GitLabConfig, on_delete=models.SET_NULL, null=True, blank=True, related_name='deployments'
+    )
+    # 跨实例部署：每个实例一条子部署记录，由同一个任务并发执行
+    cross_instance = models.BooleanField(default=False)
 
     class Meta:
         ordering = ['-deployed_at']
+        indexes = [
+            models.Index(fields=['-deployed_at', '-id'], name='deploy_deployed_idx'),
+            models.Index(fields=['hook', '-deployed_at', '-id'], name='deploy_hook_deployed_idx'),
+            models.Index(fields=['status', '-deployed_at', '-id'], name='deploy_status_deployed_idx'),
+            models.Index(fields=['deployment_level', '-deployed_at', '-id'], name='deploy_level_deployed_idx'),
+            models.Index(fields=['target_name'], name='deploy_target_name_idx'),
+        ]
         
     def __str__(self):
-        return f"{self.hook.name} to {self.target_name or 'server'}"
\ No newline at end of file
+        return f"{self.hook.name} to {self.target_name or 'server'}"
+
+
+class DeploymentJob(models.Model):
+    """
+    部署任务队列，由 run_deploy_workers 启动的 worker 领取执行
+    worker 领取任务时获得一个租约并定期续约，租约过期（worker 崩溃）后任务可被重新领取
+    """
+    deployment = models.OneToOneField(Deployment, on_delete=models.CASCADE, related_name='job')
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('queued', 'Queued'),
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('failed', 'Failed')
+        ],
+        default='queued'
+    )
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)  # 重试退避：此时间之前不会被领取
+    locked_by = models.CharField(max_length=100, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='deployjob_ready_idx'),
+            models.Index(fields=['status', 'lease_expires_at'], name='deployjob_lease_idx'),
+        ]
+
+    def __str__(self):
+        return f"Job for deployment {self.deployment_id} ({self.status})"
\ No newline at end of file
@@ -0,0 +1,164 @@
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Deployment, DeploymentJob
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_LEASE_SECONDS = 60
+DEFAULT_RETRY_BASE_SECONDS = 10
+DEFAULT_RETRY_MAX_SECONDS = 600
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue_deployment(deployment):
+    """为部署创建任务，由后台 worker 执行"""
+    return DeploymentJob.objects.create(
+        deployment=deployment,
+        max_attempts=_setting('DEPLOY_JOB_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    )
+
+
+def enqueue_deployments(deployments):
+    """批量创建任务"""
+    max_attempts = _setting('DEPLOY_JOB_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    return DeploymentJob.objects.bulk_create([
+        DeploymentJob(deployment=deployment, max_attempts=max_attempts) for deployment in deployments
+    ])
+
+
+def _ready_jobs(now):
+    # 排队中且已到执行时间的任务，或 worker 崩溃后租约已过期的任务
+    return DeploymentJob.objects.filter(
+        Q(status='queued', run_after__lte=now) |
+        Q(status='running', lease_expires_at__lt=now)
+    )
+
+
+def claim_job(worker_id, lease_seconds=None):
+    """
+    领取一个可执行的任务并获得租约，没有任务时返回 None
+    PostgreSQL 上用 SELECT ... FOR UPDATE SKIP LOCKED 避免 worker 之间互相等待；
+    SQLite 不支持行锁，依靠带条件的 UPDATE 保证同一任务只被一个 worker 领取
+    """
+    lease_seconds = lease_seconds or _setting('DEPLOY_JOB_LEASE_SECONDS', DEFAULT_LEASE_SECONDS)
+    now = timezone.now()
+
+    with transaction.atomic():
+        candidates = list(
+            _ready_jobs(now).select_for_update(skip_locked=True).order_by('run_after', 'id')[:10]
+        )
+        for job in candidates:
+            if job.status == 'running' and job.attempts >= job.max_attempts:
+                # 最后一次尝试时 worker 崩溃，不再重试
+                _fail(job, job.last_error or "Worker lease expired")
+                continue
+
+            claimed = DeploymentJob.objects.filter(
+                pk=job.pk, status=job.status, locked_by=job.locked_by, lease_expires_at=job.lease_expires_at
+            ).update(
+                status='running',
+                locked_by=worker_id,
+                lease_expires_at=now + timedelta(seconds=lease_seconds),
+                heartbeat_at=now,
+                attempts=F('attempts') + 1,
+                updated_at=now
+            )
+            if claimed:
+                if job.status == 'running':
+                    logger.warning("Recovered deployment job %s from expired lease of %s", job.pk, job.locked_by)
+                job.refresh_from_db()
+                Deployment.objects.filter(pk=job.deployment_id).update(status='running')
+                return job
+    return None
+
+
+def heartbeat(job, lease_seconds=None):
+    """续约，返回 False 表示租约已被其他 worker 接管"""
+    lease_seconds = lease_seconds or _setting('DEPLOY_JOB_LEASE_SECONDS', DEFAULT_LEASE_SECONDS)
+    now = timezone.now()
+    return bool(DeploymentJob.objects.filter(pk=job.pk, status='running', locked_by=job.locked_by).update(
+        lease_expires_at=now + timedelta(seconds=lease_seconds),
+        heartbeat_at=now,
+        updated_at=now
+    ))
+
+
+def complete_job(job):
+    with transaction.atomic():
+        updated = DeploymentJob.objects.filter(pk=job.pk, status='running', locked_by=job.locked_by).update(
+            status='done', locked_by='', lease_expires_at=None, last_error='', updated_at=timezone.now()
+        )
+        if updated:
+            Deployment.objects.filter(pk=job.deployment_id).update(status='success', error_message='')
+    return bool(updated)
+
+
+def retry_delay(attempts):
+    """带随机抖动的指数退避"""
+    base = _setting('DEPLOY_JOB_RETRY_BASE_SECONDS', DEFAULT_RETRY_BASE_SECONDS)
+    cap = _setting('DEPLOY_JOB_RETRY_MAX_SECONDS', DEFAULT_RETRY_MAX_SECONDS)
+    delay = min(cap, base * 2 ** max(attempts - 1, 0))
+    return random.uniform(delay / 2, delay)
+
+
+def fail_job(job, error, retry=True):
+    """
+    任务执行失败：尚有重试次数时按退避时间重新排队，否则标记部署失败
+    retry=False 表示错误不可恢复，直接失败
+    """
+    with transaction.atomic():
+        if retry and job.attempts < job.max_attempts:
+            updated = DeploymentJob.objects.filter(pk=job.pk, status='running', locked_by=job.locked_by).update(
+                status='queued',
+                locked_by='',
+                lease_expires_at=None,
+                last_error=error,
+                run_after=timezone.now() + timedelta(seconds=retry_delay(job.attempts)),
+                updated_at=timezone.now()
+            )
+            if updated:
+                Deployment.objects.filter(pk=job.deployment_id).update(status='pending', error_message=error)
+            return bool(updated)
+
+        if not DeploymentJob.objects.filter(pk=job.pk, status='running', locked_by=job.locked_by).exists():
+            return False
+        _fail(job, error)
+        return True
+
+
+def defer_job(job, delay, reason):
+    """
+    GitLab 暂时不可用（限流或熔断）时把任务放回队列，delay 秒后再执行
+    这不是任务本身的失败，不消耗重试次数
+    """
+    with transaction.atomic():
+        updated = DeploymentJob.objects.filter(pk=job.pk, status='running', locked_by=job.locked_by).update(
+            status='queued',
+            locked_by='',
+            lease_expires_at=None,
+            attempts=F('attempts') - 1,
+            last_error=reason,
+            run_after=timezone.now() + timedelta(seconds=delay),
+            updated_at=timezone.now()
+        )
+        if updated:
+            Deployment.objects.filter(pk=job.deployment_id).update(status='pending', error_message=reason)
+    return bool(updated)
+
+
+def _fail(job, error):
+    DeploymentJob.objects.filter(pk=job.pk).update(
+        status='failed', locked_by='', lease_expires_at=None, last_error=error, updated_at=timezone.now()
+    )
+    Deployment.objects.filter(pk=job.deployment_id).update(status='failed', error_message=error)
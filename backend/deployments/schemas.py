@@ -1,6 +1,6 @@
-from typing import Optional, List
+from typing import Literal, Optional, List
 from datetime import datetime
-from ninja import Schema
+from ninja import Field, Schema
 
 class HookInfoSchema(Schema):
     id: int
@@ -19,6 +19,14 @@ class DeploymentCreateSchema(Schema):
     target_id: Optional[str] = None
     target_name: Optional[str] = None
     hook_version_id: Optional[int] = None  # 可选，如果不提供则使用最新版本
+    gitlab_config_id: Optional[int] = None  # 目标 GitLab 实例，不提供时使用第一个启用的配置
+    gitlab_config_ids: Optional[List[int]] = None  # 同时部署到多个实例（跨实例部署）
+
+class DeploymentBulkCreateSchema(Schema):
+    deployment_level: Literal['project', 'group']
+    targets: List[str] = Field(..., min_length=1, max_length=1000)  # 项目/组 id 或完整路径
+    hook_version_id: Optional[int] = None
+    gitlab_config_id: Optional[int] = None
 
 class DeploymentSchema(Schema):
     id: int
@@ -27,6 +35,8 @@ class DeploymentSchema(Schema):
     deployment_level: str
     target_id: Optional[str]
     target_name: Optional[str]
+    gitlab_config_id: Optional[int]
+    cross_instance: bool
     status: str
     error_message: str
     deployed_at: datetime
@@ -39,6 +49,8 @@ class DeploymentListSchema(Schema):
     deployment_level: str
     target_id: Optional[str]
     target_name: Optional[str]
+    gitlab_config_id: Optional[int]
+    cross_instance: bool
     status: str
     deployed_at: datetime
     deployed_by: UserInfoSchema
\ No newline at end of file
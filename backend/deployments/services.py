@@ -0,0 +1,126 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+
+from gitlab_integration.catalog import resolve_group_projects
+from gitlab_integration.registry import get_client
+from gitlab_integration.scheduler import GitLabUnavailable
+from hooks.history import materialize_version
+
+from .models import Deployment
+
+
+class DeploymentError(Exception):
+    """部署失败"""
+
+
+def execute_deployment(deployment, client=None):
+    """根据部署级别调用 GitLab 完成实际部署，失败时抛出异常"""
+    if deployment.cross_instance:
+        return execute_cross_instance_deployment(deployment)
+
+    client = client or get_client(deployment.gitlab_config_id)
+    hook = deployment.hook
+    # GitLab 被限流或熔断时直接抛出 GitLabUnavailable，任务稍后再执行
+    client.scheduler.raise_if_unavailable()
+
+    with materialize_version(deployment.hook_version) as hook_file_path:
+        if deployment.deployment_level == 'server':
+            result = client.deploy_server_hook(hook_file_path, hook.hook_type)
+        elif deployment.deployment_level == 'project':
+            result = client.deploy_project_hook(deployment.target_id, hook_file_path, hook.hook_type)
+        elif deployment.deployment_level == 'group':
+            result = execute_group_deployment(client, deployment, hook_file_path)
+        else:
+            raise DeploymentError(f"Unknown deployment level: {deployment.deployment_level}")
+
+    if not result:
+        raise DeploymentError(f"Failed to deploy {hook.name} to {deployment.target_name or 'server'}")
+
+
+def execute_group_deployment(client, deployment, hook_file_path):
+    """
+    组级别部署：展开组及其子组的所有项目，并发部署，每个项目记录一条子部署
+    重试时跳过已成功的项目；有项目失败时抛出异常，由任务队列按退避时间重试
+    """
+    succeeded = set(deployment.children.filter(status='success').values_list('target_id', flat=True))
+    projects = (
+        project for project in resolve_group_projects(client, deployment.target_id)
+        if str(project['id']) not in succeeded
+    )
+
+    total = len(succeeded)
+    failed = 0
+    for project, error in client.deploy_projects(projects, hook_file_path, deployment.hook.hook_type):
+        total += 1
+        failed += bool(error)
+        Deployment.objects.update_or_create(
+            parent=deployment,
+            target_id=str(project['id']),
+            defaults={
+                'hook': deployment.hook,
+                'hook_version': deployment.hook_version,
+                'deployment_level': 'project',
+                'target_name': project.get('path_with_namespace') or project.get('name'),
+                'status': 'failed' if error else 'success',
+                'error_message': error or '',
+                'deployed_by': deployment.deployed_by,
+            }
+        )
+
+    if failed:
+        # 中途熔断导致的失败不消耗重试次数，等 GitLab 恢复后继续部署剩余项目
+        client.scheduler.raise_if_unavailable()
+        raise DeploymentError(f"{failed} of {total} projects failed")
+    return True
+
+
+def execute_cross_instance_deployment(deployment):
+    """
+    跨实例部署：每个实例一条子部署，并发执行
+    重试时跳过已成功的实例；只因 GitLab 暂时不可用而失败时抛出 GitLabUnavailable，任务排队等待
+    """
+    instances = list(
+        deployment.children.exclude(status='success').select_related('hook', 'hook_version', 'gitlab_config')
+    )
+    errors = {}
+    clients = {}
+    for child in instances:
+        try:
+            clients[child.pk] = get_client(child.gitlab_config_id)
+        except ValueError as e:
+            errors[child.pk] = e
+
+    def deploy(child):
+        try:
+            execute_deployment(child, clients[child.pk])
+        except Exception as e:
+            return e
+        finally:
+            # 组级别部署会在线程中写入子部署记录，线程结束时释放它的数据库连接
+            close_old_connections()
+        return None
+
+    runnable = [child for child in instances if child.pk in clients]
+    Deployment.objects.filter(pk__in=[child.pk for child in runnable]).update(status='running')
+    if runnable:
+        with ThreadPoolExecutor(max_workers=len(runnable)) as executor:
+            for child, error in zip(runnable, executor.map(deploy, runnable)):
+                if error:
+                    errors[child.pk] = error
+
+    for child in instances:
+        error = errors.get(child.pk)
+        if error is None:
+            status = 'success'
+        elif isinstance(error, GitLabUnavailable):
+            status = 'pending'
+        else:
+            status = 'failed'
+        Deployment.objects.filter(pk=child.pk).update(status=status, error_message=str(error) if error else '')
+
+    if errors:
+        if all(isinstance(error, GitLabUnavailable) for error in errors.values()):
+            raise max(errors.values(), key=lambda error: error.retry_after)
+        raise DeploymentError(f"{len(errors)} of {deployment.children.count()} GitLab instances failed")
+    return True
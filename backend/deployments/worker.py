@@ -0,0 +1,80 @@
+import logging
+import os
+import socket
+import threading
+
+from django.db import close_old_connections, connection
+
+from .models import Deployment
+from gitlab_integration.events import process_next_event
+from gitlab_integration.scheduler import GitLabUnavailable
+
+from .queue import DEFAULT_LEASE_SECONDS, claim_job, complete_job, defer_job, fail_job, heartbeat
+from .services import execute_deployment
+
+logger = logging.getLogger(__name__)
+
+
+class DeploymentWorker:
+    """
+    循环领取并执行部署任务，执行期间由心跳线程续约
+    同时处理 GitLab 系统钩子事件，事件触发的自动部署随后由同一批 worker 执行
+    """
+
+    def __init__(self, worker_id=None, lease_seconds=DEFAULT_LEASE_SECONDS, poll_interval=2.0):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.stopping = threading.Event()
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def run(self, once=False):
+        logger.info("Deployment worker %s started", self.worker_id)
+        while not self.stopping.is_set():
+            close_old_connections()
+            processed = self.run_one()
+            if once and not processed:
+                break
+            if not processed:
+                self.stopping.wait(self.poll_interval)
+        logger.info("Deployment worker %s stopped", self.worker_id)
+
+    def run_one(self):
+        """处理一个系统钩子事件或执行一个部署任务，都没有时返回 False"""
+        if process_next_event(self.worker_id):
+            return True
+
+        job = claim_job(self.worker_id, self.lease_seconds)
+        if not job:
+            return False
+
+        done = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(job, done), daemon=True)
+        beat.start()
+        try:
+            deployment = Deployment.objects.select_related('hook', 'hook_version').get(pk=job.deployment_id)
+            execute_deployment(deployment)
+        except GitLabUnavailable as e:
+            # 在调度器后面排队等待，而不是把部署标记为失败
+            logger.warning("Deployment job %s deferred for %.0fs: %s", job.pk, e.retry_after, e)
+            defer_job(job, e.retry_after, str(e))
+        except Exception as e:
+            logger.exception("Deployment job %s failed (attempt %s/%s)", job.pk, job.attempts, job.max_attempts)
+            fail_job(job, str(e))
+        else:
+            complete_job(job)
+        finally:
+            done.set()
+            beat.join()
+        return True
+
+    def _heartbeat(self, job, done):
+        try:
+            while not done.wait(self.lease_seconds / 3):
+                if not heartbeat(job, self.lease_seconds):
+                    logger.warning("Deployment job %s lease was taken over by another worker", job.pk)
+                    return
+        finally:
+            connection.close()
@@ -1,6 +1,31 @@
 from django.contrib import admin
-from .models import GitLabConfig
+from .models import GitLabConfig, GitLabGroup, GitLabHealthSample, GitLabProject, SystemHookEvent
 
 @admin.register(GitLabConfig)
 class GitLabConfigAdmin(admin.ModelAdmin):
-    list_display = ('url', 'is_active', 'created_at', 'updated_at')
\ No newline at end of file
+    list_display = ('url', 'is_active', 'created_at', 'updated_at')
+
+@admin.register(GitLabProject)
+class GitLabProjectAdmin(admin.ModelAdmin):
+    list_display = ('path_with_namespace', 'config', 'visibility', 'last_activity_at', 'synced_at')
+    list_filter = ('config', 'visibility')
+    search_fields = ('path_with_namespace',)
+
+
+@admin.register(GitLabGroup)
+class GitLabGroupAdmin(admin.ModelAdmin):
+    list_display = ('full_path', 'config', 'visibility', 'synced_at')
+    list_filter = ('config', 'visibility')
+    search_fields = ('full_path',)
+
+
+@admin.register(SystemHookEvent)
+class SystemHookEventAdmin(admin.ModelAdmin):
+    list_display = ('event_name', 'config', 'status', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('config', 'status', 'event_name')
+
+
+@admin.register(GitLabHealthSample)
+class GitLabHealthSampleAdmin(admin.ModelAdmin):
+    list_display = ('config', 'checked_at', 'ok', 'latency_ms', 'version', 'error')
+    list_filter = ('config', 'ok')
@@ -1,18 +1,44 @@
-from typing import List
-from ninja import Router
-from django.shortcuts import get_object_or_404
+import json
+import logging
+from typing import List, Literal, Optional
+
+import httpx
+from asgiref.sync import sync_to_async
+from ninja import Query, Router
+from requests.exceptions import RequestException
+from django.shortcuts import aget_object_or_404, get_object_or_404
 from ninja.pagination import paginate
+from api.auth import async_django_auth
+from .catalog import catalog_page, filter_catalog, local_group_item, local_project_item
+from .events import find_config_by_token, record_event
+from .health import server_info
 from .models import GitLabConfig
 from .schemas import (
     GitLabConfigSchema,
     GitLabConfigCreateSchema,
     GitLabConfigUpdateSchema,
-    GitLabProjectSchema,
-    GitLabGroupSchema,
+    GitLabProjectPageSchema,
+    GitLabGroupPageSchema,
+    GitLabSchedulerStateSchema,
+    GitLabServerInfoSchema,
+    SystemHookAcceptedSchema,
+    ErrorResponseSchema,
     SuccessResponseSchema,  # 添加这个导入
     TestConnectionResponseSchema  # 添加这个导入
 )
-from .utils import test_gitlab_connection, get_gitlab_projects, get_gitlab_groups
+from .async_http import request_scoped_sessions
+from .http import get_scheduler
+from .scheduler import GitLabUnavailable
+from .utils import (
+    GROUP_LIST_PARAMS,
+    PROJECT_LIST_PARAMS,
+    async_fetch_gitlab_page,
+    async_test_gitlab_connection,
+    group_item,
+    project_item
+)
+
+logger = logging.getLogger(__name__)
 
 router = Router()
 
@@ -36,7 +62,8 @@ def create_gitlab_config(request, payload: GitLabConfigCreateSchema):
     config = GitLabConfig.objects.create(
         url=payload.url,
         token=payload.token,
-        is_active=payload.is_active
+        is_active=payload.is_active,
+        system_hook_token=payload.system_hook_token
     )
     return config
 
@@ -54,6 +81,9 @@ def update_gitlab_config(request, config_id: int, payload: GitLabConfigUpdateSch
     if hasattr(payload, 'token') and payload.token:
         config.token = payload.token
 
+    if payload.system_hook_token:
+        config.system_hook_token = payload.system_hook_token
+
     config.save()
     return config
 
@@ -65,10 +95,11 @@ def delete_gitlab_config(request, config_id: int):
     return {"success": True}
 
 # 测试 GitLab 连接
-@router.post("/configs/{config_id}/test", response=TestConnectionResponseSchema)
-def test_gitlab_connection_endpoint(request, config_id: int):
-    config = get_object_or_404(GitLabConfig, id=config_id)
-    result = test_gitlab_connection(config.url, config.token)
+@router.post("/configs/{config_id}/test", response=TestConnectionResponseSchema, auth=async_django_auth)
+@request_scoped_sessions
+async def test_gitlab_connection_endpoint(request, config_id: int):
+    config = await aget_object_or_404(GitLabConfig, id=config_id)
+    result = await async_test_gitlab_connection(config.url, config.token)
 
     return {
         "success": result.get("success", False),
@@ -76,17 +107,125 @@ def test_gitlab_connection_endpoint(request, config_id: int):
     }
 
 
-# 获取 GitLab 项目列表
-@router.get("/configs/{config_id}/projects", response=List[GitLabProjectSchema])
-def list_gitlab_projects(request, config_id: int):
+# 获取 GitLab 请求调度器状态（限流、熔断）
+@router.get("/configs/{config_id}/scheduler", response=GitLabSchedulerStateSchema)
+def get_gitlab_scheduler(request, config_id: int):
     config = get_object_or_404(GitLabConfig, id=config_id)
-    projects = get_gitlab_projects(config.url, config.token)
-    return projects
+    return get_scheduler(config.url, config.token).state()
 
 
-# 获取 GitLab 组列表
-@router.get("/configs/{config_id}/groups", response=List[GitLabGroupSchema])
-def list_gitlab_groups(request, config_id: int):
+# 实例状态、版本和延迟分位数，来自后台健康检查（manage.py check_gitlab_health）的记录，不实时请求 GitLab
+@router.get("/configs/{config_id}/server-info", response=GitLabServerInfoSchema)
+def get_gitlab_server_info(request, config_id: int, window: int = Query(3600, ge=60, le=7 * 24 * 3600)):
     config = get_object_or_404(GitLabConfig, id=config_id)
-    groups = get_gitlab_groups(config.url, config.token)
-    return groups
\ No newline at end of file
+    return server_info(config, window_seconds=window)
+
+
+Visibility = Literal['private', 'internal', 'public']
+
+
+# 获取 GitLab 项目列表（游标分页）
+# 已同步到本地目录时直接查询本地索引，否则代理到 GitLab；search 为路径子串，namespace 为命名空间前缀
+# 代理 GitLab 的接口都是异步视图，等待 GitLab 响应时不占用 worker 线程
+@router.get(
+    "/configs/{config_id}/projects",
+    response={
+        200: GitLabProjectPageSchema, 400: ErrorResponseSchema, 502: ErrorResponseSchema, 503: ErrorResponseSchema
+    },
+    auth=async_django_auth
+)
+@request_scoped_sessions
+async def list_gitlab_projects(
+    request,
+    config_id: int,
+    cursor: str = None,
+    limit: int = Query(100, ge=1, le=100),
+    search: str = None,
+    namespace: str = None,
+    visibility: Optional[Visibility] = None
+):
+    config = await aget_object_or_404(GitLabConfig, id=config_id)
+    if config.projects_synced_at:
+        projects = filter_catalog(config.projects.all(), 'path_with_namespace', search, namespace, visibility)
+        return await sync_to_async(catalog_page)(projects, ('path_with_namespace', 'id'), local_project_item, limit, cursor)
+
+    if namespace:
+        return 400, {"message": "Namespace filter requires a synced catalog"}
+    params = _live_filters(PROJECT_LIST_PARAMS, search, visibility)
+    if search:
+        params["search_namespaces"] = "true"
+    return await _gitlab_page(config, "projects", params, project_item, limit, cursor)
+
+
+# 获取 GitLab 组列表（游标分页），过滤条件同项目列表
+@router.get(
+    "/configs/{config_id}/groups",
+    response={
+        200: GitLabGroupPageSchema, 400: ErrorResponseSchema, 502: ErrorResponseSchema, 503: ErrorResponseSchema
+    },
+    auth=async_django_auth
+)
+@request_scoped_sessions
+async def list_gitlab_groups(
+    request,
+    config_id: int,
+    cursor: str = None,
+    limit: int = Query(100, ge=1, le=100),
+    search: str = None,
+    namespace: str = None,
+    visibility: Optional[Visibility] = None
+):
+    config = await aget_object_or_404(GitLabConfig, id=config_id)
+    if config.groups_synced_at:
+        groups = filter_catalog(config.groups.all(), 'full_path', search, namespace, visibility)
+        return await sync_to_async(catalog_page)(groups, ('full_path', 'id'), local_group_item, limit, cursor)
+
+    if namespace:
+        return 400, {"message": "Namespace filter requires a synced catalog"}
+    params = _live_filters(GROUP_LIST_PARAMS, search, visibility)
+    return await _gitlab_page(config, "groups", params, group_item, limit, cursor)
+
+
+def _live_filters(params, search, visibility):
+    params = dict(params)
+    if search:
+        params["search"] = search
+    if visibility:
+        params["visibility"] = visibility
+    return params
+
+
+async def _gitlab_page(config, path, params, to_item, limit, cursor):
+    try:
+        items, next_cursor = await async_fetch_gitlab_page(config.url, config.token, path, params, limit, cursor)
+    except ValueError as e:
+        return 400, {"message": str(e)}
+    except GitLabUnavailable as e:
+        return 503, {"message": f"{e}, retry after {e.retry_after:.0f}s"}
+    except (RequestException, httpx.HTTPError) as e:
+        logger.warning("Failed to fetch GitLab %s from %s: %s", path, config.url, e)
+        return 502, {"message": f"Failed to fetch {path} from GitLab: {e}"}
+    return {"items": [to_item(item) for item in items], "next_cursor": next_cursor}
+
+
+# 接收 GitLab 系统钩子（Admin Area > System Hooks，URL 指向此接口并设置 Secret token）
+@router.post(
+    "/system-hooks/",
+    response={202: SystemHookAcceptedSchema, 400: ErrorResponseSchema, 401: ErrorResponseSchema},
+    auth=None
+)
+def receive_system_hook(request):
+    """校验令牌后只把事件入库并立即确认，目录更新和自动部署由 worker 异步完成"""
+    config = find_config_by_token(request.headers.get('X-Gitlab-Token'))
+    if config is None:
+        return 401, {"message": "Invalid system hook token"}
+
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return 400, {"message": "Invalid JSON payload"}
+    if not isinstance(payload, dict):
+        return 400, {"message": "Invalid JSON payload"}
+
+    event = record_event(config, payload)
+    return 202, {"id": event.id if event else None, "queued": event is not None}
@@ -3,4 +3,8 @@ from django.apps import AppConfig
 
 class GitlabIntegrationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'gitlab_integration'
\ No newline at end of file
+    name = 'gitlab_integration'
+
+    def ready(self):
+        # 注册 GitLabConfig 变更时清除客户端缓存的信号处理
+        from . import registry  # noqa: F401
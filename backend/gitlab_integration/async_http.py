@@ -0,0 +1,156 @@
+import asyncio
+import functools
+import ssl
+import threading
+import weakref
+
+import certifi
+import httpx
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+
+from .cache import cache_key, response_cache
+from .http import get_scheduler
+from .scheduler import DEFAULT_MAX_RETRIES
+
+DEFAULT_TIMEOUT = (5, 30)
+# 异步客户端不占用线程，可以维持比同步连接池多得多的并发连接
+DEFAULT_POOL_SIZE = 100
+
+
+@functools.lru_cache(maxsize=None)
+def ssl_context():
+    # 加载 CA 证书需要几十毫秒；同步视图中每个事件循环都会新建客户端，因此共享同一个 SSLContext
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+class AsyncGitLabSession:
+    """
+    GitLabSession 的 asyncio 版本，基于 httpx.AsyncClient 的连接池
+    与同步会话共享同一个实例的 RequestScheduler 和响应缓存，限流、重试、熔断和条件请求的行为一致
+    """
+
+    def __init__(self, base_url, token, pool_size=None, timeout=None, scheduler=None, max_retries=None):
+        self.base_url = base_url.rstrip('/')
+        self.token = token
+        self.scheduler = scheduler
+        self.max_retries = max_retries if max_retries is not None else getattr(
+            settings, 'GITLAB_MAX_RETRIES', DEFAULT_MAX_RETRIES
+        )
+        connect_timeout, read_timeout = timeout or getattr(settings, 'GITLAB_HTTP_TIMEOUT', DEFAULT_TIMEOUT)
+        pool_size = pool_size or getattr(settings, 'GITLAB_ASYNC_POOL_SIZE', DEFAULT_POOL_SIZE)
+        self.client = httpx.AsyncClient(
+            base_url=f"{self.base_url}/api/v4/",
+            headers={
+                'PRIVATE-TOKEN': token,
+                'Accept': 'application/json',
+                'Accept-Encoding': 'gzip, deflate',
+            },
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            verify=ssl_context(),
+        )
+
+    async def get(self, path, **kwargs):
+        return await self.request('GET', path, **kwargs)
+
+    async def request(self, method, path, **kwargs):
+        path = path.lstrip('/') if not path.startswith(('http://', 'https://')) else path
+        full_url = str(self.client.build_request(method, path, params=kwargs.get('params')).url)
+        key = cache_key(self.base_url, self.token, method, full_url, kwargs)
+        if key is None:
+            return await self._send(method, path, **kwargs)
+
+        cached = response_cache.get(key)
+        if cached:
+            kwargs['headers'] = {**(kwargs.get('headers') or {}), **cached.validators()}
+        response = await self._send(method, path, **kwargs)
+        if response.status_code == 304 and cached:
+            response_cache.record(hit=True)
+            await response.aclose()
+            return httpx.Response(
+                200, headers=cached.merged_headers(response.headers), content=cached.content, request=response.request
+            )
+        response_cache.record(hit=False)
+        if response.status_code == 200:
+            response_cache.store(key, response)
+        return response
+
+    async def _send(self, method, path, **kwargs):
+        if self.scheduler is None:
+            return await self.client.request(method, path, **kwargs)
+
+        scheduler = self.scheduler
+        attempt = 0
+        while True:
+            wait, probe = scheduler.start_request()
+            try:
+                if wait:
+                    await asyncio.sleep(wait)
+                response = await self.client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                delay = scheduler.retry_after_error(method, path, e, attempt, self.max_retries)
+                if delay is None:
+                    raise
+            except BaseException:
+                # 取消或其他异常：请求没有结果，不能占住探测名额
+                if probe:
+                    scheduler.release_probe()
+                raise
+            else:
+                delay = scheduler.retry_after_response(
+                    method, path, response.status_code, response.headers, attempt, self.max_retries
+                )
+                if delay is None:
+                    return response
+                await response.aclose()
+
+            attempt += 1
+            if delay:
+                await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+# httpx 的连接池绑定在创建它的事件循环上，因此按事件循环分别缓存
+# 只有在 ASGI 服务器（config/asgi.py）下事件循环才长期存在，会话和连接池才能跨请求复用；
+# WSGI 下（runserver、config/wsgi.py）每个异步视图运行在新建的事件循环中，由 request_scoped_sessions 在请求结束时关闭
+_sessions = weakref.WeakKeyDictionary()
+_sessions_lock = threading.Lock()
+
+
+def get_async_session(url, token) -> AsyncGitLabSession:
+    """获取当前事件循环中该 GitLab 实例与令牌对应的共享异步会话"""
+    loop = asyncio.get_running_loop()
+    key = (url.rstrip('/'), token)
+    with _sessions_lock:
+        sessions = _sessions.setdefault(loop, {})
+        session = sessions.get(key)
+        if session is None:
+            session = sessions[key] = AsyncGitLabSession(url, token, scheduler=get_scheduler(url, token))
+        return session
+
+
+async def close_async_sessions():
+    """关闭当前事件循环中的所有异步会话"""
+    with _sessions_lock:
+        sessions = _sessions.pop(asyncio.get_running_loop(), {})
+    for session in sessions.values():
+        await session.aclose()
+
+
+def request_scoped_sessions(view):
+    """
+    使用 get_async_session 的异步视图的装饰器
+    WSGI 请求结束时关闭本次事件循环中创建的会话，否则每个请求都会留下一个未关闭的客户端和它的连接；
+    ASGI 请求不处理，会话留给同一事件循环中的后续请求复用
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(request, *args, **kwargs)
+        finally:
+            if not isinstance(request, ASGIRequest):
+                await close_async_sessions()
+    return wrapper
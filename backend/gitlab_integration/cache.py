@@ -0,0 +1,128 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+
+from django.conf import settings
+
+# 所有 GitLab 实例共享的响应缓存总大小（字节）
+DEFAULT_RESPONSE_CACHE_SIZE = 32 * 1024 * 1024
+
+# 缓存的是解压后的内容，这些头不再适用
+_STRIPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'}
+
+
+def _cacheable_headers(headers):
+    # 统一用小写名，requests 与 httpx 的响应头可以互相合并
+    return {name.lower(): value for name, value in headers.items() if name.lower() not in _STRIPPED_HEADERS}
+
+
+class CachedResponse(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content: bytes
+    headers: Dict[str, str]
+
+    def validators(self):
+        """发送条件请求所需的头"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def merged_headers(self, fresh):
+        """缓存的头加上 304 响应中更新的头（如限流状态、Date）"""
+        headers = dict(self.headers)
+        headers.update(_cacheable_headers(fresh))
+        return headers
+
+
+class ResponseCache:
+    """
+    GitLab GET 响应的 LRU 缓存，按 (实例, 令牌, 含查询参数的完整 URL) 保存带 ETag 或 Last-Modified 的响应
+    再次请求时发送 If-None-Match / If-Modified-Since，GitLab 返回 304 时使用缓存的内容
+    总大小按响应体字节数限制，超过后淘汰最久未使用的条目
+    """
+
+    def __init__(self, max_bytes=None):
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_bytes(self):
+        if self._max_bytes is not None:
+            return self._max_bytes
+        return getattr(settings, 'GITLAB_RESPONSE_CACHE_SIZE', DEFAULT_RESPONSE_CACHE_SIZE)
+
+    def get(self, key) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def store(self, key, response):
+        """保存 requests 或 httpx 的响应；没有 ETag 和 Last-Modified 的响应无法验证，不缓存"""
+        headers = response.headers
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+
+        content = response.content
+        max_bytes = self.max_bytes
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old.content)
+            # 单个响应不能挤掉大部分缓存
+            if len(content) > max_bytes // 8:
+                return
+            self._entries[key] = CachedResponse(etag, last_modified, content, _cacheable_headers(headers))
+            self._size += len(content)
+            while self._size > max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.content)
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def clear(self, base_url=None):
+        """清空缓存；指定 base_url 时只清除该实例的条目"""
+        with self._lock:
+            if base_url is None:
+                self._entries.clear()
+                self._size = 0
+                return
+            base_url = base_url.rstrip('/')
+            for key in [key for key in self._entries if key[0] == base_url]:
+                self._size -= len(self._entries.pop(key).content)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._size, 'hits': self.hits, 'misses': self.misses}
+
+
+response_cache = ResponseCache()
+
+
+def cache_key(base_url, token, method, url, kwargs):
+    """
+    可以走条件请求的调用返回缓存键，否则返回 None
+    只缓存非流式的 GET；调用方自己设置了条件请求头时不干预
+    """
+    if method.upper() != 'GET' or kwargs.get('stream') or not response_cache.max_bytes:
+        return None
+    headers = {name.lower() for name in (kwargs.get('headers') or {})}
+    if headers & {'if-none-match', 'if-modified-since'}:
+        return None
+    return (base_url, token, url)
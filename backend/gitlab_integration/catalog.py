@@ -0,0 +1,294 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from urllib.parse import quote
+from typing import Any, Dict, NamedTuple
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api.pagination import KeysetPagination
+
+from .models import GitLabConfig, GitLabGroup, GitLabProject
+from .utils import GROUP_LIST_PARAMS, iter_gitlab_pages
+
+logger = logging.getLogger(__name__)
+
+# 每批写入数据库的行数
+SYNC_BATCH_SIZE = 500
+
+# GitLab 最多每小时刷新一次项目的 last_activity_at，增量同步时向前多取一段时间
+DEFAULT_SYNC_OVERLAP_SECONDS = 3600
+# 增量同步发现不了被删除的项目，定期做一次全量同步清理
+DEFAULT_FULL_SYNC_INTERVAL_SECONDS = 24 * 3600
+
+# 同步需要 visibility 等字段，不能使用 simple=true
+PROJECT_SYNC_PARAMS = {"pagination": "keyset", "order_by": "id", "sort": "asc"}
+
+PROJECT_FIELDS = ['name', 'path_with_namespace', 'web_url', 'visibility', 'archived', 'last_activity_at', 'synced_at']
+GROUP_FIELDS = ['parent_id', 'name', 'path', 'full_path', 'web_url', 'visibility', 'synced_at']
+
+# 组展开结果的缓存有效期（秒）和最多缓存的组数；本进程同步目录时立即清除对应实例的缓存，
+# 同步命令在其他进程运行时依靠有效期刷新
+DEFAULT_GROUP_TREE_TTL = 300
+GROUP_TREE_CACHE_SIZE = 256
+
+# (config_id, 组 id 或完整路径) -> (过期时间, 组内所有项目)
+_group_trees = OrderedDict()
+_group_trees_lock = threading.Lock()
+
+
+class SyncResult(NamedTuple):
+    synced: int
+    deleted: int
+    full: bool
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _project_fields(project: Dict[str, Any]) -> Dict[str, Any]:
+    last_activity_at = project.get("last_activity_at")
+    return {
+        "gitlab_id": project["id"],
+        "name": project["name"],
+        "path_with_namespace": project["path_with_namespace"],
+        "web_url": project["web_url"],
+        "visibility": project.get("visibility") or "",
+        "archived": bool(project.get("archived")),
+        "last_activity_at": parse_datetime(last_activity_at) if last_activity_at else None,
+    }
+
+
+def _group_fields(group: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "gitlab_id": group["id"],
+        "parent_id": group.get("parent_id"),
+        "name": group["name"],
+        "path": group["path"],
+        "full_path": group["full_path"],
+        "web_url": group["web_url"],
+        "visibility": group.get("visibility") or "",
+    }
+
+
+def _upsert(model, config, items, to_fields, update_fields, synced_at):
+    """按批 upsert，以 (config, gitlab_id) 判断是否已存在"""
+    count = 0
+    batch = []
+
+    def flush():
+        model.objects.bulk_create(
+            batch, update_conflicts=True, unique_fields=['config', 'gitlab_id'], update_fields=update_fields
+        )
+
+    for item in items:
+        batch.append(model(config=config, synced_at=synced_at, **to_fields(item)))
+        if len(batch) >= SYNC_BATCH_SIZE:
+            flush()
+            count += len(batch)
+            batch = []
+    if batch:
+        flush()
+        count += len(batch)
+    return count
+
+
+def sync_projects(config: GitLabConfig, full: bool = None) -> SyncResult:
+    """
+    把 GitLab 项目同步到本地目录
+    首次同步和定期的全量同步会删除 GitLab 上已不存在的项目，其余时候只拉取上次同步后有活动的项目
+    """
+    started = timezone.now()
+    if full is None:
+        interval = timedelta(seconds=_setting('GITLAB_CATALOG_FULL_SYNC_INTERVAL', DEFAULT_FULL_SYNC_INTERVAL_SECONDS))
+        full = (
+            config.projects_synced_at is None
+            or config.projects_full_synced_at is None
+            or started - config.projects_full_synced_at >= interval
+        )
+
+    params = dict(PROJECT_SYNC_PARAMS)
+    if not full:
+        overlap = timedelta(seconds=_setting('GITLAB_CATALOG_SYNC_OVERLAP', DEFAULT_SYNC_OVERLAP_SECONDS))
+        params["last_activity_after"] = (config.projects_synced_at - overlap).isoformat()
+
+    projects = iter_gitlab_pages(config.url, config.token, "projects", params)
+    synced = _upsert(GitLabProject, config, projects, _project_fields, PROJECT_FIELDS, started)
+
+    deleted = 0
+    update = {"projects_synced_at": started}
+    if full:
+        deleted, _ = config.projects.filter(synced_at__lt=started).delete()
+        update["projects_full_synced_at"] = started
+    # 用 update 避免修改 updated_at
+    GitLabConfig.objects.filter(pk=config.pk).update(**update)
+    for name, value in update.items():
+        setattr(config, name, value)
+    invalidate_group_trees(config.pk)
+
+    logger.info("Synced %s projects from %s (full=%s, deleted=%s)", synced, config.url, full, deleted)
+    return SyncResult(synced, deleted, full)
+
+
+def sync_groups(config: GitLabConfig) -> SyncResult:
+    """
+    把 GitLab 组同步到本地目录
+    GitLab 的组列表接口不支持按更新时间过滤，组的数量也远少于项目，因此每次都全量同步
+    """
+    started = timezone.now()
+    groups = iter_gitlab_pages(config.url, config.token, "groups", GROUP_LIST_PARAMS)
+    synced = _upsert(GitLabGroup, config, groups, _group_fields, GROUP_FIELDS, started)
+    deleted, _ = config.groups.filter(synced_at__lt=started).delete()
+
+    GitLabConfig.objects.filter(pk=config.pk).update(groups_synced_at=started)
+    config.groups_synced_at = started
+    invalidate_group_trees(config.pk)
+
+    logger.info("Synced %s groups from %s (deleted=%s)", synced, config.url, deleted)
+    return SyncResult(synced, deleted, True)
+
+
+def sync_catalog(config: GitLabConfig, full: bool = None) -> Dict[str, SyncResult]:
+    return {
+        "groups": sync_groups(config),
+        "projects": sync_projects(config, full=full),
+    }
+
+
+def _prefix_filter(field, prefix):
+    """
+    前缀匹配；额外加上范围条件，使数据库可以沿 (config, path) 索引只扫描这一段
+    startswith 保证在非字节序排序规则下结果依然正确
+    """
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{f"{field}__gte": prefix, f"{field}__lt": upper, f"{field}__startswith": prefix})
+
+
+def _catalog_group_projects(config, group_id):
+    """
+    从本地目录展开组：子组的项目路径都以组的完整路径开头，一次范围查询即可取得所有后代项目
+    目录未同步或组不在目录中（同步之后才创建）时返回 None
+    """
+    if config.groups_synced_at is None or config.projects_synced_at is None:
+        return None
+
+    group_id = str(group_id)
+    lookup = {'gitlab_id': int(group_id)} if group_id.isdigit() else {'full_path': group_id.strip('/')}
+    full_path = config.groups.filter(**lookup).values_list('full_path', flat=True).first()
+    if full_path is None:
+        return None
+
+    projects = config.projects.filter(
+        _prefix_filter('path_with_namespace', full_path + '/')
+    ).order_by('gitlab_id').values_list('gitlab_id', 'name', 'path_with_namespace')
+    return [
+        {'id': gitlab_id, 'name': name, 'path_with_namespace': path}
+        for gitlab_id, name, path in projects.iterator()
+    ]
+
+
+def resolve_group_projects(client, group_id):
+    """
+    展开组及其所有子组下的项目，返回 [{'id', 'name', 'path_with_namespace'}, ...]
+    优先使用本地目录，否则通过 GitLab 的 include_subgroups 一次分页列出；
+    结果按实例和组缓存，同一个组在有效期内重复展开不再访问 GitLab 或数据库
+    """
+    key = (client.config.pk, str(group_id))
+    now = time.monotonic()
+    with _group_trees_lock:
+        cached = _group_trees.get(key)
+        if cached and cached[0] > now:
+            _group_trees.move_to_end(key)
+            return list(cached[1])
+
+    projects = _catalog_group_projects(client.config, group_id)
+    if projects is None:
+        projects = [
+            {'id': project['id'], 'name': project.get('name'),
+             'path_with_namespace': project.get('path_with_namespace')}
+            for project in client.iter_group_projects(group_id)
+        ]
+
+    ttl = _setting('GITLAB_GROUP_TREE_TTL', DEFAULT_GROUP_TREE_TTL)
+    with _group_trees_lock:
+        _group_trees[key] = (now + ttl, tuple(projects))
+        _group_trees.move_to_end(key)
+        while len(_group_trees) > GROUP_TREE_CACHE_SIZE:
+            _group_trees.popitem(last=False)
+    return projects
+
+
+def invalidate_group_trees(config_id=None):
+    """清除组展开缓存；指定 config_id 时只清除该实例的缓存"""
+    with _group_trees_lock:
+        if config_id is None:
+            _group_trees.clear()
+            return
+        for key in [key for key in _group_trees if key[0] == config_id]:
+            del _group_trees[key]
+
+
+def namespace_group_ids(client, full_paths):
+    """
+    把组的完整路径解析为 GitLab 组 id，返回 {full_path: id}；不是组的路径（如个人命名空间）被忽略
+    组目录已同步时查询本地目录，否则逐个查询 GitLab
+    """
+    config = client.config
+    if config.groups_synced_at is not None:
+        return dict(config.groups.filter(full_path__in=full_paths).values_list('full_path', 'gitlab_id'))
+
+    ids = {}
+    for full_path in full_paths:
+        response = client.session.get(f"groups/{quote(full_path, safe='')}", params={'with_projects': 'false'})
+        if response.status_code == 404:
+            continue
+        response.raise_for_status()
+        ids[full_path] = response.json()['id']
+    return ids
+
+
+def filter_catalog(queryset, path_field, search=None, namespace=None, visibility=None):
+    """
+    按路径子串（不区分大小写）、命名空间前缀和可见性过滤本地目录
+    namespace 匹配该命名空间及其所有子组下的条目
+    """
+    if namespace:
+        queryset = queryset.filter(_prefix_filter(path_field, namespace.strip('/') + '/'))
+    if visibility:
+        queryset = queryset.filter(visibility=visibility)
+    if search:
+        queryset = queryset.filter(**{f"{path_field}__icontains": search})
+    return queryset
+
+
+def catalog_page(queryset, ordering, to_item, limit, cursor=None):
+    """按 ordering 做 keyset 分页，返回 {"items": [...], "next_cursor": ...}"""
+    page = KeysetPagination(ordering=ordering).paginate_queryset(
+        queryset, KeysetPagination.Input(cursor=cursor, limit=limit)
+    )
+    return {"items": [to_item(item) for item in page["items"]], "next_cursor": page["next_cursor"]}
+
+
+def local_project_item(project: GitLabProject) -> Dict[str, Any]:
+    return {
+        "id": str(project.gitlab_id),
+        "name": project.name,
+        "path_with_namespace": project.path_with_namespace,
+        "web_url": project.web_url
+    }
+
+
+def local_group_item(group: GitLabGroup) -> Dict[str, Any]:
+    return {
+        "id": str(group.gitlab_id),
+        "name": group.name,
+        "path": group.path,
+        "full_path": group.full_path,
+        "web_url": group.web_url
+    }
@@ -1,22 +1,32 @@
-import requests
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import quote
+
+from django.conf import settings
+
+from .catalog import resolve_group_projects
+from .http import get_session
 from .models import GitLabConfig
 
 class GitLabClient:
     """GitLab API客户端"""
     
-    def __init__(self):
-        # 获取活跃的GitLab配置
-        config = GitLabConfig.objects.filter(is_active=True).first()
+    def __init__(self, config=None):
+        # 未指定配置时使用第一个启用的配置；需要复用客户端时使用 registry.get_client(config_id)
+        if config is None:
+            config = GitLabConfig.objects.filter(is_active=True).first()
         if not config:
             raise ValueError("No active GitLab configuration found")
         
+        self.config = config
         self.base_url = config.url.rstrip('/')
         self.token = config.token
-        self.headers = {'PRIVATE-TOKEN': self.token}
+        # 所有请求复用该实例的共享连接池
+        self.session = get_session(config.url, config.token)
+        self.scheduler = self.session.scheduler
     
     def get_projects(self, page=1, per_page=20):
         """获取项目列表"""
-        url = f"{self.base_url}/api/v4/projects"
+        url = "projects"
         params = {
             'page': page,
             'per_page': per_page,
@@ -24,13 +34,13 @@ class GitLabClient:
             'sort': 'asc'
         }
         
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self.session.get(url, params=params)
         response.raise_for_status()
         return response.json()
     
     def get_groups(self, page=1, per_page=20):
         """获取组列表"""
-        url = f"{self.base_url}/api/v4/groups"
+        url = "groups"
         params = {
             'page': page,
             'per_page': per_page,
@@ -38,7 +48,7 @@ class GitLabClient:
             'sort': 'asc'
         }
         
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self.session.get(url, params=params)
         response.raise_for_status()
         return response.json()
     
@@ -55,18 +65,60 @@ class GitLabClient:
         # 可能需要使用GitLab API或其他方式
         return True
     
+    def iter_group_projects(self, group_id, include_subgroups=True, per_page=100):
+        """逐页遍历组内（默认包含所有子组）的项目"""
+        # group_id 也可以是组的完整路径，需要整体 URL 编码
+        url = f"groups/{quote(str(group_id), safe='')}/projects"
+        params = {
+            'per_page': per_page,
+            'include_subgroups': 'true' if include_subgroups else 'false',
+            'order_by': 'id',
+            'sort': 'asc',
+            'simple': 'true'
+        }
+
+        while url:
+            response = self.session.get(url, params=params)
+            response.raise_for_status()
+            yield from response.json()
+
+            # 下一页的 URL 已包含所有查询参数
+            url = response.links.get('next', {}).get('url')
+            params = None
+
+    def deploy_projects(self, projects, hook_file_path, hook_type, max_workers=None):
+        """
+        使用有界线程池并发部署到多个项目，按完成顺序产出 (project, error)
+        projects 可以是生成器：同时在途的任务数不超过 max_workers 的两倍，不需要先取完所有项目
+        """
+        max_workers = max_workers or getattr(settings, 'GITLAB_DEPLOY_CONCURRENCY', 8)
+
+        def deploy(project):
+            if not self.deploy_project_hook(project['id'], hook_file_path, hook_type):
+                raise RuntimeError("Deployment rejected by GitLab")
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            in_flight = {}
+            projects = iter(projects)
+            exhausted = False
+            while in_flight or not exhausted:
+                while not exhausted and len(in_flight) < max_workers * 2:
+                    project = next(projects, None)
+                    if project is None:
+                        exhausted = True
+                        break
+                    in_flight[executor.submit(deploy, project)] = project
+
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    project = in_flight.pop(future)
+                    error = future.exception()
+                    yield project, str(error) if error else None
+
     def deploy_group_hook(self, group_id, hook_file_path, hook_type):
-        """部署组级别的hook（通过为组内所有项目部署）"""
-        # 获取组内所有项目
-        url = f"{self.base_url}/api/v4/groups/{group_id}/projects"
-        params = {'per_page': 100}
-        
-        response = requests.get(url, headers=self.headers, params=params)
-        response.raise_for_status()
-        projects = response.json()
-        
-        # 为每个项目部署hook
-        for project in projects:
-            self.deploy_project_hook(project['id'], hook_file_path, hook_type)
-        
-        return True
\ No newline at end of file
+        """部署组级别的hook（通过为组及其子组内所有项目部署）"""
+        projects = resolve_group_projects(self, group_id)
+        results = list(self.deploy_projects(projects, hook_file_path, hook_type))
+        return all(error is None for _, error in results)
@@ -0,0 +1,222 @@
+import hmac
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .catalog import PROJECT_FIELDS, GROUP_FIELDS, _prefix_filter, _upsert, invalidate_group_trees
+from .models import GitLabConfig, GitLabGroup, GitLabProject, SystemHookEvent
+from .scheduler import GitLabUnavailable
+
+logger = logging.getLogger(__name__)
+
+# 处理的系统钩子事件；push、tag_push 等其他事件直接确认，不入库
+PROJECT_EVENTS = {'project_create', 'project_destroy', 'project_rename', 'project_transfer', 'project_update'}
+GROUP_EVENTS = {'group_create', 'group_destroy', 'group_rename', 'subgroup_create', 'subgroup_destroy'}
+SYSTEM_HOOK_EVENTS = PROJECT_EVENTS | GROUP_EVENTS
+
+# worker 处理事件的租约（秒），worker 崩溃后事件在租约过期时被重新领取
+DEFAULT_EVENT_LEASE_SECONDS = 60
+# 处理失败的事件最多尝试的次数，以及重试退避的基数和上限（秒）
+DEFAULT_EVENT_MAX_ATTEMPTS = 5
+DEFAULT_EVENT_RETRY_BASE_SECONDS = 10
+DEFAULT_EVENT_RETRY_MAX_SECONDS = 600
+
+# 事件处理开始、进入数据库事务之前发送，参数 event 为 SystemHookEvent，context 为 dict
+# 需要访问 GitLab 的接收方在这里取得数据并放进 context，不要在事务中等待网络请求
+system_hook_preparing = Signal()
+# 事件应用到本地目录之后发送，参数同上；接收方在同一事务中执行，只做数据库操作
+system_hook_received = Signal()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def find_config_by_token(token):
+    """按系统钩子的 Secret token 找到对应的启用配置，不匹配时返回 None"""
+    if not token:
+        return None
+    for config in GitLabConfig.objects.filter(is_active=True).exclude(system_hook_token=''):
+        # 常量时间比较，避免通过响应时间猜测令牌
+        if hmac.compare_digest(config.system_hook_token.encode(), token.encode()):
+            return config
+    return None
+
+
+def record_event(config, payload):
+    """保存需要处理的事件；不处理的事件返回 None"""
+    event_name = payload.get('event_name')
+    if event_name not in SYSTEM_HOOK_EVENTS:
+        return None
+    return SystemHookEvent.objects.create(
+        config=config, event_name=event_name, payload=payload,
+        max_attempts=_setting('GITLAB_EVENT_MAX_ATTEMPTS', DEFAULT_EVENT_MAX_ATTEMPTS)
+    )
+
+
+def _ready_events(now):
+    # 待处理且已到重试时间的事件，或 worker 崩溃后租约已过期的事件
+    return Q(status='pending', run_after__lte=now) | Q(status='processing', lease_expires_at__lt=now)
+
+
+def claim_event(worker_id, lease_seconds=DEFAULT_EVENT_LEASE_SECONDS):
+    """按接收顺序领取一个待处理的事件，没有事件时返回 None"""
+    now = timezone.now()
+    candidates = SystemHookEvent.objects.filter(_ready_events(now)).order_by('id').values(
+        'pk', 'status', 'attempts', 'max_attempts', 'error_message'
+    )[:10]
+    for candidate in candidates:
+        if candidate['status'] == 'processing' and candidate['attempts'] >= candidate['max_attempts']:
+            # 最后一次尝试时 worker 崩溃，不再重试
+            SystemHookEvent.objects.filter(_ready_events(now), pk=candidate['pk']).update(
+                status='failed', locked_by='', lease_expires_at=None, processed_at=now,
+                error_message=candidate['error_message'] or "Worker lease expired"
+            )
+            continue
+        claimed = SystemHookEvent.objects.filter(_ready_events(now), pk=candidate['pk']).update(
+            status='processing', locked_by=worker_id, lease_expires_at=now + timedelta(seconds=lease_seconds),
+            attempts=F('attempts') + 1
+        )
+        if claimed:
+            return SystemHookEvent.objects.select_related('config').get(pk=candidate['pk'])
+    return None
+
+
+def retry_delay(attempts):
+    """带随机抖动的指数退避"""
+    base = _setting('GITLAB_EVENT_RETRY_BASE_SECONDS', DEFAULT_EVENT_RETRY_BASE_SECONDS)
+    cap = _setting('GITLAB_EVENT_RETRY_MAX_SECONDS', DEFAULT_EVENT_RETRY_MAX_SECONDS)
+    delay = min(cap, base * 2 ** max(attempts - 1, 0))
+    return random.uniform(delay / 2, delay)
+
+
+def process_event(event):
+    """
+    把事件应用到本地目录并通知接收方（如自动部署）
+    失败的事件按退避时间重新排队，用完重试次数后标记为 failed；
+    GitLab 暂时不可用（限流或熔断）时推迟处理，不消耗重试次数
+    """
+    context = {}
+    try:
+        system_hook_preparing.send(sender=SystemHookEvent, event=event, context=context)
+        with transaction.atomic():
+            apply_to_catalog(event.config, event.event_name, event.payload)
+            system_hook_received.send(sender=SystemHookEvent, event=event, context=context)
+    except GitLabUnavailable as e:
+        logger.warning("GitLab system hook event %s deferred for %.0fs: %s", event.pk, e.retry_after, e)
+        _requeue_event(event, e.retry_after, str(e), attempts=F('attempts') - 1)
+        return False
+    except Exception as e:
+        logger.exception(
+            "Failed to process GitLab system hook event %s (%s), attempt %s/%s",
+            event.pk, event.event_name, event.attempts, event.max_attempts
+        )
+        if event.attempts < event.max_attempts:
+            _requeue_event(event, retry_delay(event.attempts), str(e))
+        else:
+            _finish_event(event, 'failed', str(e))
+        return False
+    _finish_event(event, 'done', '')
+    return True
+
+
+def _requeue_event(event, delay, error, **fields):
+    SystemHookEvent.objects.filter(pk=event.pk, locked_by=event.locked_by).update(
+        status='pending', error_message=error, locked_by='', lease_expires_at=None,
+        run_after=timezone.now() + timedelta(seconds=delay), **fields
+    )
+
+
+def _finish_event(event, status, error):
+    SystemHookEvent.objects.filter(pk=event.pk, locked_by=event.locked_by).update(
+        status=status, error_message=error, locked_by='', lease_expires_at=None, processed_at=timezone.now()
+    )
+
+
+def process_next_event(worker_id):
+    """处理一个事件，没有待处理的事件时返回 False"""
+    event = claim_event(worker_id)
+    if event is None:
+        return False
+    process_event(event)
+    return True
+
+
+def apply_to_catalog(config, event_name, payload):
+    """
+    按事件增量更新本地目录；目录尚未同步时不做处理，首次同步会取得完整数据
+    事件可能乱序处理，项目和组的新增、改名都按 GitLab id upsert
+    """
+    if event_name in PROJECT_EVENTS and config.projects_synced_at is not None:
+        if event_name == 'project_destroy':
+            config.projects.filter(gitlab_id=payload['project_id']).delete()
+        else:
+            _upsert_project(config, payload)
+    elif event_name in GROUP_EVENTS and config.groups_synced_at is not None:
+        # 子组事件的负载同样带有 group_id、name、path 和 full_path
+        if event_name in ('group_destroy', 'subgroup_destroy'):
+            _delete_group(config, payload['full_path'])
+        else:
+            if event_name == 'group_rename':
+                _move_namespace(config, payload['old_full_path'], payload['full_path'])
+            _upsert_group(config, payload)
+    else:
+        return
+    invalidate_group_trees(config.pk)
+
+
+def _upsert_project(config, payload):
+    existing = config.projects.filter(gitlab_id=payload['project_id']).first()
+    path = payload['path_with_namespace']
+    _upsert(GitLabProject, config, [{
+        'gitlab_id': payload['project_id'],
+        'name': payload['name'],
+        'path_with_namespace': path,
+        'web_url': f"{config.url.rstrip('/')}/{path}",
+        'visibility': payload.get('project_visibility') or (existing.visibility if existing else ''),
+        'archived': existing.archived if existing else False,
+        'last_activity_at': existing.last_activity_at if existing else timezone.now(),
+    }], lambda fields: fields, PROJECT_FIELDS, timezone.now())
+
+
+def _upsert_group(config, payload):
+    full_path = payload['full_path']
+    parent_path = full_path.rpartition('/')[0]
+    existing = config.groups.filter(gitlab_id=payload['group_id']).first()
+    parent_id = config.groups.filter(full_path=parent_path).values_list('gitlab_id', flat=True).first()
+    _upsert(GitLabGroup, config, [{
+        'gitlab_id': payload['group_id'],
+        'parent_id': parent_id,
+        'name': payload['name'],
+        'path': payload['path'],
+        'full_path': full_path,
+        'web_url': f"{config.url.rstrip('/')}/groups/{full_path}",
+        'visibility': existing.visibility if existing else '',
+    }], lambda fields: fields, GROUP_FIELDS, timezone.now())
+
+
+def _delete_group(config, full_path):
+    config.groups.filter(Q(full_path=full_path) | _prefix_filter('full_path', full_path + '/')).delete()
+    config.projects.filter(_prefix_filter('path_with_namespace', full_path + '/')).delete()
+
+
+def _move_namespace(config, old_path, new_path):
+    """组改名后，子组和项目的路径前缀一起改变"""
+    base_url = config.url.rstrip('/')
+    old_prefix, new_prefix = old_path + '/', new_path + '/'
+    for queryset, field, web_prefix in (
+        (config.groups.filter(_prefix_filter('full_path', old_prefix)), 'full_path', f"{base_url}/groups/"),
+        (config.projects.filter(_prefix_filter('path_with_namespace', old_prefix)), 'path_with_namespace', f"{base_url}/"),
+    ):
+        rows = list(queryset.only('pk', field))
+        for row in rows:
+            path = new_prefix + getattr(row, field)[len(old_prefix):]
+            setattr(row, field, path)
+            row.web_url = web_prefix + path
+        queryset.model.objects.bulk_update(rows, [field, 'web_url'], batch_size=500)
@@ -0,0 +1,156 @@
+from typing import Any, Dict, Iterable, List
+
+from requests.exceptions import RequestException
+
+# 每个查询最多解析的 id 或路径数，也是 GitLab 连接类型单页的最大节点数
+GRAPHQL_BATCH_SIZE = 100
+# 按路径解析组时每个路径是一个带别名的 group 字段，查询复杂度随别名数线性增长，
+# 需要远低于 GitLab 的复杂度上限（250）
+GRAPHQL_ALIAS_BATCH_SIZE = 30
+
+PROJECTS_QUERY = """
+query($ids: [ID!], $fullPaths: [String!], $first: Int!, $after: String) {
+  projects(ids: $ids, fullPaths: $fullPaths, first: $first, after: $after) {
+    nodes { id name fullPath webUrl }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+
+GROUPS_QUERY = """
+query($ids: [ID!], $first: Int!, $after: String) {
+  groups(ids: $ids, first: $first, after: $after) {
+    nodes { id name path fullPath webUrl }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+
+GROUP_FIELDS = "id name path fullPath webUrl"
+
+
+class GitLabGraphQLError(RequestException):
+    """GitLab GraphQL 接口返回了 errors"""
+
+
+def _global_id(kind, gitlab_id):
+    return f"gid://gitlab/{kind}/{gitlab_id}"
+
+
+def _numeric_id(global_id):
+    return int(global_id.rsplit('/', 1)[1])
+
+
+def _batches(values, size=GRAPHQL_BATCH_SIZE):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def graphql(session, query, variables=None) -> Dict[str, Any]:
+    """执行一个 GraphQL 查询并返回 data；GraphQL 接口位于 /api/graphql，不在 /api/v4 下"""
+    response = session.post(f"{session.base_url}/api/graphql", json={"query": query, "variables": variables or {}})
+    response.raise_for_status()
+    body = response.json()
+    if body.get("errors"):
+        raise GitLabGraphQLError("; ".join(error.get("message", str(error)) for error in body["errors"]))
+    return body["data"]
+
+
+def _paged_nodes(session, query, field, variables):
+    """沿 pageInfo.endCursor 取完一个连接的所有节点"""
+    after = None
+    while True:
+        data = graphql(session, query, {**variables, "first": GRAPHQL_BATCH_SIZE, "after": after})
+        connection = data[field]
+        yield from connection["nodes"]
+        if not connection["pageInfo"]["hasNextPage"]:
+            return
+        after = connection["pageInfo"]["endCursor"]
+
+
+def normalize_target(target) -> str:
+    """数字 id 去掉前导零，路径去掉首尾的 /；结果是 fetch_* 返回的字典的键"""
+    target = str(target).strip()
+    return str(int(target)) if target.isdigit() else target.strip('/')
+
+
+def _split_targets(targets: Iterable[Any]):
+    """把目标拆成数字 id 和完整路径两类"""
+    ids, paths = set(), set()
+    for target in map(normalize_target, targets):
+        if target.isdigit():
+            ids.add(int(target))
+        elif target:
+            paths.add(target)
+    return sorted(ids), sorted(paths)
+
+
+def fetch_projects(session, targets: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    批量解析项目，targets 为项目 id 或完整路径
+    每 100 个目标一个查询，返回 {normalize_target(目标): 项目}，不存在或无权访问的目标不在结果中
+    """
+    ids, paths = _split_targets(targets)
+    found = {}
+    for batch in _batches(ids):
+        for node in _paged_nodes(session, PROJECTS_QUERY, "projects", {
+            "ids": [_global_id("Project", gitlab_id) for gitlab_id in batch]
+        }):
+            project = _project_item(node)
+            found[str(project["id"])] = project
+    for batch in _batches(paths):
+        # GitLab 的路径不区分大小写，返回的 fullPath 可能与请求的大小写不同
+        by_path = {
+            node["fullPath"].lower(): _project_item(node)
+            for node in _paged_nodes(session, PROJECTS_QUERY, "projects", {"fullPaths": batch})
+        }
+        found.update((path, by_path[path.lower()]) for path in batch if path.lower() in by_path)
+    return found
+
+
+def fetch_groups(session, targets: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    批量解析组，targets 为组 id 或完整路径，返回 {normalize_target(目标): 组}
+    按 id 使用 groups(ids:) 分页查询；组没有按路径批量过滤的参数，按路径时在一个查询中为每个路径起别名，
+    每个查询最多 GRAPHQL_ALIAS_BATCH_SIZE 个路径
+    """
+    ids, paths = _split_targets(targets)
+    found = {}
+    for batch in _batches(ids):
+        for node in _paged_nodes(session, GROUPS_QUERY, "groups", {
+            "ids": [_global_id("Group", gitlab_id) for gitlab_id in batch]
+        }):
+            group = _group_item(node)
+            found[str(group["id"])] = group
+    for batch in _batches(paths, GRAPHQL_ALIAS_BATCH_SIZE):
+        params = ", ".join(f"$p{i}: ID!" for i in range(len(batch)))
+        fields = " ".join(f"g{i}: group(fullPath: $p{i}) {{ {GROUP_FIELDS} }}" for i in range(len(batch)))
+        data = graphql(session, f"query({params}) {{ {fields} }}", {f"p{i}": path for i, path in enumerate(batch)})
+        for i, path in enumerate(batch):
+            if data.get(f"g{i}"):
+                found[path] = _group_item(data[f"g{i}"])
+    return found
+
+
+def _project_item(node) -> Dict[str, Any]:
+    return {
+        "id": _numeric_id(node["id"]),
+        "name": node["name"],
+        "path_with_namespace": node["fullPath"],
+        "web_url": node["webUrl"],
+    }
+
+
+def _group_item(node) -> Dict[str, Any]:
+    return {
+        "id": _numeric_id(node["id"]),
+        "name": node["name"],
+        "path": node["path"],
+        "full_path": node["fullPath"],
+        "web_url": node["webUrl"],
+    }
+
+
+def missing_targets(targets: Iterable[Any], found: Dict[str, Any]) -> List[str]:
+    return [str(target) for target in targets if normalize_target(target) not in found]
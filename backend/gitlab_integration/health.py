@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import math
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+import httpx
+from django.conf import settings
+from django.utils import timezone
+
+from .async_http import AsyncGitLabSession
+from .models import GitLabConfig, GitLabHealthSample
+
+logger = logging.getLogger(__name__)
+
+# 每个配置保留的探测记录数（默认每分钟一次，约一天）
+DEFAULT_HEALTH_MAX_SAMPLES = 1440
+# 单次探测的超时：(连接超时, 读取超时)
+DEFAULT_HEALTH_TIMEOUT = (5, 10)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+async def probe(config: GitLabConfig) -> GitLabHealthSample:
+    """
+    请求一次 /version 并记录耗时和版本
+    探测不经过 RequestScheduler：熔断期间也要测到实例的真实状态，探测失败也不计入熔断
+    """
+    timeout = _setting('GITLAB_HEALTH_TIMEOUT', DEFAULT_HEALTH_TIMEOUT)
+    session = AsyncGitLabSession(config.url, config.token, pool_size=1, timeout=timeout)
+    sample = GitLabHealthSample(config=config, checked_at=timezone.now(), ok=False)
+    started = time.perf_counter()
+    try:
+        response = await session.get("version")
+        sample.latency_ms = round((time.perf_counter() - started) * 1000)
+        sample.status_code = response.status_code
+        response.raise_for_status()
+        info = response.json()
+        sample.version = str(info.get("version") or "")[:50]
+        sample.revision = str(info.get("revision") or "")[:50]
+        sample.ok = True
+    except (httpx.HTTPError, ValueError) as e:
+        sample.error = str(e)[:255] or e.__class__.__name__
+    finally:
+        await session.aclose()
+    return sample
+
+
+async def probe_all(configs) -> List[GitLabHealthSample]:
+    """并发探测所有配置，总耗时约等于最慢的一个实例"""
+    return list(await asyncio.gather(*(probe(config) for config in configs)))
+
+
+def run_health_checks(config_ids=None) -> List[GitLabHealthSample]:
+    """探测所有启用的配置，保存结果并删除超出保留数量的旧记录"""
+    configs = GitLabConfig.objects.filter(is_active=True).order_by('id')
+    if config_ids:
+        configs = configs.filter(id__in=config_ids)
+    configs = list(configs)
+    if not configs:
+        return []
+
+    samples = asyncio.run(probe_all(configs))
+    GitLabHealthSample.objects.bulk_create(samples)
+    for sample in samples:
+        if not sample.ok:
+            logger.warning("GitLab health check of %s failed: %s", sample.config.url, sample.error)
+        prune_samples(sample.config)
+    return samples
+
+
+def prune_samples(config, keep=None):
+    keep = keep or _setting('GITLAB_HEALTH_MAX_SAMPLES', DEFAULT_HEALTH_MAX_SAMPLES)
+    oldest_kept = config.health_samples.order_by('-checked_at', '-id').values_list('checked_at', flat=True)[
+        keep - 1:keep
+    ].first()
+    if oldest_kept is not None:
+        config.health_samples.filter(checked_at__lt=oldest_kept).delete()
+
+
+def percentile(values, p) -> Optional[int]:
+    """最近秩法计算百分位数，values 须已排序"""
+    if not values:
+        return None
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+def server_info(config, window_seconds=3600) -> Dict[str, Any]:
+    """根据探测记录汇总实例状态：最近一次探测、最近一次成功探测到的版本、窗口内的可用率和延迟分位数"""
+    latest = config.health_samples.order_by('-checked_at', '-id').first()
+    version = config.health_samples.filter(ok=True).order_by('-checked_at', '-id').values(
+        'version', 'revision', 'checked_at'
+    ).first()
+
+    since = timezone.now() - timedelta(seconds=window_seconds)
+    window = list(config.health_samples.filter(checked_at__gte=since).values_list('ok', 'latency_ms'))
+    latencies = sorted(latency for ok, latency in window if ok and latency is not None)
+
+    if latest is None:
+        status = 'unknown'
+    else:
+        status = 'up' if latest.ok else 'down'
+    return {
+        "config_id": config.id,
+        "url": config.url,
+        "status": status,
+        "version": version["version"] if version else None,
+        "revision": version["revision"] if version else None,
+        "version_checked_at": version["checked_at"] if version else None,
+        "checked_at": latest.checked_at if latest else None,
+        "latency_ms": latest.latency_ms if latest else None,
+        "error": latest.error if latest else '',
+        "window_seconds": window_seconds,
+        "samples": len(window),
+        "availability": sum(ok for ok, _ in window) / len(window) if window else None,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+    }
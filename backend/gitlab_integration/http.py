@@ -0,0 +1,142 @@
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+from requests.structures import CaseInsensitiveDict
+
+from .cache import cache_key, response_cache
+from .scheduler import DEFAULT_MAX_RETRIES, RequestScheduler
+
+# 默认超时：(连接超时, 读取超时)，单位秒
+DEFAULT_TIMEOUT = (5, 30)
+DEFAULT_POOL_SIZE = 16
+
+
+class GitLabSession(requests.Session):
+    """
+    指向某个 GitLab 实例的长连接会话
+    复用连接池中的 TCP/TLS 连接，统一设置认证头、gzip 和默认超时；
+    相对路径会拼接到 {base_url}/api/v4/ 之后
+    指定 scheduler 时所有请求经过它限流和熔断，幂等请求在网络错误、5xx 和 429 时自动重试
+    GET 请求带上缓存的 ETag / Last-Modified 发送条件请求，304 时返回缓存的内容
+    """
+
+    def __init__(self, base_url, token, pool_size=None, timeout=None, scheduler=None, max_retries=None):
+        super().__init__()
+        self.base_url = base_url.rstrip('/')
+        self.scheduler = scheduler
+        self.max_retries = max_retries if max_retries is not None else getattr(
+            settings, 'GITLAB_MAX_RETRIES', DEFAULT_MAX_RETRIES
+        )
+        self.default_timeout = timeout or getattr(settings, 'GITLAB_HTTP_TIMEOUT', DEFAULT_TIMEOUT)
+        self.headers.update({
+            'PRIVATE-TOKEN': token,
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+        })
+
+        pool_size = pool_size or getattr(settings, 'GITLAB_HTTP_POOL_SIZE', DEFAULT_POOL_SIZE)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def api_url(self, path):
+        if path.startswith(('http://', 'https://')):
+            return path
+        return f"{self.base_url}/api/v4/{path.lstrip('/')}"
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.default_timeout)
+        url = self.api_url(url)
+        full_url = requests.Request(method, url, params=kwargs.get('params')).prepare().url
+        key = cache_key(self.base_url, self.headers['PRIVATE-TOKEN'], method, full_url, kwargs)
+        if key is None:
+            return self._send(method, url, **kwargs)
+
+        cached = response_cache.get(key)
+        if cached:
+            kwargs['headers'] = {**(kwargs.get('headers') or {}), **cached.validators()}
+        response = self._send(method, url, **kwargs)
+        if response.status_code == 304 and cached:
+            response_cache.record(hit=True)
+            return self._cached_response(response, cached)
+        response_cache.record(hit=False)
+        if response.status_code == 200:
+            response_cache.store(key, response)
+        return response
+
+    def _cached_response(self, not_modified, cached):
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response._content = cached.content
+        response.headers = CaseInsensitiveDict(cached.merged_headers(not_modified.headers))
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = not_modified.url
+        response.request = not_modified.request
+        response.elapsed = not_modified.elapsed
+        not_modified.close()
+        return response
+
+    def _send(self, method, url, **kwargs):
+        if self.scheduler is None:
+            return super().request(method, url, **kwargs)
+
+        scheduler = self.scheduler
+        attempt = 0
+        while True:
+            wait, probe = scheduler.start_request()
+            try:
+                if wait:
+                    scheduler.sleep(wait)
+                response = super().request(method, url, **kwargs)
+            except RequestException as e:
+                delay = scheduler.retry_after_error(method, url, e, attempt, self.max_retries)
+                if delay is None:
+                    raise
+            except BaseException:
+                if probe:
+                    scheduler.release_probe()
+                raise
+            else:
+                delay = scheduler.retry_after_response(
+                    method, url, response.status_code, response.headers, attempt, self.max_retries
+                )
+                if delay is None:
+                    return response
+                response.close()
+
+            attempt += 1
+            if delay:
+                scheduler.sleep(delay)
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(url, token) -> GitLabSession:
+    """获取（必要时创建）该 GitLab 实例与令牌对应的共享会话"""
+    key = (url.rstrip('/'), token)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            # 每个实例与令牌一个调度器，共享该会话的所有线程一起受限流和熔断控制
+            session = _sessions[key] = GitLabSession(url, token, scheduler=RequestScheduler(key[0]))
+        return session
+
+
+def get_scheduler(url, token) -> RequestScheduler:
+    return get_session(url, token).scheduler
+
+
+def close_sessions(url=None):
+    """关闭共享会话并清除响应缓存；指定 url 时只处理该实例"""
+    with _sessions_lock:
+        keys = [key for key in _sessions if url is None or key[0] == url.rstrip('/')]
+        sessions = [_sessions.pop(key) for key in keys]
+    for session in sessions:
+        session.close()
+    response_cache.clear(url)
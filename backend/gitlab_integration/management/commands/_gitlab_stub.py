@@ -0,0 +1,81 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubGitLabHandler(BaseHTTPRequestHandler):
+    """最小化的 GitLab API 模拟，支持 HTTP/1.1 长连接，用于基准测试"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query)
+        delay = self.server.delay
+        if delay:
+            time.sleep(delay)
+
+        if parsed.path == '/api/v4/version':
+            body = {'version': '17.0.0-stub', 'revision': 'stub'}
+            headers = {}
+        elif parsed.path in ('/api/v4/projects', '/api/v4/groups'):
+            body, headers = self.page(parsed.path, params)
+        else:
+            self.send_json(404, {'message': '404 Not Found'})
+            return
+        self.send_json(200, body, headers)
+
+    def page(self, path, params):
+        per_page = int(params.get('per_page', ['20'])[0])
+        page = int(params.get('page', ['1'])[0])
+        total = self.server.total
+        start = (page - 1) * per_page
+        items = []
+        for i in range(start + 1, min(start + per_page, total) + 1):
+            if path.endswith('projects'):
+                items.append({
+                    'id': i, 'name': f'app-{i}', 'path_with_namespace': f'team-{i % 50}/app-{i}',
+                    'web_url': f'http://stub/team-{i % 50}/app-{i}', 'visibility': 'private',
+                })
+            else:
+                items.append({
+                    'id': i, 'name': f'team-{i}', 'path': f'team-{i}', 'full_path': f'team-{i}',
+                    'web_url': f'http://stub/team-{i}', 'visibility': 'private',
+                })
+        headers = {}
+        if start + per_page < total:
+            host = self.headers.get('Host')
+            headers['Link'] = f'<http://{host}{path}?page={page + 1}&per_page={per_page}>; rel="next"'
+            headers['X-Next-Page'] = str(page + 1)
+        return items, headers
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StubGitLabServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 并发压测时大量连接同时到达，默认的 backlog（5）会导致连接被丢弃重试
+    request_queue_size = 1024
+
+
+def start_stub_server(total=1000, delay=0.0):
+    """在后台线程启动模拟服务器，返回 (server, base_url)"""
+    server = StubGitLabServer(('127.0.0.1', 0), StubGitLabHandler)
+    server.total = total
+    server.delay = delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
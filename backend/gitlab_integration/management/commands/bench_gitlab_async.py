@@ -0,0 +1,169 @@
+import asyncio
+import multiprocessing
+import os
+import socket
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import httpx
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+
+from gitlab_integration.models import GitLabConfig
+
+from ._gitlab_stub import start_stub_server
+
+
+def _bench_settings(concurrency):
+    # 压测的是服务器的并发能力，不让调度器的限流成为瓶颈
+    override_settings(
+        GITLAB_RATE_LIMIT=1e6, GITLAB_RATE_BURST=1e6, GITLAB_HTTP_POOL_SIZE=concurrency,
+        GITLAB_ASYNC_POOL_SIZE=concurrency, ALLOWED_HOSTS=['*']
+    ).enable()
+
+
+def _run_stub(queue, delay):
+    server, url = start_stub_server(delay=delay)
+    queue.put(url)
+    threading.Event().wait()
+
+
+def _run_wsgi(queue, threads, concurrency):
+    _bench_settings(concurrency)
+    server = make_server(
+        '127.0.0.1', 0, get_wsgi_application(),
+        server_class=lambda *args, **kwargs: PooledWSGIServer(*args, threads=threads, **kwargs),
+        handler_class=QuietHandler
+    )
+    queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def _run_asgi(queue, concurrency):
+    import uvicorn
+
+    _bench_settings(concurrency)
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    queue.put(sock.getsockname()[1])
+    uvicorn.Server(uvicorn.Config(get_asgi_application(), log_level='warning', lifespan='off')).run(sockets=[sock])
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class PooledWSGIServer(ThreadingMixIn, WSGIServer):
+    """固定线程数的 WSGI 服务器，模拟 gunicorn 等同步 worker 的线程上限"""
+
+    request_queue_size = 1024
+
+    def __init__(self, *args, threads=8, **kwargs):
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        super().__init__(*args, **kwargs)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+
+class Command(BaseCommand):
+    help = "负载测试：本地模拟的慢速 GitLab 下，对比同步 WSGI 与异步 ASGI 代理接口的吞吐量"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delay', type=float, default=0.5, help="模拟 GitLab 每个请求的响应时间（秒）")
+        parser.add_argument('--concurrency', type=int, default=200, help="并发客户端数")
+        parser.add_argument('--requests', type=int, default=1000, help="每个服务器的请求总数")
+        parser.add_argument('--threads', type=int, default=8, help="WSGI 服务器的线程数")
+
+    def handle(self, *args, **options):
+        try:
+            import uvicorn  # noqa: F401
+        except ImportError:
+            raise CommandError("uvicorn is required to run the ASGI server")
+
+        concurrency = options['concurrency']
+        user = User.objects.create_user(username=f'bench-{os.getpid()}-{time.time_ns()}')
+        client = Client()
+        client.force_login(user)
+        cookies = {name: morsel.value for name, morsel in client.cookies.items()}
+        # 模拟服务器、被测服务器和压测客户端分别运行在独立进程中，避免争抢同一个 GIL
+        processes = []
+        config = None
+        try:
+            stub_url = self.start_process(processes, _run_stub, options['delay'])
+            config = GitLabConfig.objects.create(url=stub_url, token='stub-token')
+            path = f"/api/gitlab/configs/{config.id}/projects?limit=20"
+
+            port = self.start_process(processes, _run_wsgi, options['threads'], concurrency)
+            wsgi_result = self.load(f"http://127.0.0.1:{port}{path}", cookies, options)
+
+            port = self.start_process(processes, _run_asgi, concurrency)
+            asgi_result = self.load(f"http://127.0.0.1:{port}{path}", cookies, options)
+        finally:
+            for process in processes:
+                process.terminate()
+                process.join()
+            if config:
+                config.delete()
+            user.delete()
+
+        self.stdout.write(
+            f"GitLab delay {options['delay'] * 1000:.0f} ms, {concurrency} concurrent clients, "
+            f"{options['requests']} requests per server"
+        )
+        for name, (throughput, latencies, errors) in (
+            (f"sync WSGI ({options['threads']} threads)", wsgi_result),
+            ("async ASGI (1 process)", asgi_result),
+        ):
+            self.stdout.write(
+                f"{name:26} {throughput:7.1f} req/s   p50 {statistics.median(latencies):7.0f} ms   "
+                f"p95 {statistics.quantiles(latencies, n=20)[-1]:7.0f} ms   errors {errors}"
+            )
+        self.stdout.write(f"throughput ratio: {asgi_result[0] / wsgi_result[0]:.1f}x")
+
+    def start_process(self, processes, target, *args):
+        """启动子进程并等待它返回监听地址"""
+        connections.close_all()
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=target, args=(queue, *args), daemon=True)
+        process.start()
+        processes.append(process)
+        return queue.get(timeout=30)
+
+    def load(self, url, cookies, options):
+        return asyncio.run(self._load(url, cookies, options['concurrency'], options['requests']))
+
+    async def _load(self, url, cookies, concurrency, total):
+        remaining = total
+        latencies = []
+        errors = 0
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+        async with httpx.AsyncClient(cookies=cookies, limits=limits, timeout=120) as client:
+            async def worker():
+                nonlocal remaining, errors
+                while remaining > 0:
+                    remaining -= 1
+                    start = time.perf_counter()
+                    try:
+                        response = await client.get(url)
+                        ok = response.status_code == 200
+                    except httpx.HTTPError:
+                        ok = False
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    errors += not ok
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+        return total / elapsed, latencies, errors
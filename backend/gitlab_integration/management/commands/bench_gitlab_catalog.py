@@ -0,0 +1,79 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from gitlab_integration.catalog import catalog_page, filter_catalog, local_project_item
+from gitlab_integration.models import GitLabConfig, GitLabProject
+
+WORDS = ['api', 'web', 'core', 'auth', 'billing', 'search', 'infra', 'mobile', 'data', 'ops', 'ui', 'payments']
+
+
+class Command(BaseCommand):
+    help = "基准测试：生成合成的项目目录，报告本地搜索、命名空间和可见性过滤的查询延迟（不会保留任何数据）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=100_000, help="项目数量")
+        parser.add_argument('--samples', type=int, default=50, help="每种查询的采样次数")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        count = options['projects']
+
+        with transaction.atomic():
+            config = GitLabConfig.objects.create(url='https://gitlab.bench.invalid', token='bench')
+            now = timezone.now()
+
+            start = time.perf_counter()
+            batch = []
+            for i in range(1, count + 1):
+                group = f"{rng.choice(WORDS)}-{i % 50}"
+                path = f"{group}/{rng.choice(WORDS)}-team-{i % 400}/{rng.choice(WORDS)}-svc-{i}"
+                batch.append(GitLabProject(
+                    config=config, gitlab_id=i, name=path.rsplit('/', 1)[-1], path_with_namespace=path,
+                    web_url=f"https://gitlab.bench.invalid/{path}",
+                    visibility=rng.choice(['private', 'private', 'internal', 'public']), synced_at=now
+                ))
+                if len(batch) >= 5000:
+                    GitLabProject.objects.bulk_create(batch)
+                    batch = []
+            GitLabProject.objects.bulk_create(batch)
+            load_seconds = time.perf_counter() - start
+
+            queries = {
+                'first page (no filter)': {},
+                'search common "api"': {'search': 'API'},
+                'search rare "svc-4242"': {'search': 'svc-4242'},
+                'search no match': {'search': 'no-such-project'},
+                'namespace "web-7"': {'namespace': 'web-7'},
+                'visibility public': {'visibility': 'public'},
+                'search + visibility': {'search': 'billing-team-1', 'visibility': 'internal'},
+            }
+            results = {name: self.measure(config, filters, options['samples']) for name, filters in queries.items()}
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"projects: {count} (generated in {load_seconds:.1f} s)")
+        for name, (samples, found) in results.items():
+            self.stdout.write(
+                f"{name:26} p50 {statistics.median(samples):7.2f} ms   "
+                f"p95 {statistics.quantiles(samples, n=20)[-1]:7.2f} ms   "
+                f"max {max(samples):7.2f} ms   ({found} on first page)"
+            )
+
+    def measure(self, config, filters, samples):
+        def page():
+            projects = filter_catalog(config.projects.all(), 'path_with_namespace', **filters)
+            return catalog_page(projects, ('path_with_namespace', 'id'), local_project_item, 100)
+
+        found = len(page()['items'])  # 预热
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            page()
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings, found
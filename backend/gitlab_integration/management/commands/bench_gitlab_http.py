@@ -0,0 +1,65 @@
+import statistics
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+
+from gitlab_integration.http import GitLabSession
+
+from ._gitlab_stub import start_stub_server
+
+
+class Command(BaseCommand):
+    help = "基准测试：对比每次新建连接与共享连接池会话调用 GitLab API 的单次请求延迟"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="每种方式的请求次数")
+        parser.add_argument('--url', help="GitLab 地址，不指定时使用本地模拟服务器")
+        parser.add_argument('--token', default='stub-token')
+
+    def handle(self, *args, **options):
+        server = None
+        url = options['url']
+        if not url:
+            server, url = start_stub_server()
+        url = url.rstrip('/')
+        token = options['token']
+        count = options['requests']
+
+        try:
+            def unpooled():
+                requests.get(f"{url}/api/v4/version", headers={'PRIVATE-TOKEN': token}, timeout=10).json()
+
+            session = GitLabSession(url, token)
+
+            def pooled():
+                session.get("version").json()
+
+            results = {
+                'new connection per request': self.measure(unpooled, count),
+                'pooled keep-alive session': self.measure(pooled, count),
+            }
+            session.close()
+        finally:
+            if server:
+                server.shutdown()
+
+        self.stdout.write(f"GitLab: {url} ({count} requests each)")
+        for name, samples in results.items():
+            self.stdout.write(
+                f"{name:28} mean {statistics.mean(samples):7.3f} ms   "
+                f"p50 {statistics.median(samples):7.3f} ms   "
+                f"p95 {statistics.quantiles(samples, n=20)[-1]:7.3f} ms"
+            )
+        before = statistics.mean(results['new connection per request'])
+        after = statistics.mean(results['pooled keep-alive session'])
+        self.stdout.write(f"latency drop per request: {before - after:.3f} ms ({(1 - after / before) * 100:.1f}%)")
+
+    def measure(self, func, count):
+        func()  # 预热
+        samples = []
+        for _ in range(count):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+        return samples
@@ -0,0 +1,42 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from gitlab_integration.health import run_health_checks
+
+
+class Command(BaseCommand):
+    help = "并发探测所有启用的 GitLab 配置，记录延迟和版本，供 server-info 接口使用"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--config', type=int, action='append', help="只探测指定 id 的 GitLab 配置，可重复")
+        parser.add_argument(
+            '--interval', type=float, nargs='?', const=getattr(settings, 'GITLAB_HEALTH_INTERVAL', 60),
+            help="每隔多少秒探测一次（不带值时使用 GITLAB_HEALTH_INTERVAL），持续运行直到收到 SIGTERM"
+        )
+
+    def handle(self, *args, **options):
+        stopping = False
+
+        def stop(*args):
+            nonlocal stopping
+            stopping = True
+
+        if options['interval']:
+            signal.signal(signal.SIGTERM, stop)
+            signal.signal(signal.SIGINT, stop)
+
+        while True:
+            for sample in run_health_checks(options['config']):
+                state = f"ok {sample.latency_ms}ms {sample.version}" if sample.ok else f"down: {sample.error}"
+                self.stdout.write(f"{sample.config.url}: {state}")
+            if not options['interval']:
+                return
+
+            deadline = time.monotonic() + options['interval']
+            while not stopping and time.monotonic() < deadline:
+                time.sleep(min(1, options['interval']))
+            if stopping:
+                return
@@ -0,0 +1,65 @@
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from requests.exceptions import RequestException
+
+from gitlab_integration.catalog import sync_catalog
+from gitlab_integration.models import GitLabConfig
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "把 GitLab 项目和组同步到本地目录；首次全量同步，之后增量同步"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--config', type=int, action='append', help="只同步指定 id 的 GitLab 配置，可重复")
+        parser.add_argument('--full', action='store_true', help="强制全量同步，并删除 GitLab 上已不存在的项目")
+        parser.add_argument('--interval', type=float, help="每隔多少秒同步一次，持续运行直到收到 SIGTERM")
+
+    def handle(self, *args, **options):
+        stopping = False
+
+        def stop(*args):
+            nonlocal stopping
+            stopping = True
+
+        if options['interval']:
+            signal.signal(signal.SIGTERM, stop)
+            signal.signal(signal.SIGINT, stop)
+
+        while True:
+            failures = self.sync_all(options['config'], options['full'] or None)
+            if not options['interval']:
+                if failures:
+                    raise CommandError(f"{failures} GitLab instance(s) failed to sync")
+                return
+
+            deadline = time.monotonic() + options['interval']
+            while not stopping and time.monotonic() < deadline:
+                time.sleep(min(1, options['interval']))
+            if stopping:
+                return
+
+    def sync_all(self, config_ids, full):
+        configs = GitLabConfig.objects.filter(is_active=True).order_by('id')
+        if config_ids:
+            configs = configs.filter(id__in=config_ids)
+
+        failures = 0
+        for config in configs:
+            try:
+                results = sync_catalog(config, full=full)
+            except RequestException as e:
+                # 单个实例失败不影响其他实例
+                logger.warning("Failed to sync GitLab catalog from %s: %s", config.url, e)
+                failures += 1
+                continue
+            for name, result in results.items():
+                self.stdout.write(
+                    f"{config.url}: {result.synced} {name} synced, {result.deleted} removed"
+                    f"{' (full)' if result.full else ''}"
+                )
+        return failures
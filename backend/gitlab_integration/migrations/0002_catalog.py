@@ -0,0 +1,67 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gitlab_integration', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gitlabconfig',
+            name='groups_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='gitlabconfig',
+            name='projects_full_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='gitlabconfig',
+            name='projects_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='GitLabGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gitlab_id', models.BigIntegerField()),
+                ('parent_id', models.BigIntegerField(blank=True, null=True)),
+                ('name', models.CharField(max_length=255)),
+                ('path', models.CharField(max_length=255)),
+                ('full_path', models.CharField(max_length=1024)),
+                ('web_url', models.URLField(max_length=1024)),
+                ('visibility', models.CharField(blank=True, max_length=20)),
+                ('synced_at', models.DateTimeField()),
+                ('config', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='groups', to='gitlab_integration.gitlabconfig')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['config', 'full_path', 'id'], name='gitlab_group_path_idx')],
+                'constraints': [models.UniqueConstraint(fields=('config', 'gitlab_id'), name='gitlab_group_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GitLabProject',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gitlab_id', models.BigIntegerField()),
+                ('name', models.CharField(max_length=255)),
+                ('path_with_namespace', models.CharField(max_length=1024)),
+                ('web_url', models.URLField(max_length=1024)),
+                ('visibility', models.CharField(blank=True, max_length=20)),
+                ('archived', models.BooleanField(default=False)),
+                ('last_activity_at', models.DateTimeField(blank=True, null=True)),
+                ('synced_at', models.DateTimeField()),
+                ('config', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='projects', to='gitlab_integration.gitlabconfig')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['config', 'path_with_namespace', 'id'], name='gitlab_project_path_idx')],
+                'constraints': [models.UniqueConstraint(fields=('config', 'gitlab_id'), name='gitlab_project_unique')],
+            },
+        ),
+    ]
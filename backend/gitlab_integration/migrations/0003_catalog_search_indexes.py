@@ -0,0 +1,41 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:07
+
+from django.db import migrations, models
+
+# PostgreSQL 上用 pg_trgm 的 GIN 索引加速 icontains（UPPER(...) LIKE UPPER(...)）子串搜索
+TRIGRAM_INDEXES = [
+    ('gitlab_project_path_trgm_idx', 'gitlab_integration_gitlabproject', 'path_with_namespace'),
+    ('gitlab_group_path_trgm_idx', 'gitlab_integration_gitlabgroup', 'full_path'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gitlab_integration', '0002_catalog'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gitlabproject',
+            index=models.Index(fields=['config', 'visibility', 'path_with_namespace', 'id'], name='gitlab_project_vis_path_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
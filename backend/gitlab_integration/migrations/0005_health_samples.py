@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gitlab_integration', '0004_system_hooks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GitLabHealthSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checked_at', models.DateTimeField()),
+                ('ok', models.BooleanField()),
+                ('latency_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('version', models.CharField(blank=True, max_length=50)),
+                ('revision', models.CharField(blank=True, max_length=50)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('config', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='health_samples', to='gitlab_integration.gitlabconfig')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['config', '-checked_at'], name='gitlab_health_config_idx')],
+            },
+        ),
+    ]
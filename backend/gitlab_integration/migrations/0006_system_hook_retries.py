@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:09
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gitlab_integration', '0005_health_samples'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='systemhookevent',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='systemhookevent',
+            name='max_attempts',
+            field=models.IntegerField(default=5),
+        ),
+        migrations.AddField(
+            model_name='systemhookevent',
+            name='run_after',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,11 +1,123 @@
 from django.db import models
+from django.utils import timezone
 
 class GitLabConfig(models.Model):
     url = models.URLField()
     token = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
+    # GitLab 系统钩子的 Secret token，用于校验 /api/gitlab/system-hooks/ 收到的事件；为空时不接收事件
+    system_hook_token = models.CharField(max_length=255, blank=True)
+    # 本地项目/组目录的同步进度，增量同步从上次同步开始的时间继续
+    projects_synced_at = models.DateTimeField(null=True, blank=True)
+    projects_full_synced_at = models.DateTimeField(null=True, blank=True)
+    groups_synced_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
-        return self.url
\ No newline at end of file
+        return self.url
+
+
+class GitLabProject(models.Model):
+    """从 GitLab 同步到本地的项目目录"""
+    config = models.ForeignKey(GitLabConfig, on_delete=models.CASCADE, related_name='projects')
+    gitlab_id = models.BigIntegerField()
+    name = models.CharField(max_length=255)
+    path_with_namespace = models.CharField(max_length=1024)
+    web_url = models.URLField(max_length=1024)
+    visibility = models.CharField(max_length=20, blank=True)
+    archived = models.BooleanField(default=False)
+    last_activity_at = models.DateTimeField(null=True, blank=True)
+    synced_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['config', 'gitlab_id'], name='gitlab_project_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['config', 'path_with_namespace', 'id'], name='gitlab_project_path_idx'),
+            models.Index(
+                fields=['config', 'visibility', 'path_with_namespace', 'id'], name='gitlab_project_vis_path_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return self.path_with_namespace
+
+
+class GitLabGroup(models.Model):
+    """从 GitLab 同步到本地的组目录"""
+    config = models.ForeignKey(GitLabConfig, on_delete=models.CASCADE, related_name='groups')
+    gitlab_id = models.BigIntegerField()
+    parent_id = models.BigIntegerField(null=True, blank=True)
+    name = models.CharField(max_length=255)
+    path = models.CharField(max_length=255)
+    full_path = models.CharField(max_length=1024)
+    web_url = models.URLField(max_length=1024)
+    visibility = models.CharField(max_length=20, blank=True)
+    synced_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['config', 'gitlab_id'], name='gitlab_group_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['config', 'full_path', 'id'], name='gitlab_group_path_idx'),
+        ]
+
+    def __str__(self):
+        return self.full_path
+
+
+class SystemHookEvent(models.Model):
+    """GitLab 系统钩子推送的事件，接收时只入库，由部署 worker 异步处理"""
+    config = models.ForeignKey(GitLabConfig, on_delete=models.CASCADE, related_name='system_hook_events')
+    event_name = models.CharField(max_length=50)
+    payload = models.JSONField()
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('pending', 'Pending'),
+            ('processing', 'Processing'),
+            ('done', 'Done'),
+            ('failed', 'Failed')
+        ],
+        default='pending'
+    )
+    error_message = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)  # 失败重试的退避：此时间之前不会被领取
+    locked_by = models.CharField(max_length=100, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='systemhook_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_name} from {self.config} ({self.status})"
+
+
+class GitLabHealthSample(models.Model):
+    """后台健康检查的一次探测结果，每个配置只保留最近的若干条"""
+    config = models.ForeignKey(GitLabConfig, on_delete=models.CASCADE, related_name='health_samples')
+    checked_at = models.DateTimeField()
+    ok = models.BooleanField()
+    latency_ms = models.PositiveIntegerField(null=True, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    version = models.CharField(max_length=50, blank=True)
+    revision = models.CharField(max_length=50, blank=True)
+    error = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['config', '-checked_at'], name='gitlab_health_config_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.config} at {self.checked_at} ({'ok' if self.ok else 'down'})"
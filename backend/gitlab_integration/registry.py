@@ -0,0 +1,66 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog import invalidate_group_trees
+from .client import GitLabClient
+from .http import close_sessions
+from .models import GitLabConfig
+
+# 缓存的客户端最长有效期（秒）；其他进程修改配置时收不到本进程的信号，过期后重新读取
+DEFAULT_CLIENT_TTL = 300
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(config_id=None) -> GitLabClient:
+    """
+    按配置 id 获取缓存的 GitLabClient，config_id 为空时使用第一个启用的配置
+    配置不存在或已停用时抛出 ValueError
+    """
+    if config_id is None:
+        config_id = GitLabConfig.objects.filter(is_active=True).values_list('id', flat=True).first()
+        if config_id is None:
+            raise ValueError("No active GitLab configuration found")
+
+    now = time.monotonic()
+    with _clients_lock:
+        cached = _clients.get(config_id)
+    if cached and cached[1] > now:
+        return cached[0]
+
+    config = GitLabConfig.objects.filter(id=config_id, is_active=True).first()
+    if not config:
+        raise ValueError(f"GitLab configuration {config_id} not found or inactive")
+
+    client = GitLabClient(config)
+    ttl = getattr(settings, 'GITLAB_CLIENT_TTL', DEFAULT_CLIENT_TTL)
+    with _clients_lock:
+        _clients[config_id] = (client, now + ttl)
+    return client
+
+
+def invalidate_client(config_id):
+    with _clients_lock:
+        cached = _clients.pop(config_id, None)
+    if cached:
+        # URL 或令牌可能已经改变，关闭旧的连接池，下次使用时按新配置重建
+        close_sessions(cached[0].base_url)
+
+
+def clear_clients():
+    with _clients_lock:
+        config_ids = list(_clients)
+    for config_id in config_ids:
+        invalidate_client(config_id)
+
+
+@receiver(post_save, sender=GitLabConfig)
+@receiver(post_delete, sender=GitLabConfig)
+def _invalidate_on_change(sender, instance, **kwargs):
+    invalidate_client(instance.pk)
+    invalidate_group_trees(instance.pk)
@@ -0,0 +1,284 @@
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from django.conf import settings
+from requests.exceptions import RequestException
+
+logger = logging.getLogger(__name__)
+
+# 默认每秒请求数与突发容量；实际速率还会根据 GitLab 返回的 RateLimit-* 头进一步降低
+DEFAULT_RATE = 10.0
+DEFAULT_BURST = 20
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_BASE_SECONDS = 0.5
+# 单次请求最多愿意等待的秒数，超过时直接抛出 GitLabUnavailable，由调用方（如部署队列）稍后重试
+DEFAULT_MAX_WAIT_SECONDS = 30
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_SECONDS = 30
+
+# 可以安全重试的方法；429 表示请求未被处理，任何方法都可以重试
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+
+class GitLabUnavailable(RequestException):
+    """GitLab 暂时不可用（被限流或熔断），retry_after 秒后再试"""
+
+    def __init__(self, message, retry_after):
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+class RateLimitedError(GitLabUnavailable):
+    pass
+
+
+class CircuitOpenError(GitLabUnavailable):
+    pass
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def parse_retry_after(value, now=None):
+    """Retry-After 可以是秒数或 HTTP 日期"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - (now or time.time()), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestScheduler:
+    """
+    单个 GitLab 实例的请求调度器
+    - 令牌桶控制请求速率，并根据 RateLimit-Remaining / RateLimit-Reset 放慢，收到 429 时按 Retry-After 暂停
+    - 连续失败达到阈值后熔断，冷却后放行一个探测请求（half-open），成功则恢复
+    线程安全，同一实例的所有会话和线程共享
+    """
+
+    def __init__(self, name, rate=None, burst=None, failure_threshold=None, reset_seconds=None, max_wait=None,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.name = name
+        self.rate = rate or _setting('GITLAB_RATE_LIMIT', DEFAULT_RATE)
+        self.burst = burst or _setting('GITLAB_RATE_BURST', DEFAULT_BURST)
+        self.failure_threshold = failure_threshold or _setting('GITLAB_CIRCUIT_FAILURES', DEFAULT_FAILURE_THRESHOLD)
+        self.reset_seconds = reset_seconds or _setting('GITLAB_CIRCUIT_RESET_SECONDS', DEFAULT_RESET_SECONDS)
+        self.max_wait = max_wait or _setting('GITLAB_RETRY_MAX_WAIT', DEFAULT_MAX_WAIT_SECONDS)
+        self.clock = clock
+        self.sleep = sleep
+
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._refilled_at = clock()
+        # 根据 RateLimit-* 头计算出的临时速率，在 reset 时间之前有效
+        self._header_rate = None
+        self._header_rate_until = 0.0
+        self._paused_until = 0.0
+        self._rate_limit_remaining = None
+
+        self._state = 'closed'
+        self._failures = 0
+        self._opened_until = 0.0
+        self._probing = False
+
+    # 熔断器
+
+    def _check_circuit(self, now):
+        """熔断打开时抛出 CircuitOpenError；冷却结束后转为 half-open，已有探测请求在途时同样拒绝"""
+        if self._state == 'open':
+            if now < self._opened_until:
+                raise CircuitOpenError(
+                    f"GitLab {self.name} circuit is open", retry_after=self._opened_until - now
+                )
+            self._state = 'half_open'
+            self._probing = False
+        if self._state == 'half_open' and self._probing:
+            raise CircuitOpenError(f"GitLab {self.name} circuit is half-open", retry_after=1.0)
+
+    def before_request(self):
+        """熔断打开时抛出 CircuitOpenError；冷却结束后只放行一个探测请求"""
+        with self._lock:
+            self._check_circuit(self.clock())
+            if self._state == 'half_open':
+                self._probing = True
+
+    def start_request(self):
+        """
+        每次发送请求前调用：检查熔断并取一个令牌，返回 (需要等待的秒数, 是否为探测请求)
+        先取令牌再认领探测，限流时抛出的 RateLimitedError 不会占住探测名额；
+        探测请求必须以 record_success、record_failure 或 release_probe 结束，否则熔断会一直停在 half-open
+        """
+        with self._lock:
+            now = self.clock()
+            self._check_circuit(now)
+            wait = self._reserve(now)
+            probe = self._state == 'half_open'
+            if probe:
+                self._probing = True
+            return wait, probe
+
+    def release_probe(self):
+        """探测请求没有得到结果（被取消或抛出其他异常）时释放名额，由下一个请求重新探测"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != 'closed':
+                logger.info("GitLab %s circuit closed", self.name)
+            self._state = 'closed'
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == 'half_open' or self._failures >= self.failure_threshold:
+                if self._state != 'open':
+                    logger.warning(
+                        "GitLab %s circuit opened after %s consecutive failures", self.name, self._failures
+                    )
+                self._state = 'open'
+                self._opened_until = self.clock() + self.reset_seconds
+
+    # 限流
+
+    def _current_rate(self, now):
+        if self._header_rate is not None and now < self._header_rate_until:
+            return min(self.rate, self._header_rate)
+        return self.rate
+
+    def reserve(self):
+        """取一个令牌，返回需要等待的秒数；等待时间超过 max_wait 时抛出 RateLimitedError"""
+        with self._lock:
+            return self._reserve(self.clock())
+
+    def _reserve(self, now):
+        rate = self._current_rate(now)
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * rate)
+        self._refilled_at = now
+
+        wait = max(self._paused_until - now, 0.0)
+        if self._tokens < 1:
+            wait = max(wait, (1 - self._tokens) / rate)
+        if wait > self.max_wait:
+            raise RateLimitedError(f"GitLab {self.name} is rate limited", retry_after=wait)
+        self._tokens -= 1
+        return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            self.sleep(wait)
+
+    def update_from_headers(self, headers):
+        """读取 GitLab 的 RateLimit-Remaining / RateLimit-Reset / Retry-After 头"""
+        remaining = headers.get('RateLimit-Remaining')
+        reset = headers.get('RateLimit-Reset')
+        retry_after = parse_retry_after(headers.get('Retry-After'))
+
+        with self._lock:
+            now = self.clock()
+            if retry_after is not None:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            if remaining is None or reset is None:
+                return
+            try:
+                remaining = int(remaining)
+                # RateLimit-Reset 是 Unix 时间戳
+                until_reset = max(float(reset) - time.time(), 1.0)
+            except ValueError:
+                return
+
+            self._rate_limit_remaining = remaining
+            if remaining <= 0:
+                self._paused_until = max(self._paused_until, now + until_reset)
+            # 把剩余配额平摊到重置之前
+            self._header_rate = max(remaining, 1) / until_reset
+            self._header_rate_until = now + until_reset
+
+    def retry_delay(self, attempt, retry_after=None):
+        """带随机抖动的指数退避；有 Retry-After 时以它为准"""
+        if retry_after is not None:
+            return retry_after
+        base = _setting('GITLAB_RETRY_BASE_SECONDS', DEFAULT_RETRY_BASE_SECONDS)
+        return random.uniform(0, base * 2 ** attempt)
+
+    # 重试策略，同步与异步会话共用
+
+    def retry_after_error(self, method, url, error, attempt, max_retries):
+        """
+        请求因网络错误失败：计入熔断，返回重试前等待的秒数
+        非幂等方法不重试，重试次数用尽时返回 None，由调用方抛出原异常
+        """
+        self.record_failure()
+        retries = max_retries if method.upper() in IDEMPOTENT_METHODS else 0
+        if attempt >= retries:
+            return None
+        delay = self.retry_delay(attempt)
+        logger.warning("GitLab %s %s failed (%s), retrying in %.1fs", method, url, error, delay)
+        return delay
+
+    def retry_after_response(self, method, url, status_code, headers, attempt, max_retries):
+        """
+        根据响应更新限流状态和熔断，返回重试前等待的秒数；响应应交给调用方时返回 None
+        429 表示请求未被处理，任何方法都重试，且不计入熔断；有 Retry-After 时调度器已暂停，下一次取令牌时等待
+        5xx 计入熔断，只重试幂等方法
+        """
+        self.update_from_headers(headers)
+        if status_code == 429:
+            self.record_success()
+            if attempt >= max_retries:
+                return None
+            retry_after = parse_retry_after(headers.get('Retry-After'))
+            logger.warning("GitLab %s %s rate limited, retrying", method, url)
+            return 0 if retry_after is not None else self.retry_delay(attempt)
+        if status_code >= 500:
+            self.record_failure()
+            retries = max_retries if method.upper() in IDEMPOTENT_METHODS else 0
+            if attempt >= retries:
+                return None
+            delay = self.retry_delay(attempt)
+            logger.warning("GitLab %s %s returned %s, retrying in %.1fs", method, url, status_code, delay)
+            return delay
+        self.record_success()
+        return None
+
+    def state(self):
+        """调度器当前状态，供 API 展示以及部署任务判断是否需要排队等待"""
+        with self._lock:
+            now = self.clock()
+            state = self._state
+            retry_after = 0.0
+            if state == 'open':
+                retry_after = max(self._opened_until - now, 0.0)
+                if retry_after == 0:
+                    state = 'half_open'
+            paused = max(self._paused_until - now, 0.0)
+            return {
+                "name": self.name,
+                "circuit": state,
+                "consecutive_failures": self._failures,
+                "retry_after": max(retry_after, paused),
+                "rate": self._current_rate(now),
+                "tokens": min(self.burst, self._tokens + (now - self._refilled_at) * self._current_rate(now)),
+                "rate_limit_remaining": self._rate_limit_remaining,
+            }
+
+    def raise_if_unavailable(self):
+        """熔断打开或被限流暂停时抛出 GitLabUnavailable，不消耗令牌"""
+        state = self.state()
+        if state["circuit"] == 'open':
+            raise CircuitOpenError(f"GitLab {self.name} circuit is open", retry_after=state["retry_after"])
+        if state["retry_after"] > self.max_wait:
+            raise RateLimitedError(f"GitLab {self.name} is rate limited", retry_after=state["retry_after"])
@@ -6,18 +6,27 @@ class GitLabConfigSchema(Schema):
     id: int
     url: str
     is_active: bool
+    # 不返回系统钩子令牌本身，只返回是否已设置
+    system_hook_enabled: bool
     created_at: datetime
     updated_at: datetime
 
+    @staticmethod
+    def resolve_system_hook_enabled(obj):
+        return bool(obj.system_hook_token)
+
 class GitLabConfigCreateSchema(Schema):
     url: str
     token: str
     is_active: bool = True
+    system_hook_token: str = ''
 
 class GitLabConfigUpdateSchema(Schema):
     url: str
     token: Optional[str] = None
     is_active: bool = True
+    # 为空时保持不变
+    system_hook_token: Optional[str] = None
 
 class GitLabProjectSchema(Schema):
     id: str
@@ -32,6 +41,23 @@ class GitLabGroupSchema(Schema):
     full_path: str
     web_url: str
 
+class GitLabProjectPageSchema(Schema):
+    items: List[GitLabProjectSchema]
+    next_cursor: Optional[str] = None
+
+class GitLabGroupPageSchema(Schema):
+    items: List[GitLabGroupSchema]
+    next_cursor: Optional[str] = None
+
+class GitLabSchedulerStateSchema(Schema):
+    name: str
+    circuit: str
+    consecutive_failures: int
+    retry_after: float
+    rate: float
+    tokens: float
+    rate_limit_remaining: Optional[int] = None
+
 # 添加成功响应模式
 class SuccessResponseSchema(Schema):
     success: bool
@@ -40,3 +66,27 @@ class SuccessResponseSchema(Schema):
 class TestConnectionResponseSchema(Schema):
     success: bool
     message: str
+
+class GitLabServerInfoSchema(Schema):
+    config_id: int
+    url: str
+    status: str  # up / down / unknown（尚未探测）
+    version: Optional[str] = None
+    revision: Optional[str] = None
+    version_checked_at: Optional[datetime] = None
+    checked_at: Optional[datetime] = None
+    latency_ms: Optional[int] = None
+    error: str = ''
+    window_seconds: int
+    samples: int
+    availability: Optional[float] = None
+    p50_ms: Optional[int] = None
+    p95_ms: Optional[int] = None
+
+class SystemHookAcceptedSchema(Schema):
+    # 不需要处理的事件不入库，id 为空
+    id: Optional[int] = None
+    queued: bool
+
+class ErrorResponseSchema(Schema):
+    message: str
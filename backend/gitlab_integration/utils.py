@@ -1,104 +1,138 @@
-import requests
+import base64
+from urllib.parse import parse_qsl, urlparse
+
+import httpx
 from requests.exceptions import RequestException
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+from .async_http import get_async_session
+from .http import get_session
 
 def test_gitlab_connection(url: str, token: str) -> Dict[str, Any]:
     """
     测试与 GitLab 实例的连接
     """
     try:
-        # 确保 URL 以 '/' 结尾
-        if not url.endswith('/'):
-            url = url + '/'
-        
         # 尝试获取 GitLab 版本信息
-        response = requests.get(
-            f"{url}api/v4/version",
-            headers={"PRIVATE-TOKEN": token},
-            timeout=10
-        )
+        response = get_session(url, token).get("version", timeout=10)
         
         response.raise_for_status()  # 如果响应状态码不是 2xx，会引发异常
         
-        version_info = response.json()
-        return {
-            "success": True,
-            "message": f"Successfully connected to GitLab {version_info.get('version', 'unknown version')}",
-            "version": version_info
-        }
+        return _connection_result(response.json())
     
     except RequestException as e:
-        return {
-            "success": False,
-            "message": f"Failed to connect to GitLab: {str(e)}",
-            "error": str(e)
-        }
+        return _connection_error(e)
 
-def get_gitlab_projects(url: str, token: str) -> List[Dict[str, Any]]:
+async def async_test_gitlab_connection(url: str, token: str) -> Dict[str, Any]:
     """
-    获取 GitLab 项目列表
+    test_gitlab_connection 的异步版本
     """
     try:
-        # 确保 URL 以 '/' 结尾
-        if not url.endswith('/'):
-            url = url + '/'
-
-        # 获取项目列表
-        response = requests.get(
-            f"{url}api/v4/projects",
-            headers={"PRIVATE-TOKEN": token},
-            params={"per_page": 100},  # 获取更多项目
-            timeout=30
-        )
-
+        response = await get_async_session(url, token).get("version", timeout=10)
         response.raise_for_status()
+        return _connection_result(response.json())
+    except (RequestException, httpx.HTTPError) as e:
+        return _connection_error(e)
 
-        projects = response.json()
-        return [
-            {
-                "id": str(project["id"]),
-                "name": project["name"],
-                "path_with_namespace": project["path_with_namespace"],
-                "web_url": project["web_url"]
-            }
-            for project in projects
-        ]
+def _connection_result(version_info: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "success": True,
+        "message": f"Successfully connected to GitLab {version_info.get('version', 'unknown version')}",
+        "version": version_info
+    }
 
-    except RequestException as e:
-        print(f"Error fetching GitLab projects: {e}")
-        return []
+def _connection_error(error: Exception) -> Dict[str, Any]:
+    return {
+        "success": False,
+        "message": f"Failed to connect to GitLab: {str(error)}",
+        "error": str(error)
+    }
+
+def project_item(project: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": str(project["id"]),
+        "name": project["name"],
+        "path_with_namespace": project["path_with_namespace"],
+        "web_url": project["web_url"]
+    }
+
+def group_item(group: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": str(group["id"]),
+        "name": group["name"],
+        "path": group["path"],
+        "full_path": group["full_path"],
+        "web_url": group["web_url"]
+    }
+
+# 项目按 id、组按名称使用 GitLab 的 keyset 分页；不支持 keyset 的实例会退回普通分页，同样通过 Link 头翻页
+PROJECT_LIST_PARAMS = {"pagination": "keyset", "order_by": "id", "sort": "asc", "simple": "true"}
+GROUP_LIST_PARAMS = {"pagination": "keyset", "order_by": "name", "sort": "asc"}
+
+def encode_page_cursor(next_url: Optional[str]) -> Optional[str]:
+    """把 GitLab 返回的下一页链接编码为不透明的游标，只保留查询参数"""
+    if not next_url:
+        return None
+    return base64.urlsafe_b64encode(urlparse(next_url).query.encode()).decode()
+
+def decode_page_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        return dict(parse_qsl(base64.urlsafe_b64decode(cursor.encode()).decode(), strict_parsing=True))
+    except ValueError:
+        raise ValueError("Invalid cursor")
 
-def get_gitlab_groups(url: str, token: str) -> List[Dict[str, Any]]:
+def fetch_gitlab_page(
+    url: str,
+    token: str,
+    path: str,
+    params: Dict[str, Any],
+    per_page: int = 100,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
     """
-    获取 GitLab 组列表
+    获取一页数据，返回 (items, next_cursor)
+    游标只包含查询参数，请求始终发往同一个 GitLab 实例的同一个路径
     """
-    try:
-        # 确保 URL 以 '/' 结尾
-        if not url.endswith('/'):
-            url = url + '/'
-
-        # 获取组列表
-        response = requests.get(
-            f"{url}api/v4/groups",
-            headers={"PRIVATE-TOKEN": token},
-            params={"per_page": 100},  # 获取更多组
-            timeout=30
-        )
+    page_params = decode_page_cursor(cursor) if cursor else {**params, "per_page": per_page}
+    response = get_session(url, token).get(path, params=page_params)
+    response.raise_for_status()
+    return response.json(), encode_page_cursor(response.links.get("next", {}).get("url"))
 
-        response.raise_for_status()
+async def async_fetch_gitlab_page(
+    url: str,
+    token: str,
+    path: str,
+    params: Dict[str, Any],
+    per_page: int = 100,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    fetch_gitlab_page 的异步版本
+    """
+    page_params = decode_page_cursor(cursor) if cursor else {**params, "per_page": per_page}
+    response = await get_async_session(url, token).get(path, params=page_params)
+    response.raise_for_status()
+    return response.json(), encode_page_cursor(response.links.get("next", {}).get("url"))
 
-        groups = response.json()
-        return [
-            {
-                "id": str(group["id"]),
-                "name": group["name"],
-                "path": group["path"],
-                "full_path": group["full_path"],
-                "web_url": group["web_url"]
-            }
-            for group in groups
-        ]
+def iter_gitlab_pages(url: str, token: str, path: str, params: Dict[str, Any], per_page: int = 100) -> Iterator:
+    """沿 Link 头逐页获取，边获取边产出，不在内存中累积完整列表"""
+    cursor = None
+    while True:
+        items, cursor = fetch_gitlab_page(url, token, path, params, per_page, cursor)
+        yield from items
+        if not cursor:
+            return
 
-    except RequestException as e:
-        print(f"Error fetching GitLab groups: {e}")
-        return []
+def iter_gitlab_projects(url: str, token: str, per_page: int = 100) -> Iterator[Dict[str, Any]]:
+    """
+    遍历 GitLab 上的所有项目
+    """
+    for project in iter_gitlab_pages(url, token, "projects", PROJECT_LIST_PARAMS, per_page):
+        yield project_item(project)
+
+def iter_gitlab_groups(url: str, token: str, per_page: int = 100) -> Iterator[Dict[str, Any]]:
+    """
+    遍历 GitLab 上的所有组
+    """
+    for group in iter_gitlab_pages(url, token, "groups", GROUP_LIST_PARAMS, per_page):
+        yield group_item(group)
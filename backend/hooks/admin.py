@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Hook, HookVersion
+from .models import Hook, HookVersion, HookUpload
 
 @admin.register(Hook)
 class HookAdmin(admin.ModelAdmin):
@@ -11,4 +11,9 @@ class HookAdmin(admin.ModelAdmin):
 class HookVersionAdmin(admin.ModelAdmin):
     list_display = ('hook', 'version', 'created_at', 'created_by')
     list_filter = ('created_at',)
-    search_fields = ('hook__name',)
\ No newline at end of file
+    search_fields = ('hook__name',)
+
+@admin.register(HookUpload)
+class HookUploadAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'received', 'total_size', 'status', 'created_at', 'created_by')
+    list_filter = ('status', 'created_at')
\ No newline at end of file
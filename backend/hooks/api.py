@@ -1,83 +1,61 @@
-from typing import List
+import uuid
+from typing import List, Optional
 from ninja import Router, File, Form
+from ninja.pagination import paginate
 from ninja.files import UploadedFile
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
-from django.db.models import Count
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
 
-from .models import Hook, HookVersion
+from api.pagination import KeysetPagination
+
+from .models import Hook, HookVersion, HookUpload
+from .storage import store_blob
+from .services import (
+    UploadError,
+    UploadOffsetError,
+    add_hook_version,
+    append_upload_chunk,
+    discard_upload,
+    finalize_upload
+)
+from .downloads import serve_hook_file
+from .history import read_version
 from .schemas import (
     HookSchema, 
     HookListSchema, 
     HookCreateSchema, 
     HookUpdateSchema, 
-    HookVersionSchema
+    HookVersionSchema,
+    HookUploadSchema,
+    UploadErrorSchema
 )
 
 router = Router()
 
-@router.get("/", response=List[HookListSchema])
-def list_hooks(request):
-    """获取Hook列表"""
-    hooks = Hook.objects.annotate(deployments_count=Count('deployment'))
-    
-    result = []
-    for hook in hooks:
-        latest_version = hook.versions.first()
-        version_number = latest_version.version if latest_version else 1
-        
-        hook_data = {
-            "id": hook.id,
-            "name": hook.name,
-            "description": hook.description,
-            "hook_type": hook.hook_type,
-            "file_type": hook.file_type,
-            "created_at": hook.created_at,
-            "updated_at": hook.updated_at,
-            "created_by": {
-                "id": hook.created_by.id,
-                "username": hook.created_by.username
-            },
-            "current_version": version_number,
-            "deployments_count": hook.deployments_count
-        }
-        result.append(hook_data)
-    
-    return result
-
-@router.post("/", response=HookSchema)
-def create_hook(
-    request,
-    name: str = Form(...),
-    description: str = Form(""),
-    hook_type: str = Form(...),
-    file_type: str = Form(...),
-    script_language: str = Form(None),
-    file: UploadedFile = File(...)
-):
-    """上传新Hook"""
-    # 在实际应用中，应该从请求中获取用户
-    user = User.objects.first()  # 临时使用第一个用户，实际应该使用认证用户
 
+def _create_hook(name, description, hook_type, file_type, script_language, blob, filename, user):
+    """用已保存的 blob 创建 Hook 及其初始版本"""
     hook = Hook.objects.create(
         name=name,
         description=description,
         hook_type=hook_type,
         file_type=file_type,
         script_language=script_language,
-        file=file,
-        created_by=user
-    )
-    
-    # 创建初始版本
-    hook_version = HookVersion.objects.create(
-        hook=hook,
-        version=1,
-        file=file,
+        file=blob.name,
         created_by=user
     )
-    
+    add_hook_version(hook, blob, filename, user)
+    return hook
+
+
+def _hook_detail(hook):
+    latest_version = hook.versions.first()
+    version_number = latest_version.version if latest_version else 1
+
     return {
         "id": hook.id,
         "name": hook.name,
@@ -92,32 +70,131 @@ def create_hook(
             "id": hook.created_by.id,
             "username": hook.created_by.username
         },
-        "current_version": 1
+        "current_version": version_number
     }
 
+
+@router.get("/", response=List[HookListSchema])
+@paginate(KeysetPagination, ordering=('-updated_at', '-id'))
+def list_hooks(
+    request,
+    hook_type: Optional[str] = None,
+    file_type: Optional[str] = None,
+    name: Optional[str] = None
+):
+    """获取Hook列表（游标分页，name 按前缀匹配）"""
+    query = Q()
+
+    if hook_type:
+        query &= Q(hook_type=hook_type)
+
+    if file_type:
+        query &= Q(file_type=file_type)
+
+    if name:
+        query &= Q(name__startswith=name)
+
+    # 最新版本号通过子查询一次取出，避免逐个Hook查询版本和创建者
+    latest_version = HookVersion.objects.filter(hook=OuterRef('pk')).order_by('-version').values('version')[:1]
+    return Hook.objects.filter(query).select_related('created_by').annotate(
+        deployments_count=Count('deployment'),
+        current_version=Coalesce(Subquery(latest_version), Value(1)),
+    )
+
+@router.post("/", response=HookSchema)
+def create_hook(
+    request,
+    name: str = Form(...),
+    description: str = Form(""),
+    hook_type: str = Form(...),
+    file_type: str = Form(...),
+    script_language: str = Form(None),
+    file: UploadedFile = File(...)
+):
+    """上传新Hook"""
+    # 在实际应用中，应该从请求中获取用户
+    user = User.objects.first()  # 临时使用第一个用户，实际应该使用认证用户
+
+    # 文件按内容哈希保存一次，Hook 和初始版本共享同一个 blob
+    blob = store_blob(file)
+    hook = _create_hook(name, description, hook_type, file_type, script_language, blob, file.name, user)
+    return _hook_detail(hook)
+
+# 分块上传：创建会话 -> 按偏移量上传分块 -> 查询进度 -> 完成并生成 Hook 或新版本
+@router.post("/uploads/", response=HookUploadSchema)
+def create_upload(request, filename: str = Form(...), total_size: Optional[int] = Form(None)):
+    """创建分块上传会话"""
+    return HookUpload.objects.create(filename=filename, total_size=total_size, created_by=request.user)
+
+@router.get("/uploads/{upload_id}/", response=HookUploadSchema)
+def get_upload(request, upload_id: uuid.UUID):
+    """查询上传进度，客户端从 received 处继续上传"""
+    return get_object_or_404(HookUpload, id=upload_id, created_by=request.user)
+
+@router.post(
+    "/uploads/{upload_id}/chunks/",
+    response={200: HookUploadSchema, 400: UploadErrorSchema, 409: UploadErrorSchema}
+)
+def upload_chunk(request, upload_id: uuid.UUID, offset: int = Form(...), chunk: UploadedFile = File(...)):
+    """上传一个分块"""
+    with transaction.atomic():
+        upload = get_object_or_404(
+            HookUpload.objects.select_for_update(), id=upload_id, created_by=request.user
+        )
+        try:
+            return append_upload_chunk(upload, offset, chunk)
+        except UploadOffsetError as e:
+            return 409, {"message": str(e), "expected_offset": e.expected_offset}
+        except UploadError as e:
+            return 400, {"message": str(e)}
+
+@router.post("/uploads/{upload_id}/finalize/", response={200: HookSchema, 400: UploadErrorSchema})
+def finalize_hook_upload(
+    request,
+    upload_id: uuid.UUID,
+    hook_id: Optional[int] = Form(None),
+    name: Optional[str] = Form(None),
+    description: str = Form(""),
+    hook_type: Optional[str] = Form(None),
+    file_type: Optional[str] = Form(None),
+    script_language: str = Form(None)
+):
+    """完成上传：指定 hook_id 时为该 Hook 添加新版本，否则创建新 Hook"""
+    hook = get_object_or_404(Hook, id=hook_id) if hook_id else None
+    if not hook and not (name and hook_type and file_type):
+        return 400, {"message": "name, hook_type and file_type are required to create a hook"}
+
+    with transaction.atomic():
+        upload = get_object_or_404(
+            HookUpload.objects.select_for_update(), id=upload_id, created_by=request.user
+        )
+        try:
+            blob = finalize_upload(upload)
+        except UploadError as e:
+            return 400, {"message": str(e)}
+
+        if hook:
+            add_hook_version(hook, blob, upload.filename, request.user)
+            hook.save()
+        else:
+            hook = _create_hook(
+                name, description, hook_type, file_type, script_language, blob, upload.filename, request.user
+            )
+
+    return _hook_detail(hook)
+
+@router.delete("/uploads/{upload_id}/")
+def delete_upload(request, upload_id: uuid.UUID):
+    """放弃上传会话"""
+    upload = get_object_or_404(HookUpload, id=upload_id, created_by=request.user)
+    discard_upload(upload)
+    return {"success": True}
+
 @router.get("/{hook_id}/", response=HookSchema)
 def get_hook(request, hook_id: int):
     """获取Hook详情"""
     hook = get_object_or_404(Hook, id=hook_id)
-    latest_version = hook.versions.first()
-    version_number = latest_version.version if latest_version else 1
-    
-    return {
-        "id": hook.id,
-        "name": hook.name,
-        "description": hook.description,
-        "hook_type": hook.hook_type,
-        "file_type": hook.file_type,
-        "script_language": hook.script_language,
-        "file_url": hook.file.url if hook.file else None,
-        "created_at": hook.created_at,
-        "updated_at": hook.updated_at,
-        "created_by": {
-            "id": hook.created_by.id,
-            "username": hook.created_by.username
-        },
-        "current_version": version_number
-    }
+    return _hook_detail(hook)
 
 @router.put("/{hook_id}/", response=HookSchema)
 def update_hook(
@@ -141,44 +218,13 @@ def update_hook(
     hook.file_type = file_type
     hook.script_language = script_language
 
-    # 如果提供了新文件，则更新文件并创建新版本
-    if file:
-        hook.file = file
-        
-        # 获取最新版本号
-        latest_version = hook.versions.order_by('-version').first()
-        new_version_number = latest_version.version + 1 if latest_version else 1
-        
-        # 创建新版本
-        HookVersion.objects.create(
-            hook=hook,
-            version=new_version_number,
-            file=file,
-            created_by=user
-        )
-    
-    hook.save()
-    
-    # 获取最新版本号
-    latest_version = hook.versions.first()
-    version_number = latest_version.version if latest_version else 1
-    
-    return {
-        "id": hook.id,
-        "name": hook.name,
-        "description": hook.description,
-        "hook_type": hook.hook_type,
-        "file_type": hook.file_type,
-        "script_language": hook.script_language,
-        "file_url": hook.file.url if hook.file else None,
-        "created_at": hook.created_at,
-        "updated_at": hook.updated_at,
-        "created_by": {
-            "id": hook.created_by.id,
-            "username": hook.created_by.username
-        },
-        "current_version": version_number
-    }
+    # 如果提供了新文件，则更新文件并创建新版本（内容未变化时不创建）
+    # 旧版本的 blob 在事务提交后才会删除，此时 hook 必须已经指向新文件
+    with transaction.atomic():
+        if file:
+            add_hook_version(hook, store_blob(file), file.name, user)
+        hook.save()
+    return _hook_detail(hook)
 
 @router.delete("/{hook_id}/")
 def delete_hook(request, hook_id: int):
@@ -188,21 +234,11 @@ def delete_hook(request, hook_id: int):
     return {"success": True}
 
 @router.get("/{hook_id}/versions/", response=List[HookVersionSchema])
+@paginate(KeysetPagination, ordering=('-version',))
 def get_hook_versions(request, hook_id: int):
-    """获取Hook版本历史"""
+    """获取Hook版本历史（游标分页）"""
     hook = get_object_or_404(Hook, id=hook_id)
-    versions = hook.versions.all()
-    
-    result = []
-    for version in versions:
-        version_data = {
-            "id": version.id,
-            "version": version.version,
-            "created_at": version.created_at
-        }
-        result.append(version_data)
-    
-    return result
+    return hook.versions.all()
 
 @router.get("/{hook_id}/versions/{version_id}/download/")
 def download_hook_version(request, hook_id: int, version_id: int):
@@ -210,6 +246,9 @@ def download_hook_version(request, hook_id: int, version_id: int):
     hook = get_object_or_404(Hook, id=hook_id)
     version = get_object_or_404(HookVersion, id=version_id, hook=hook)
     
-    response = HttpResponse(version.file, content_type='application/octet-stream')
-    response['Content-Disposition'] = f'attachment; filename="{version.file.name.split("/")[-1]}"'
-    return response
\ No newline at end of file
+    filename = version.filename or version.file.name.split("/")[-1]
+    if version.storage == 'delta':
+        # 差量版本需要先重建完整内容（结果会进入 LRU 缓存）
+        content = ContentFile(read_version(version), name=filename)
+        return serve_hook_file(request, content, version.sha256, filename, allow_sendfile=False)
+    return serve_hook_file(request, version.file, version.sha256, filename)
@@ -0,0 +1,136 @@
+import difflib
+import struct
+import zlib
+
+# 差量格式：MAGIC + zlib 压缩的指令流
+# 指令 C: 从基准文件复制 (offset, length)；指令 I: 插入 length 字节的新数据
+DELTA_MAGIC = b'GEHD1'
+COPY_OP = b'C'
+INSERT_OP = b'I'
+COPY_STRUCT = struct.Struct('>QQ')
+INSERT_STRUCT = struct.Struct('>Q')
+# 与 git 相同：开头这么多字节内出现 NUL 即视为二进制文件
+BINARY_CHECK_SIZE = 8000
+# 二进制差量按这个大小的块索引基准文件
+BINARY_BLOCK_SIZE = 64
+
+
+class DeltaError(Exception):
+    """差量数据无法应用到基准文件上"""
+
+
+def _split(data: bytes):
+    """按行切分（二进制文件同样按 \\n 切分），保留换行符以便计算字节偏移"""
+    return data.splitlines(keepends=True)
+
+
+def is_text(data: bytes) -> bool:
+    """按行差量只对文本文件有效，二进制文件使用 encode_binary_delta"""
+    return b'\0' not in data[:BINARY_CHECK_SIZE]
+
+
+def _insert(data: bytes) -> bytes:
+    return INSERT_OP + INSERT_STRUCT.pack(len(data)) + data
+
+
+def encode_delta(base: bytes, target: bytes) -> bytes:
+    """计算把 base 变为 target 的差量"""
+    base_lines = _split(base)
+    target_lines = _split(target)
+
+    # 每一行在 base 中的起始字节偏移
+    base_offsets = [0]
+    for line in base_lines:
+        base_offsets.append(base_offsets[-1] + len(line))
+
+    ops = []
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            offset = base_offsets[i1]
+            ops.append(COPY_OP + COPY_STRUCT.pack(offset, base_offsets[i2] - offset))
+        elif j2 > j1:
+            ops.append(_insert(b''.join(target_lines[j1:j2])))
+
+    return DELTA_MAGIC + zlib.compress(b''.join(ops))
+
+
+def encode_binary_delta(base: bytes, target: bytes, max_insert=None, block_size: int = BINARY_BLOCK_SIZE):
+    """
+    计算二进制文件的差量，格式与 encode_delta 相同
+    基准文件按 block_size 对齐切块建立索引，在目标文件中逐字节查找相同的块，
+    找到后向前后逐字节扩展为一条复制指令，其余字节作为插入数据
+    未匹配的字节超过 max_insert 时提前放弃并返回 None：逐字节查找是主要开销，与基准文件无关的内容不值得继续
+    """
+    index = {}
+    for offset in range(0, len(base) - block_size + 1, block_size):
+        index.setdefault(base[offset:offset + block_size], offset)
+
+    ops = []
+    inserted = 0
+    pending = 0  # 尚未输出的插入数据的起点
+    pos = 0
+    while pos + block_size <= len(target):
+        offset = index.get(target[pos:pos + block_size])
+        if offset is None:
+            pos += 1
+            if max_insert is not None and inserted + pos - pending > max_insert:
+                return None
+            continue
+
+        end, base_end = pos + block_size, offset + block_size
+        while (end + block_size <= len(target) and base_end + block_size <= len(base)
+               and target[end:end + block_size] == base[base_end:base_end + block_size]):
+            end += block_size
+            base_end += block_size
+        while end < len(target) and base_end < len(base) and target[end] == base[base_end]:
+            end += 1
+            base_end += 1
+        start, base_start = pos, offset
+        while start > pending and base_start > 0 and target[start - 1] == base[base_start - 1]:
+            start -= 1
+            base_start -= 1
+
+        if start > pending:
+            ops.append(_insert(target[pending:start]))
+            inserted += start - pending
+        ops.append(COPY_OP + COPY_STRUCT.pack(base_start, base_end - base_start))
+        pending = pos = end
+
+    if max_insert is not None and inserted + len(target) - pending > max_insert:
+        return None
+    if pending < len(target):
+        ops.append(_insert(target[pending:]))
+    return DELTA_MAGIC + zlib.compress(b''.join(ops))
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """把差量应用到 base 上，重建目标文件"""
+    if not delta.startswith(DELTA_MAGIC):
+        raise DeltaError("Unknown delta format")
+
+    try:
+        ops = zlib.decompress(delta[len(DELTA_MAGIC):])
+    except zlib.error as e:
+        raise DeltaError(f"Corrupted delta: {e}") from e
+
+    parts = []
+    pos = 0
+    while pos < len(ops):
+        op = ops[pos:pos + 1]
+        pos += 1
+        if op == COPY_OP:
+            offset, length = COPY_STRUCT.unpack_from(ops, pos)
+            pos += COPY_STRUCT.size
+            if offset + length > len(base):
+                raise DeltaError("Copy instruction exceeds base size")
+            parts.append(base[offset:offset + length])
+        elif op == INSERT_OP:
+            (length,) = INSERT_STRUCT.unpack_from(ops, pos)
+            pos += INSERT_STRUCT.size
+            parts.append(ops[pos:pos + length])
+            pos += length
+        else:
+            raise DeltaError(f"Unknown delta instruction {op!r}")
+
+    return b''.join(parts)
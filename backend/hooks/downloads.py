@@ -0,0 +1,133 @@
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+# 每次读取的块大小，避免把大文件整个读入 worker 内存
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_chunks(fileobj, start=0, length=None, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """从 start 开始分块读取 length 字节（None 表示读到末尾）"""
+    try:
+        fileobj.seek(start)
+        remaining = length
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            chunk = fileobj.read(size)
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def parse_range(header, size):
+    """
+    解析单个 Range 头，返回 (start, end)（包含 end）
+    头格式不支持时返回 None，范围无法满足时返回 False（空文件的任何范围都无法满足）
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    if size == 0:
+        return False
+
+    start, end = match.groups()
+    if start == '':
+        # bytes=-N 表示最后 N 个字节
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = int(end) if end else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def _opaque_tag(tag):
+    tag = tag.strip()
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def etag_matches(header, etag):
+    """If-None-Match 使用弱比较：忽略 W/ 前缀（代理压缩后可能把强 ETag 改为弱 ETag）"""
+    if not header or not etag:
+        return False
+    if header.strip() == '*':
+        return True
+    return _opaque_tag(etag) in [_opaque_tag(tag) for tag in header.split(',')]
+
+
+def serve_hook_file(request, field_file, sha256, filename, allow_sendfile=True):
+    """
+    以流的方式返回 Hook 文件
+    支持基于内容哈希的强 ETag、If-None-Match、Range 请求，以及 X-Sendfile/X-Accel-Redirect 模式
+    """
+    etag = f'"{sha256}"' if sha256 else None
+
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    sendfile_mode = getattr(settings, 'HOOK_DOWNLOAD_SENDFILE', None) if allow_sendfile else None
+    if sendfile_mode == 'x-accel-redirect':
+        # 由 nginx 直接发送文件（包括 Range 处理）
+        response = HttpResponse(content_type='application/octet-stream')
+        prefix = getattr(settings, 'HOOK_DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = f"{prefix.rstrip('/')}/{field_file.name}"
+    elif sendfile_mode == 'x-sendfile':
+        # 由 Apache mod_xsendfile 等直接发送文件
+        response = HttpResponse(content_type='application/octet-stream')
+        response['X-Sendfile'] = field_file.path
+    else:
+        response = _stream_file(request, field_file, etag)
+
+    if etag:
+        response['ETag'] = etag
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
+
+def _stream_file(request, field_file, etag):
+    size = field_file.size
+    range_header = request.headers.get('Range')
+
+    # If-Range 与当前版本不一致时忽略 Range，返回完整文件；这里必须强比较，弱 ETag 永远不匹配
+    if_range = request.headers.get('If-Range')
+    if range_header and if_range and if_range.strip() != etag:
+        range_header = None
+
+    byte_range = parse_range(range_header, size) if range_header else None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        response = FileResponse(field_file.open('rb'), content_type='application/octet-stream')
+        response.block_size = DOWNLOAD_CHUNK_SIZE
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        file_chunks(field_file.open('rb'), start, length),
+        status=206,
+        content_type='application/octet-stream',
+    )
+    response['Content-Length'] = str(length)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,164 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .deltas import apply_delta, encode_binary_delta, encode_delta, is_text
+from .models import Hook, HookVersion
+from .storage import store_blob
+
+# 默认每 20 个版本保留一个完整快照，限制重建时的差量链长度
+DEFAULT_SNAPSHOT_INTERVAL = 20
+# 超过该大小的文件不做差量压缩（差量在请求内计算，耗时随文件大小增长）
+DEFAULT_DELTA_MAX_SIZE = 4 * 1024 * 1024
+# 差量不小于原文件该比例时保留完整文件
+DELTA_MIN_SAVING = 0.5
+# 重建结果缓存的总字节数上限
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+
+
+class VersionCache:
+    """按字节数限制容量的 LRU 缓存，保存重建后的版本内容"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            content = self._items.get(key)
+            if content is not None:
+                self._items.move_to_end(key)
+            return content
+
+    def put(self, key, content):
+        if len(content) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return
+            self._items[key] = content
+            self.current_bytes += len(content)
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.current_bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.current_bytes = 0
+
+
+version_cache = VersionCache(getattr(settings, 'HOOK_VERSION_CACHE_SIZE', DEFAULT_CACHE_SIZE))
+
+
+def _read_file(field_file) -> bytes:
+    with field_file.open('rb') as f:
+        return f.read()
+
+
+def read_version(version) -> bytes:
+    """读取版本的完整内容，差量版本沿 base_version 链重建"""
+    key = (version.id, version.sha256)
+    content = version_cache.get(key)
+    if content is not None:
+        return content
+
+    # 收集差量链直到完整快照（或已缓存的版本），再依次应用
+    chain = []
+    current = version
+    content = None
+    while current.storage == 'delta':
+        chain.append(current)
+        current = current.base_version
+        content = version_cache.get((current.id, current.sha256))
+        if content is not None:
+            break
+    if content is None:
+        content = _read_file(current.file)
+
+    for delta_version in reversed(chain):
+        content = apply_delta(content, _read_file(delta_version.file))
+
+    version_cache.put(key, content)
+    return content
+
+
+
+@contextmanager
+def materialize_version(version):
+    """提供版本完整内容的本地文件路径；差量版本重建到临时文件，退出时删除"""
+    if version.storage == 'full':
+        yield version.file.path
+        return
+
+    fd, path = tempfile.mkstemp(prefix=f'hook-{version.hook_id}-v{version.version}-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(read_version(version))
+        yield path
+    finally:
+        os.remove(path)
+
+
+def _release_blob(name):
+    """
+    事务提交后删除不再被引用的 blob：提交前删除的话，事务回滚后数据库仍引用它
+    提交时再检查一次引用，期间其他请求可能已经复用了同一内容
+    """
+    def delete():
+        if Hook.objects.filter(file=name).exists() or HookVersion.objects.filter(file=name).exists():
+            return
+        default_storage.delete(name)
+
+    transaction.on_commit(delete)
+
+
+def compress_previous_version(new_version):
+    """
+    新版本保存完整内容后，把上一个版本改为相对新版本的反向差量
+    每 HOOK_SNAPSHOT_INTERVAL 个版本保留一个完整快照；文件过大或差量收益不足时也保留完整内容
+    文本文件按行计算差量，二进制文件按块匹配计算差量
+    """
+    interval = getattr(settings, 'HOOK_SNAPSHOT_INTERVAL', DEFAULT_SNAPSHOT_INTERVAL)
+    max_size = getattr(settings, 'HOOK_DELTA_MAX_SIZE', DEFAULT_DELTA_MAX_SIZE)
+
+    previous = (
+        HookVersion.objects.filter(hook=new_version.hook, version__lt=new_version.version)
+        .order_by('-version')
+        .first()
+    )
+    if not previous or previous.storage != 'full' or previous.version % interval == 0:
+        return None
+    if new_version.storage != 'full' or max(previous.size, new_version.size) > max_size:
+        return None
+
+    target = _read_file(previous.file)
+    base = _read_file(new_version.file)
+    if is_text(target) and is_text(base):
+        delta = encode_delta(base, target)
+    else:
+        delta = encode_binary_delta(base, target, max_insert=int(len(target) * DELTA_MIN_SAVING))
+    if delta is None or len(delta) >= len(target) * DELTA_MIN_SAVING:
+        return None
+
+    old_name = previous.file.name
+    blob = store_blob(ContentFile(delta))
+    previous.file = blob.name
+    previous.storage = 'delta'
+    previous.base_version = new_version
+    previous.save(update_fields=['file', 'storage', 'base_version'])
+
+    version_cache.put((previous.id, previous.sha256), target)
+    _release_blob(old_name)
+    return previous
+
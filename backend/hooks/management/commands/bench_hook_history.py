@@ -0,0 +1,116 @@
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from hooks.history import read_version, version_cache
+from hooks.models import Hook, HookVersion
+from hooks.services import add_hook_version
+from hooks.storage import store_blob
+
+
+class Command(BaseCommand):
+    help = (
+        "基准测试：分别为文本脚本和二进制 Hook 生成合成的版本历史，"
+        "报告差量存储节省的空间和版本重建延迟（不会保留任何数据）"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--versions', type=int, default=1000, help="每种 Hook 的版本数量")
+        parser.add_argument('--lines', type=int, default=2000, help="文本脚本的行数")
+        parser.add_argument('--binary-size', type=int, default=512 * 1024, help="二进制 Hook 的字节数")
+        parser.add_argument('--changes', type=int, default=5, help="每个版本修改的行数（二进制为修改的区域数）")
+        parser.add_argument('--samples', type=int, default=200, help="重建延迟的采样次数")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            with transaction.atomic():
+                user = User.objects.create(username=f'bench-{os.getpid()}-{time.time_ns()}')
+                for name, versions in (
+                    ('text', self.text_versions(rng, options)),
+                    ('binary', self.binary_versions(rng, options)),
+                ):
+                    self.report(name, self.run(rng, user, name, versions, options))
+                transaction.set_rollback(True)
+
+    def text_versions(self, rng, options):
+        lines = [f'check_rule_{i} "$oldrev" "$newrev" || exit 1\n'.encode() for i in range(options['lines'])]
+        for _ in range(options['versions']):
+            for _ in range(options['changes']):
+                lines[rng.randrange(len(lines))] = f'check_rule_{rng.random()} || exit 1\n'.encode()
+            yield b''.join(lines)
+
+    def binary_versions(self, rng, options):
+        """模拟重新编译的二进制：每个版本改写几个小区域，偶尔插入或删除字节使后续内容整体偏移"""
+        content = bytearray(b'\x7fELF\0' + rng.randbytes(options['binary_size']))
+        for _ in range(options['versions']):
+            for _ in range(options['changes']):
+                offset = rng.randrange(len(content))
+                content[offset:offset + 32] = rng.randbytes(32)
+            if rng.random() < 0.3:
+                offset = rng.randrange(len(content))
+                content[offset:offset + rng.randrange(64)] = rng.randbytes(rng.randrange(64))
+            yield bytes(content)
+
+    def run(self, rng, user, name, contents, options):
+        hook = None
+        start = time.perf_counter()
+        for content in contents:
+            blob = store_blob(ContentFile(content))
+            if hook is None:
+                hook = Hook.objects.create(
+                    name=f'bench-{name}', hook_type='pre-receive', file_type='binary' if name == 'binary' else 'script',
+                    file=blob.name, created_by=user
+                )
+            add_hook_version(hook, blob, f'bench-{name}', user)
+            hook.save()
+        write_seconds = time.perf_counter() - start
+
+        versions = list(hook.versions.select_related('base_version'))
+        # 被替换的完整 blob 在事务提交后才删除，而这里的事务最终回滚，所以只统计仍被引用的 blob
+        referenced = set(HookVersion.objects.filter(hook=hook).values_list('file', flat=True)) | {hook.file.name}
+        stored = sum(default_storage.size(name) for name in referenced)
+
+        cold, warm = [], []
+        for version in rng.sample(versions, min(options['samples'], len(versions))):
+            version_cache.clear()
+            start = time.perf_counter()
+            read_version(version)
+            cold.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            read_version(version)
+            warm.append((time.perf_counter() - start) * 1000)
+
+        return {
+            'versions': len(versions),
+            'deltas': sum(1 for v in versions if v.storage == 'delta'),
+            'write_seconds': write_seconds,
+            'logical': sum(v.size for v in versions),
+            'stored': stored,
+            'cold': cold,
+            'warm': warm,
+        }
+
+    def report(self, name, result):
+        versions, write_seconds, cold = result['versions'], result['write_seconds'], result['cold']
+        self.stdout.write(f"[{name}]")
+        self.stdout.write(f"versions:            {versions} ({result['deltas']} stored as deltas)")
+        self.stdout.write(f"write time:          {write_seconds:.2f} s ({write_seconds / versions * 1000:.2f} ms/version)")
+        self.stdout.write(f"logical size:        {result['logical'] / 1024 / 1024:.2f} MiB")
+        self.stdout.write(f"stored size:         {result['stored'] / 1024 / 1024:.2f} MiB")
+        self.stdout.write(f"storage saved:       {(1 - result['stored'] / result['logical']) * 100:.1f}%")
+        self.stdout.write(f"rebuild (cold) p50:  {statistics.median(cold):.2f} ms")
+        if len(cold) > 1:
+            self.stdout.write(f"rebuild (cold) p95:  {statistics.quantiles(cold, n=20)[-1]:.2f} ms")
+        self.stdout.write(f"rebuild (cold) max:  {max(cold):.2f} ms")
+        self.stdout.write(f"rebuild (cached):    {statistics.median(result['warm']) * 1000:.1f} µs")
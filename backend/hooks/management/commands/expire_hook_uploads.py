@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from hooks.services import DEFAULT_UPLOAD_EXPIRE_SECONDS, expire_uploads
+
+
+class Command(BaseCommand):
+    help = "清理超时未完成（或早已完成）的分块上传会话及其临时文件，适合由 cron 定期运行"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age', type=int,
+            default=getattr(settings, 'HOOK_UPLOAD_EXPIRE_SECONDS', DEFAULT_UPLOAD_EXPIRE_SECONDS),
+            help="会话多少秒没有更新即视为放弃（默认 HOOK_UPLOAD_EXPIRE_SECONDS）"
+        )
+
+    def handle(self, *args, **options):
+        sessions, orphans = expire_uploads(options['max_age'])
+        self.stdout.write(f"removed {sessions} expired upload session(s) and {orphans} orphaned part file(s)")
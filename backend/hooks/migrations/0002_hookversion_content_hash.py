@@ -0,0 +1,49 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:51
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_content_hash(apps, schema_editor):
+    HookVersion = apps.get_model('hooks', 'HookVersion')
+    for version in HookVersion.objects.exclude(file='').iterator():
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with version.file.open('rb') as f:
+                for chunk in f.chunks():
+                    digest.update(chunk)
+                    size += len(chunk)
+        except (FileNotFoundError, OSError):
+            continue
+        version.filename = version.file.name.split('/')[-1]
+        version.sha256 = digest.hexdigest()
+        version.size = size
+        version.save(update_fields=['filename', 'sha256', 'size'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hooks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hookversion',
+            name='filename',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='hookversion',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='hookversion',
+            name='size',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_content_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hooks', '0003_hookupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hookversion',
+            name='base_version',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='hooks.hookversion'),
+        ),
+        migrations.AddField(
+            model_name='hookversion',
+            name='storage',
+            field=models.CharField(choices=[('full', 'Full'), ('delta', 'Delta')], default='full', max_length=10),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hooks', '0004_hookversion_delta_storage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hook',
+            index=models.Index(fields=['-updated_at', '-id'], name='hook_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hook',
+            index=models.Index(fields=['hook_type', '-updated_at', '-id'], name='hook_type_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hook',
+            index=models.Index(fields=['file_type', '-updated_at', '-id'], name='hook_file_type_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hook',
+            index=models.Index(fields=['name'], name='hook_name_idx'),
+        ),
+    ]
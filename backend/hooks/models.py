@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -37,6 +39,12 @@ class Hook(models.Model):
 
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['-updated_at', '-id'], name='hook_updated_idx'),
+            models.Index(fields=['hook_type', '-updated_at', '-id'], name='hook_type_updated_idx'),
+            models.Index(fields=['file_type', '-updated_at', '-id'], name='hook_file_type_updated_idx'),
+            models.Index(fields=['name'], name='hook_name_idx'),
+        ]
         
     def __str__(self):
         return self.name
@@ -46,6 +54,19 @@ class HookVersion(models.Model):
     hook = models.ForeignKey(Hook, on_delete=models.CASCADE, related_name='versions')
     version = models.IntegerField()
     file = models.FileField(upload_to='hook_versions/')
+    filename = models.CharField(max_length=255, blank=True)  # 上传时的原始文件名
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    size = models.BigIntegerField(default=0)
+    # full: file 是完整内容；delta: file 是相对 base_version 的差量
+    storage = models.CharField(
+        max_length=10,
+        choices=[
+            ('full', 'Full'),
+            ('delta', 'Delta')
+        ],
+        default='full'
+    )
+    base_version = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
 
@@ -54,4 +75,33 @@ class HookVersion(models.Model):
         unique_together = ['hook', 'version']
         
     def __str__(self):
-        return f"{self.hook.name} v{self.version}"
\ No newline at end of file
+        return f"{self.hook.name} v{self.version}"
+
+class HookUpload(models.Model):
+    """分块上传会话，数据追加写入临时文件，完成后转为 Hook 或 HookVersion"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField(null=True, blank=True)  # 客户端声明的文件大小，可选
+    received = models.BigIntegerField(default=0)  # 已接收的字节数，即下一个分块的偏移量
+    sha256 = models.CharField(max_length=64, blank=True)
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('uploading', 'Uploading'),
+            ('completed', 'Completed')
+        ],
+        default='uploading'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.filename} ({self.received} bytes)"
+
+    @property
+    def part_name(self):
+        return f"uploads/{self.id}.part"
@@ -1,3 +1,4 @@
+import uuid
 from typing import Optional, List
 from datetime import datetime
 from ninja import Schema, ModelSchema
@@ -11,6 +12,8 @@ class UserSchema(Schema):
 class HookVersionSchema(Schema):
     id: int
     version: int
+    sha256: str
+    size: int
     created_at: datetime
 
 
@@ -54,4 +57,19 @@ class HookListSchema(Schema):
     updated_at: datetime
     created_by: UserSchema
     current_version: int
-    deployments_count: int
\ No newline at end of file
+    deployments_count: int
+
+
+class HookUploadSchema(Schema):
+    id: uuid.UUID
+    filename: str
+    total_size: Optional[int]
+    received: int
+    status: str
+    created_at: datetime
+    updated_at: datetime
+
+
+class UploadErrorSchema(Schema):
+    message: str
+    expected_offset: Optional[int] = None
\ No newline at end of file
@@ -0,0 +1,212 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .history import compress_previous_version
+from .models import HookUpload, HookVersion
+from .storage import adopt_blob
+
+# 分块上传时每次读取临时文件的块大小
+UPLOAD_READ_SIZE = 1024 * 1024
+# 上传会话超过该时间（秒）没有新的分块即视为放弃，由 expire_hook_uploads 命令清理
+DEFAULT_UPLOAD_EXPIRE_SECONDS = 24 * 3600
+UPLOAD_DIR = 'uploads'
+
+# 进程内缓存的增量哈希状态：upload_id -> (已哈希的字节数, hasher, 最后使用时间)，按最后使用时间排列
+# 其他进程接收了分块或进程重启后缓存失效，此时从临时文件重新计算
+_upload_hashers = OrderedDict()
+_upload_hashers_lock = threading.Lock()
+
+
+def _upload_expire_seconds():
+    return getattr(settings, 'HOOK_UPLOAD_EXPIRE_SECONDS', DEFAULT_UPLOAD_EXPIRE_SECONDS)
+
+
+class UploadError(Exception):
+    """分块上传请求无效"""
+
+
+class UploadOffsetError(UploadError):
+    """分块偏移量与服务端已接收的字节数不一致"""
+
+    def __init__(self, expected_offset):
+        self.expected_offset = expected_offset
+        super().__init__(f"Expected chunk at offset {expected_offset}")
+
+
+def add_hook_version(hook, blob, filename, user):
+    """
+    为 Hook 添加一个指向 blob 的新版本，并把 Hook 的当前文件切换到该 blob
+    内容与最新版本相同时不创建新版本，返回 None；调用方负责保存 hook
+    """
+    latest_version = hook.versions.order_by('-version').first()
+    if latest_version and latest_version.sha256 == blob.sha256:
+        return None
+
+    hook.file = blob.name
+    version = HookVersion.objects.create(
+        hook=hook,
+        version=latest_version.version + 1 if latest_version else 1,
+        file=blob.name,
+        filename=filename,
+        sha256=blob.sha256,
+        size=blob.size,
+        created_by=user
+    )
+    # 最新版本保存完整内容，上一个版本改为差量存储
+    compress_previous_version(version)
+    return version
+
+
+def _upload_hasher(upload, path):
+    """取得已覆盖 upload.received 字节的 hasher 副本"""
+    with _upload_hashers_lock:
+        cached = _upload_hashers.get(upload.id)
+    if cached and cached[0] == upload.received:
+        return cached[1].copy()
+
+    hasher = hashlib.sha256()
+    remaining = upload.received
+    if remaining:
+        with open(path, 'rb') as f:
+            while remaining > 0:
+                data = f.read(min(UPLOAD_READ_SIZE, remaining))
+                if not data:
+                    raise UploadError("Upload data is missing on the server")
+                hasher.update(data)
+                remaining -= len(data)
+    return hasher
+
+
+def append_upload_chunk(upload, offset, chunk):
+    """
+    把一个分块追加到上传会话的临时文件，同时增量更新哈希
+    offset 必须等于已接收的字节数，否则客户端应从 expected_offset 继续
+    """
+    if upload.status != 'uploading':
+        raise UploadError("Upload session is already completed")
+    if offset != upload.received:
+        raise UploadOffsetError(upload.received)
+
+    path = default_storage.path(upload.part_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    hasher = _upload_hasher(upload, path)
+
+    received = upload.received
+    with open(path, 'ab') as f:
+        # 丢弃之前失败请求写入但未记录的数据
+        f.truncate(received)
+        for data in chunk.chunks():
+            f.write(data)
+            hasher.update(data)
+            received += len(data)
+
+    if upload.total_size is not None and received > upload.total_size:
+        with open(path, 'ab') as f:
+            f.truncate(upload.received)
+        raise UploadError("Chunk exceeds the declared file size")
+
+    upload.received = received
+    upload.save(update_fields=['received', 'updated_at'])
+
+    _cache_hasher(upload.id, received, hasher)
+    return upload
+
+
+def _cache_hasher(upload_id, received, hasher):
+    """缓存哈希状态，同时淘汰过期的条目（客户端放弃的上传、由其他进程完成的上传）"""
+    now = time.monotonic()
+    expire = _upload_expire_seconds()
+    with _upload_hashers_lock:
+        _upload_hashers[upload_id] = (received, hasher, now)
+        _upload_hashers.move_to_end(upload_id)
+        while _upload_hashers:
+            oldest_id, (_, _, last_used) = next(iter(_upload_hashers.items()))
+            if now - last_used <= expire:
+                break
+            del _upload_hashers[oldest_id]
+
+
+def finalize_upload(upload):
+    """
+    完成上传会话，把临时文件放入内容寻址存储并返回 blob
+    临时文件在事务提交后才删除；事务回滚时会话仍为 uploading，可以重新完成
+    """
+    if upload.status != 'uploading':
+        raise UploadError("Upload session is already completed")
+    if upload.total_size is not None and upload.received != upload.total_size:
+        raise UploadError(f"Upload incomplete: received {upload.received} of {upload.total_size} bytes")
+
+    path = default_storage.path(upload.part_name)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'wb').close()
+
+    sha256 = _upload_hasher(upload, path).hexdigest()
+    blob = adopt_blob(path, sha256, upload.received)
+
+    upload.sha256 = sha256
+    upload.status = 'completed'
+    upload.save(update_fields=['sha256', 'status', 'updated_at'])
+    _remove_upload_part(upload)
+    return blob
+
+
+def _remove_upload_part(upload):
+    """事务提交后删除临时文件和缓存的哈希状态，回滚时保留它们以便重新完成上传"""
+    upload_id, part_name = upload.id, upload.part_name
+
+    def delete():
+        with _upload_hashers_lock:
+            _upload_hashers.pop(upload_id, None)
+        if default_storage.exists(part_name):
+            default_storage.delete(part_name)
+
+    transaction.on_commit(delete)
+
+
+def discard_upload(upload):
+    """删除上传会话及其临时文件"""
+    with _upload_hashers_lock:
+        _upload_hashers.pop(upload.id, None)
+    if default_storage.exists(upload.part_name):
+        default_storage.delete(upload.part_name)
+    upload.delete()
+
+
+def expire_uploads(max_age=None):
+    """
+    删除超过 max_age 秒（默认 HOOK_UPLOAD_EXPIRE_SECONDS）没有更新的上传会话及其临时文件，
+    以及没有对应会话的残留临时文件；返回删除的会话数和残留文件数
+    """
+    if max_age is None:
+        max_age = _upload_expire_seconds()
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    expired = list(HookUpload.objects.filter(updated_at__lt=cutoff))
+    for upload in expired:
+        discard_upload(upload)
+
+    orphans = 0
+    if default_storage.exists(UPLOAD_DIR):
+        for filename in default_storage.listdir(UPLOAD_DIR)[1]:
+            name = f"{UPLOAD_DIR}/{filename}"
+            stem, ext = os.path.splitext(filename)
+            if ext != '.part' or default_storage.get_modified_time(name) >= cutoff:
+                continue
+            try:
+                upload_id = uuid.UUID(stem)
+            except ValueError:
+                continue
+            if not HookUpload.objects.filter(id=upload_id, status='uploading').exists():
+                default_storage.delete(name)
+                orphans += 1
+    return len(expired), orphans
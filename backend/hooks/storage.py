@@ -0,0 +1,71 @@
+import hashlib
+import os
+import shutil
+import uuid
+from typing import NamedTuple
+
+from django.core.files.storage import default_storage
+
+# 内容寻址存储的根目录，文件按 SHA-256 命名：blobs/ab/abcdef...
+BLOB_PREFIX = 'blobs'
+
+
+class StoredBlob(NamedTuple):
+    name: str
+    sha256: str
+    size: int
+
+
+def blob_name(sha256: str) -> str:
+    """根据内容哈希计算存储路径"""
+    return f"{BLOB_PREFIX}/{sha256[:2]}/{sha256}"
+
+
+def hash_file(file) -> tuple:
+    """分块计算文件的 SHA-256 和大小，不把整个文件读入内存"""
+    digest = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return digest.hexdigest(), size
+
+
+def store_blob(file) -> StoredBlob:
+    """
+    把上传文件写入内容寻址存储
+    相同内容只保存一份，已存在时直接复用，不再复制字节
+    """
+    sha256, size = hash_file(file)
+    name = blob_name(sha256)
+
+    if not default_storage.exists(name):
+        saved_name = default_storage.save(name, file)
+        if saved_name != name:
+            # 并发上传同一内容时，另一个请求已经写入了同名文件
+            default_storage.delete(saved_name)
+
+    return StoredBlob(name=name, sha256=sha256, size=size)
+
+
+def adopt_blob(path: str, sha256: str, size: int) -> StoredBlob:
+    """
+    把已经计算好哈希的本地文件（例如分块上传的临时文件）放入内容寻址存储
+    优先建立硬链接，跨文件系统时复制；源文件保持不变，由调用方在事务提交后删除
+    """
+    name = blob_name(sha256)
+
+    if not default_storage.exists(name):
+        target = default_storage.path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # 先写到临时名再原子替换，其他请求不会读到不完整的 blob
+        tmp = f"{target}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.link(path, tmp)
+        except OSError:
+            shutil.copyfile(path, tmp)
+        os.replace(tmp, target)
+
+    return StoredBlob(name=name, sha256=sha256, size=size)
@@ -5,6 +5,7 @@ const GitLabConfigForm = ({ config, onSubmit, onCancel }) => {
   const [formData, setFormData] = useState({
     url: config?.url || '',
     token: '', // 不回显 token
+    system_hook_token: '', // 同样不回显
     is_active: config?.is_active !== undefined ? config.is_active : true
   });
   const [loading, setLoading] = useState(false);
@@ -32,6 +33,9 @@ const GitLabConfigForm = ({ config, onSubmit, onCancel }) => {
     if (config && !dataToSubmit.token) {
         delete dataToSubmit.token;
       }
+    if (config && !dataToSubmit.system_hook_token) {
+      delete dataToSubmit.system_hook_token;
+    }
 
     setLoading(true);
     setError(null);
@@ -100,6 +104,27 @@ const GitLabConfigForm = ({ config, onSubmit, onCancel }) => {
         </label>
       </div>
 
+      <div className="form-control mb-4">
+        <label className="label">
+          <span className="label-text">
+            System Hook Secret Token {config?.system_hook_enabled ? '(leave empty to keep current)' : '(optional)'}
+          </span>
+        </label>
+        <input
+          type="password"
+          name="system_hook_token"
+          value={formData.system_hook_token}
+          onChange={handleChange}
+          className="input input-bordered"
+          placeholder={config?.system_hook_enabled ? '••••••••••••••••' : 'Secret token of the GitLab system hook'}
+        />
+        <label className="label">
+          <span className="label-text-alt">
+            Point a GitLab system hook at /api/gitlab/system-hooks/ with this token to receive project and group events
+          </span>
+        </label>
+      </div>
+
       <div className="form-control mb-6">
         <label className="label cursor-pointer">
           <span className="label-text">Active</span>
@@ -14,6 +14,12 @@ const HookDeployForm = ({ hook, onSubmit, onCancel, loading }) => {
   const [gitlabConfigs, setGitlabConfigs] = useState([]);
   const [loadingConfigs, setLoadingConfigs] = useState(false);
   const [loadingTargets, setLoadingTargets] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [search, setSearch] = useState('');
+  const [namespace, setNamespace] = useState('');
+  // 输入停止 300ms 后才生效的筛选条件，避免每次按键都请求 GitLab
+  const [targetFilters, setTargetFilters] = useState({});
   const [gitlabError, setGitlabError] = useState(null);
 
   // 加载 GitLab 配置
@@ -44,8 +50,20 @@ const HookDeployForm = ({ hook, onSubmit, onCancel, loading }) => {
     loadGitLabConfigs();
   }, []);
 
-  // 当部署级别或 GitLab 配置改变时，加载相应的目标选项
   useEffect(() => {
+    const timer = setTimeout(() => {
+      const filters = {};
+      if (search.trim()) filters.search = search.trim();
+      if (namespace.trim()) filters.namespace = namespace.trim();
+      setTargetFilters(filters);
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [search, namespace]);
+
+  // 当部署级别、GitLab 配置或筛选条件改变时，加载相应的目标选项
+  useEffect(() => {
+    // 筛选条件已更新时丢弃旧请求的结果，避免慢响应覆盖新的选项
+    let stale = false;
     const loadTargets = async () => {
       // 如果没有选择 GitLab 配置或是服务器级别，则不需要加载目标
       if (!formData.gitlab_config_id || formData.deployment_level === 'server') {
@@ -54,25 +72,55 @@ const HookDeployForm = ({ hook, onSubmit, onCancel, loading }) => {
 
       setLoadingTargets(true);
       setGitlabError(null);
+      setNextCursor(null);
 
       try {
+        // 只加载第一页，后续页面通过"加载更多"按需获取
         if (formData.deployment_level === 'project') {
-          const projectsData = await fetchGitLabProjects(formData.gitlab_config_id);
-          setProjects(projectsData);
+          const data = await fetchGitLabProjects(formData.gitlab_config_id, targetFilters);
+          if (stale) return;
+          setProjects(data.items);
+          setNextCursor(data.next_cursor);
         } else if (formData.deployment_level === 'group') {
-          const groupsData = await fetchGitLabGroups(formData.gitlab_config_id);
-          setGroups(groupsData);
+          const data = await fetchGitLabGroups(formData.gitlab_config_id, targetFilters);
+          if (stale) return;
+          setGroups(data.items);
+          setNextCursor(data.next_cursor);
         }
       } catch (error) {
+        if (stale) return;
         console.error('Error loading targets:', error);
         setGitlabError('Failed to load GitLab targets. Please check your GitLab configuration.');
       } finally {
-        setLoadingTargets(false);
+        if (!stale) setLoadingTargets(false);
       }
     };
 
     loadTargets();
-  }, [formData.deployment_level, formData.gitlab_config_id]);
+    return () => { stale = true; };
+  }, [formData.deployment_level, formData.gitlab_config_id, targetFilters]);
+
+  // 加载下一页项目或组并追加到选项中
+  const handleLoadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      if (formData.deployment_level === 'project') {
+        const data = await fetchGitLabProjects(formData.gitlab_config_id, targetFilters, nextCursor);
+        setProjects(prev => [...prev, ...data.items]);
+        setNextCursor(data.next_cursor);
+      } else if (formData.deployment_level === 'group') {
+        const data = await fetchGitLabGroups(formData.gitlab_config_id, targetFilters, nextCursor);
+        setGroups(prev => [...prev, ...data.items]);
+        setNextCursor(data.next_cursor);
+      }
+    } catch (error) {
+      console.error('Error loading more targets:', error);
+      setGitlabError('Failed to load GitLab targets. Please check your GitLab configuration.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   // 处理表单字段变化
   const handleChange = (e) => {
@@ -182,6 +230,25 @@ const HookDeployForm = ({ hook, onSubmit, onCancel, loading }) => {
             {formData.deployment_level === 'project' ? '选择项目' : '选择组'}
           </label>
 
+          <div className="flex gap-2 mb-2">
+            <input
+              type="text"
+              value={search}
+              onChange={(e) => setSearch(e.target.value)}
+              placeholder="搜索名称或路径"
+              className="input input-bordered input-sm flex-1"
+              disabled={loading}
+            />
+            <input
+              type="text"
+              value={namespace}
+              onChange={(e) => setNamespace(e.target.value)}
+              placeholder="命名空间，如 group/subgroup"
+              className="input input-bordered input-sm flex-1"
+              disabled={loading}
+            />
+          </div>
+
           {loadingTargets ? (
             <div className="flex items-center space-x-2">
               <span className="loading loading-spinner loading-sm"></span>
@@ -211,6 +278,19 @@ const HookDeployForm = ({ hook, onSubmit, onCancel, loading }) => {
               ))}
             </select>
           )}
+
+          {!loadingTargets && !gitlabError && nextCursor && (
+            <div className="flex justify-center mt-2">
+              <button
+                type="button"
+                className="btn btn-outline btn-sm"
+                onClick={handleLoadMore}
+                disabled={loadingMore || loading}
+              >
+                {loadingMore ? '加载中...' : '加载更多'}
+              </button>
+            </div>
+          )}
         </div>
       )}
 
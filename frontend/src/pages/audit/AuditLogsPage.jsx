@@ -1,11 +1,13 @@
 import React, { useState, useEffect } from 'react';
-import { fetchAuditLogs } from '../../services/audit';
+import { auditExportUrl, fetchAuditLogs } from '../../services/audit';
 import AuditLogFilter from '../../components/audit/AuditLogFilter';
 import AuditLogList from '../../components/audit/AuditLogList';
 
 const AuditLogsPage = () => {
   const [logs, setLogs] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState(null);
   const [filters, setFilters] = useState({});
   
@@ -14,7 +16,8 @@ const AuditLogsPage = () => {
       try {
         setLoading(true);
         const data = await fetchAuditLogs(filters);
-        setLogs(data);
+        setLogs(data.items);
+        setNextCursor(data.next_cursor);
         setError(null);
       } catch (err) {
         console.error('Error loading audit logs:', err);
@@ -31,13 +34,33 @@ const AuditLogsPage = () => {
     setFilters(newFilters);
   };
   
+  const handleLoadMore = async () => {
+    try {
+      setLoadingMore(true);
+      const data = await fetchAuditLogs(filters, nextCursor);
+      setLogs((current) => [...current, ...data.items]);
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      console.error('Error loading more audit logs:', err);
+      setError('加载审计日志失败: ' + (err.response?.data?.detail || err.message));
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+  
   return (
     <div className="container mx-auto px-4 py-6">
-      <div className="mb-6">
-        <h1 className="text-3xl font-bold">审计日志</h1>
-        <p className="text-gray-600">
-          查看系统操作记录和变更历史
-        </p>
+      <div className="mb-6 flex justify-between items-center">
+        <div>
+          <h1 className="text-3xl font-bold">审计日志</h1>
+          <p className="text-gray-600">
+            查看系统操作记录和变更历史
+          </p>
+        </div>
+        <div className="flex gap-2">
+          <a className="btn btn-outline btn-sm" href={auditExportUrl(filters, 'csv')}>导出 CSV</a>
+          <a className="btn btn-outline btn-sm" href={auditExportUrl(filters, 'ndjson', true)}>导出 NDJSON (gzip)</a>
+        </div>
       </div>
       
       <AuditLogFilter onFilter={handleFilter} />
@@ -50,6 +73,13 @@ const AuditLogsPage = () => {
             isLoading={loading}
             error={error}
           />
+          {nextCursor && !loading && (
+            <div className="flex justify-center mt-4">
+              <button className="btn btn-outline btn-sm" onClick={handleLoadMore} disabled={loadingMore}>
+                {loadingMore ? '加载中...' : '加载更多'}
+              </button>
+            </div>
+          )}
         </div>
       </div>
     </div>
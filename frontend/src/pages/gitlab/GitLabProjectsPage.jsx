@@ -8,28 +8,80 @@ const GitLabProjectsPage = () => {
   const [config, setConfig] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [search, setSearch] = useState('');
+  const [namespace, setNamespace] = useState('');
+  // 输入停止 300ms 后才生效的筛选条件，避免每次按键都请求 GitLab
+  const [filters, setFilters] = useState({});
+  const [loadingProjects, setLoadingProjects] = useState(false);
 
   useEffect(() => {
-    const loadData = async () => {
+    const loadConfig = async () => {
       try {
         setLoading(true);
-        const [configData, projectsData] = await Promise.all([
-          fetchGitLabConfig(configId),
-          fetchGitLabProjects(configId)
-        ]);
-        setConfig(configData);
-        setProjects(projectsData);
+        setConfig(await fetchGitLabConfig(configId));
       } catch (err) {
-        setError('Failed to load GitLab projects');
+        setError('Failed to load GitLab configuration');
         console.error(err);
       } finally {
         setLoading(false);
       }
     };
 
-    loadData();
+    loadConfig();
   }, [configId]);
 
+  useEffect(() => {
+    const timer = setTimeout(() => {
+      const next = {};
+      if (search.trim()) next.search = search.trim();
+      if (namespace.trim()) next.namespace = namespace.trim();
+      setFilters(next);
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [search, namespace]);
+
+  // 配置或筛选条件变化时重新加载第一页
+  useEffect(() => {
+    // 筛选条件已更新时丢弃旧请求的结果，避免慢响应覆盖新的列表
+    let stale = false;
+    const loadProjects = async () => {
+      try {
+        setLoadingProjects(true);
+        const data = await fetchGitLabProjects(configId, filters);
+        if (stale) return;
+        setProjects(data.items);
+        setNextCursor(data.next_cursor);
+      } catch (err) {
+        if (stale) return;
+        setError('Failed to load GitLab projects');
+        console.error(err);
+      } finally {
+        if (!stale) setLoadingProjects(false);
+      }
+    };
+
+    loadProjects();
+    return () => { stale = true; };
+  }, [configId, filters]);
+
+  // 加载下一页项目
+  const handleLoadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const data = await fetchGitLabProjects(configId, filters, nextCursor);
+      setProjects(prev => [...prev, ...data.items]);
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      setError('Failed to load GitLab projects');
+      console.error(err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   if (loading) {
     return (
       <div className="flex justify-center my-8">
@@ -53,10 +105,31 @@ const GitLabProjectsPage = () => {
     <div className="container mx-auto px-4 py-6">
       <div className="mb-6">
         <h1 className="text-3xl font-bold">Projects from {config.url}</h1>
-        <p className="text-gray-500">Showing all projects accessible with the configured token</p>
+        <p className="text-gray-500">Projects accessible with the configured token</p>
+      </div>
+
+      <div className="flex flex-wrap gap-2 mb-6">
+        <input
+          type="text"
+          value={search}
+          onChange={(e) => setSearch(e.target.value)}
+          placeholder="搜索名称或路径"
+          className="input input-bordered w-full max-w-xs"
+        />
+        <input
+          type="text"
+          value={namespace}
+          onChange={(e) => setNamespace(e.target.value)}
+          placeholder="命名空间，如 group/subgroup"
+          className="input input-bordered w-full max-w-xs"
+        />
       </div>
 
-      {projects.length === 0 ? (
+      {loadingProjects ? (
+        <div className="flex justify-center my-8">
+          <span className="loading loading-spinner loading-md"></span>
+        </div>
+      ) : projects.length === 0 ? (
         <div className="card bg-base-100 shadow-xl">
           <div className="card-body">
             <p className="text-center text-gray-500">No projects found for this GitLab instance.</p>
@@ -88,6 +161,18 @@ const GitLabProjectsPage = () => {
           ))}
         </div>
       )}
+
+      {!loadingProjects && nextCursor && (
+        <div className="flex justify-center mt-6">
+          <button
+            className="btn btn-outline btn-sm"
+            onClick={handleLoadMore}
+            disabled={loadingMore}
+          >
+            {loadingMore ? '加载中...' : '加载更多'}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
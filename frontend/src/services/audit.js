@@ -1,9 +1,9 @@
 import api from './auth.js';
 
-// 获取审计日志列表
-export const fetchAuditLogs = async (filters = {}) => {
+// 获取一页审计日志，返回 { items, next_cursor }；cursor 为上一页返回的 next_cursor
+export const fetchAuditLogs = async (filters = {}, cursor = null) => {
   try {
-    const response = await api.get('/audit-logs/', { params: filters });
+    const response = await api.get('/audit-logs/', { params: cursor ? { ...filters, cursor } : filters });
     return response.data;
   } catch (error) {
     console.error('Error fetching audit logs:', error);
@@ -42,4 +42,18 @@ export const fetchUsers = async () => {
     console.error('Error fetching audit log users:', error);
     throw error;
   }
-};
\ No newline at end of file
+};
+// 审计日志导出地址（流式下载，含归档），format 为 ndjson 或 csv，gzip 为 true 时下载压缩文件
+export const auditExportUrl = (filters = {}, format = 'ndjson', gzip = false) => {
+  const params = new URLSearchParams();
+  Object.entries(filters).forEach(([key, value]) => {
+    if (value !== undefined && value !== null && value !== '') {
+      params.append(key, value);
+    }
+  });
+  params.append('format', format);
+  if (gzip) {
+    params.append('gzip', 'true');
+  }
+  return `${api.defaults.baseURL}/audit-logs/export?${params.toString()}`;
+};
@@ -20,7 +20,7 @@ export const fetchDeployments = async (hookId = null) => {
     }
     
     const response = await api.get('/deployments/', { params });
-    return response.data;
+    return response.data.items || response.data;
   } catch (error) {
     console.error('Error fetching deployments:', error);
     throw error;
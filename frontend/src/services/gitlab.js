@@ -71,22 +71,27 @@ export const testGitLabConnection = async (configId) => {
   }
 };
 
-// 获取 GitLab 项目列表
-export const fetchGitLabProjects = async (configId) => {
+// 获取一页 GitLab 项目，返回 { items, next_cursor }；filters 可包含 search、namespace、visibility
+// cursor 为上一页返回的 next_cursor，后续页面由界面按需加载，不在客户端拼出完整列表
+export const fetchGitLabProjects = async (configId, filters = {}, cursor = null) => {
   try {
-    const response = await api.get(`/gitlab/configs/${configId}/projects`);
-    return response.data.items || response.data;
+    const response = await api.get(`/gitlab/configs/${configId}/projects`, {
+      params: cursor ? { ...filters, cursor } : filters
+    });
+    return response.data;
   } catch (error) {
     console.error(`Error fetching GitLab projects for config ${configId}:`, error);
     throw error;
   }
 };
 
-// 获取 GitLab 组列表
-export const fetchGitLabGroups = async (configId) => {
+// 获取一页 GitLab 组，参数和返回值同项目列表
+export const fetchGitLabGroups = async (configId, filters = {}, cursor = null) => {
   try {
-    const response = await api.get(`/gitlab/configs/${configId}/groups`);
-    return response.data.items || response.data;
+    const response = await api.get(`/gitlab/configs/${configId}/groups`, {
+      params: cursor ? { ...filters, cursor } : filters
+    });
+    return response.data;
   } catch (error) {
     console.error(`Error fetching GitLab groups for config ${configId}:`, error);
     throw error;